@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+from telegram import Bot
+from telegram.error import BadRequest, TelegramError
+
+logger = logging.getLogger(__name__)
+
+class AcknowledgementAggregator:
+    """Объединяет подтверждения ответов в один статус на чат
+
+    В каждом чате отправляется не больше одного сообщения о статусе за окно
+    window_seconds. Новые подтверждения в пределах окна заменяют текст
+    ожидающего статуса, а уже отправленный статус редактируется, а не
+    дублируется новым сообщением. Ожидающий финальный статус не заменяется
+    промежуточным. Состояние чата удаляется, когда после финального статуса
+    закрылось окно.
+    """
+
+    def __init__(self, bot: Bot, window_seconds: float = 30.0):
+        self.bot = bot
+        self.window_seconds = window_seconds
+        self._chats: Dict[int, Dict] = {}
+
+    async def acknowledge(self, chat_id: int, text: str, message_thread_id: Optional[int] = None,
+                          final: bool = False):
+        """Ставит статус в очередь; final=True завершает текущий статус чата"""
+        state = self._chats.setdefault(chat_id, {
+            'text': None,
+            'sent_text': None,
+            'message_id': None,
+            'message_thread_id': None,
+            'final': False,
+            'last_flush': None,
+            'task': None,
+            'evict_task': None
+        })
+        if state['final'] and state['task'] is not None and not final:
+            # Финальный статус уже ждет отправки: промежуточный его не заменяет
+            return
+        if state['evict_task'] is not None:
+            # Новый цикл ответов начался до закрытия окна
+            state['evict_task'].cancel()
+            state['evict_task'] = None
+        state['text'] = text
+        state['message_thread_id'] = message_thread_id
+        state['final'] = final
+
+        if state['task'] is not None:
+            # Статус уже запланирован, он отправится с последним текстом
+            return
+
+        loop = asyncio.get_running_loop()
+        delay = 0.0
+        if state['last_flush'] is not None:
+            delay = state['last_flush'] + self.window_seconds - loop.time()
+
+        if delay <= 0:
+            await self._flush(chat_id, state)
+        else:
+            state['task'] = asyncio.create_task(self._flush_later(chat_id, state, delay))
+
+    async def _flush_later(self, chat_id: int, state: Dict, delay: float):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            state['task'] = None
+            raise
+        state['task'] = None
+        await self._flush(chat_id, state)
+
+    async def _flush(self, chat_id: int, state: Dict):
+        """Отправляет или редактирует статус чата"""
+        state['last_flush'] = asyncio.get_running_loop().time()
+        text = state['text']
+
+        try:
+            if state['message_id'] is not None:
+                if text != state['sent_text']:
+                    await self._edit_or_send(chat_id, state, text)
+            else:
+                await self._send(chat_id, state, text)
+        except TelegramError as e:
+            logger.error("Failed to send acknowledgement to chat %s: %s", chat_id, e)
+
+        if state['final']:
+            # Следующий цикл ответов начнется с нового сообщения о статусе
+            state['message_id'] = None
+            state['sent_text'] = None
+            state['evict_task'] = asyncio.create_task(self._evict_later(chat_id, state))
+
+    async def _evict_later(self, chat_id: int, state: Dict):
+        """Удаляет состояние чата после окна, закрытого финальным статусом"""
+        await asyncio.sleep(self.window_seconds)
+        if self._chats.get(chat_id) is state and state['task'] is None:
+            del self._chats[chat_id]
+
+    async def _edit_or_send(self, chat_id: int, state: Dict, text: str):
+        try:
+            await self.bot.edit_message_text(text=text, chat_id=chat_id, message_id=state['message_id'])
+            state['sent_text'] = text
+        except BadRequest as e:
+            # Сообщение могли удалить: отправляем статус заново
+            logger.warning("Could not edit acknowledgement in chat %s: %s", chat_id, e)
+            await self._send(chat_id, state, text)
+
+    async def _send(self, chat_id: int, state: Dict, text: str):
+        send_params = {
+            'chat_id': chat_id,
+            'text': text
+        }
+
+        if state['message_thread_id'] is not None:
+            send_params['message_thread_id'] = state['message_thread_id']
+
+        message = await self.bot.send_message(**send_params)
+        state['message_id'] = getattr(message, 'message_id', None)
+        state['sent_text'] = text
+
+    async def close(self):
+        """Отменяет запланированные статусы"""
+        for state in self._chats.values():
+            for key in ('task', 'evict_task'):
+                if state[key] is not None:
+                    state[key].cancel()
+        self._chats.clear()
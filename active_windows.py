@@ -0,0 +1,139 @@
+import re
+from bisect import bisect_right
+from typing import List, Optional, Sequence, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Все дни недели: бит 0 — понедельник, бит 6 — воскресенье
+ALL_WEEKDAYS = 0b1111111
+
+# 01.01.1970 — четверг
+_EPOCH_WEEKDAY = 3
+
+_TIME_PATTERN = r'([0-1]?[0-9]|2[0-3]):([0-5][0-9])'
+_RANGE_RE = re.compile(rf'^{_TIME_PATTERN}-{_TIME_PATTERN}$')
+
+_WEEKDAY_NAMES = {
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6,
+    'пн': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'пт': 4, 'сб': 5, 'вс': 6,
+}
+_WEEKDAY_LABELS = ['пн', 'вт', 'ср', 'чт', 'пт', 'сб', 'вс']
+
+def parse_window(value: str) -> Optional[Tuple[int, int]]:
+    """Разбирает окно HH:MM-HH:MM в минуты суток
+
+    Окно, конец которого не позже начала, заканчивается на следующий день.
+    Возвращает None, если строка не является окном.
+    """
+    match = _RANGE_RE.match(value)
+    if not match:
+        return None
+    start = int(match.group(1)) * 60 + int(match.group(2))
+    end = int(match.group(3)) * 60 + int(match.group(4))
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+def parse_weekdays(value: str) -> Optional[int]:
+    """Разбирает дни недели (mon-fri, пн,ср,пт) в битовую маску
+
+    Возвращает None, если в строке есть неизвестный день.
+    """
+    mask = 0
+    for part in value.lower().split(','):
+        first, _, last = part.partition('-')
+        if first not in _WEEKDAY_NAMES or (last and last not in _WEEKDAY_NAMES):
+            return None
+        start = _WEEKDAY_NAMES[first]
+        end = _WEEKDAY_NAMES[last] if last else start
+        # Диапазон может переходить через воскресенье (fri-mon)
+        for offset in range((end - start) % 7 + 1):
+            mask |= 1 << (start + offset) % 7
+    return mask
+
+def default_window(start_minute: int, end_hour: int) -> Tuple[int, int]:
+    """Окно с времени начала до end_hour следующего дня"""
+    return start_minute, end_hour * 60 + MINUTES_PER_DAY
+
+def format_minute(minute: int) -> str:
+    """Минуты суток в виде HH:MM"""
+    return f"{minute % MINUTES_PER_DAY // 60:02d}:{minute % 60:02d}"
+
+def format_weekdays(weekdays: int) -> str:
+    """Битовая маска дней недели в виде «пн, ср, пт»"""
+    if weekdays == ALL_WEEKDAYS:
+        return "ежедневно"
+    return ", ".join(label for day, label in enumerate(_WEEKDAY_LABELS) if weekdays >> day & 1)
+
+def minute_of_week(local_seconds: int) -> int:
+    """Минута недели (от понедельника 00:00) для местного времени в секундах"""
+    days = local_seconds // 86400
+    return (days + _EPOCH_WEEKDAY) % 7 * MINUTES_PER_DAY + local_seconds % 86400 // 60
+
+class ActiveWindows:
+    """Активные окна уведомления, скомпилированные в отсортированные интервалы
+
+    Окна суток повторяются по дням недели из маски и раскладываются в
+    минуты недели. Пересекающиеся интервалы сливаются, поэтому проверка
+    «внутри окна» и поиск начала следующего окна — бинарный поиск по
+    целым числам без построения datetime.
+    """
+
+    def __init__(self, windows: Sequence[Tuple[int, int]], weekdays: int = ALL_WEEKDAYS):
+        self.windows = [tuple(window) for window in windows]
+        self.weekdays = weekdays
+
+        intervals: List[Tuple[int, int]] = []
+        starts = set()
+        for day in range(7):
+            if not weekdays >> day & 1:
+                continue
+            for start, end in self.windows:
+                start += day * MINUTES_PER_DAY
+                end += day * MINUTES_PER_DAY
+                starts.add(start)
+                if end > MINUTES_PER_WEEK:
+                    # Окно воскресенья продолжается в понедельник
+                    intervals.append((start, MINUTES_PER_WEEK))
+                    intervals.append((0, end - MINUTES_PER_WEEK))
+                else:
+                    intervals.append((start, end))
+
+        merged: List[Tuple[int, int]] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+
+        self.interval_starts = [start for start, _ in merged]
+        self.interval_ends = [end for _, end in merged]
+        # Моменты начала окон (минуты недели) для расчета возобновления
+        self.starts = sorted(starts)
+
+    def contains(self, minute: int) -> bool:
+        """Проверяет, попадает ли минута недели в одно из окон"""
+        index = bisect_right(self.interval_starts, minute) - 1
+        return index >= 0 and minute < self.interval_ends[index]
+
+    def next_start(self, second_of_week: int) -> int:
+        """Секунд от second_of_week до ближайшего начала окна (строго позже)"""
+        index = bisect_right(self.starts, second_of_week // 60)
+        if index < len(self.starts):
+            target = self.starts[index] * 60
+        else:
+            target = self.starts[0] * 60 + MINUTES_PER_WEEK * 60
+        return target - second_of_week
+
+    def describe(self) -> str:
+        """Окна в виде «09:00–18:00 (пн, вт)» для ответов бота"""
+        parts = []
+        for start, end in self.windows:
+            suffix = " следующего дня" if end > MINUTES_PER_DAY else ""
+            parts.append(f"{format_minute(start)}–{format_minute(end)}{suffix}")
+        text = ", ".join(parts)
+        if self.weekdays != ALL_WEEKDAYS:
+            text += f" ({format_weekdays(self.weekdays)})"
+        return text
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк правил повторения: битовые маски против поминутного перебора
+
+Запуск: python benchmark_recurrence.py [--samples 2000]
+"""
+
+import argparse
+import random
+import time
+from recurrence import CronRule
+
+RULES = [
+    "*/30 9-18 * * пн-пт",
+    "0 9 * * mon-fri",
+    "15 10 1,15 * *",
+    "0 12 * * 0",
+    "0 0 1 1 *",
+]
+
+def _measure(function, moments) -> float:
+    """Среднее время вызова в микросекундах"""
+    started = time.perf_counter()
+    for moment in moments:
+        function(moment)
+    return (time.perf_counter() - started) / len(moments) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=2000, help='число случайных моментов на правило')
+    parser.add_argument('--naive-samples', type=int, default=50,
+                        help='число моментов для поминутного перебора (он медленный)')
+    args = parser.parse_args()
+
+    randomizer = random.Random(0)
+    print(f"{'правило':<24} {'маски, мкс':>12} {'перебор, мкс':>14} {'ускорение':>10}")
+    for expression in RULES:
+        rule = CronRule(expression)
+        moments = [randomizer.randint(1_600_000_000, 1_800_000_000) for _ in range(args.samples)]
+        naive_moments = moments[:args.naive_samples]
+
+        # Результаты обоих способов должны совпадать
+        for moment in naive_moments:
+            assert rule.next_fire(moment) == rule.naive_next_fire(moment), (expression, moment)
+
+        compiled = _measure(rule.next_fire, moments)
+        naive = _measure(rule.naive_next_fire, naive_moments)
+        print(f"{expression:<24} {compiled:>12.2f} {naive:>14.1f} {naive / compiled:>9.0f}x")
+
+if __name__ == "__main__":
+    main()
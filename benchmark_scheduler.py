@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк планировщика напоминаний на виртуальных часах
+
+NotificationManager работает с настоящим кодом цикла уведомлений, но время
+идет по виртуальным часам: простои между проверками пропускаются, а время
+обработки проверок берется реальное. Поэтому сутки для тысяч уведомлений
+проходят за секунды, а запаздывание проверок отражает реальную загрузку
+цикла событий. Бот заменен заглушкой с задержкой ответа в виртуальном времени.
+
+Запуск: python benchmark_scheduler.py [--sizes 1000,10000,100000] [--hours 24]
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import List, Tuple
+
+from config import MOSCOW_TZ
+from lag_monitor import percentile
+from notification_manager import NotificationManager
+from storage import NotificationStorage
+from timeutils import Clock, get_zone
+
+# Понедельник, 00:00 по Москве
+START_TIME = datetime(2024, 1, 1, 0, 0, tzinfo=get_zone(MOSCOW_TZ)).timestamp()
+
+TIMEZONES = [MOSCOW_TZ, 'Europe/Berlin', 'Asia/Yekaterinburg', 'America/New_York', 'Asia/Tokyo']
+INTERVALS = [15, 30, 60, 120, 180]
+CRON_RULES = ["0 9 * * пн-пт", "*/30 9-18 * * *", "15 10 1,15 * *"]
+
+class VirtualClock(Clock):
+    """Виртуальные часы с очередью таймеров
+
+    Время складывается из виртуального момента последнего «прыжка» и
+    реального времени, прошедшего с него: пока цикл событий занят, время
+    идет как обычно, а когда все задачи ждут, run_until сразу переводит
+    часы на ближайший таймер.
+    """
+
+    def __init__(self, start: float):
+        super().__init__()
+        self._base = start
+        self._real_base = time.perf_counter()
+        self._timers: List[Tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        # Запаздывание каждого пробуждения из sleep, в секундах
+        self.lags: List[float] = []
+
+    def time(self) -> float:
+        return self._base + (time.perf_counter() - self._real_base)
+
+    def monotonic(self) -> float:
+        return self.time()
+
+    def _jump(self, moment: float):
+        self._base = moment
+        self._real_base = time.perf_counter()
+
+    async def _wait(self, seconds: float) -> float:
+        deadline = self.time() + max(seconds, 0.0)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._timers, (deadline, next(self._sequence), future))
+        await future
+        return deadline
+
+    async def sleep(self, seconds: float):
+        """Ждет seconds виртуальных секунд и записывает запаздывание пробуждения"""
+        deadline = await self._wait(seconds)
+        self.lags.append(self.time() - deadline)
+
+    async def delay(self, seconds: float):
+        """Ждет seconds виртуальных секунд без учета в запаздывании (ответ Telegram)"""
+        await self._wait(seconds)
+
+    async def run_until(self, end: float):
+        """Будит задачи по таймерам, пока не наступит момент end"""
+        while self._timers and self._timers[0][0] <= end:
+            if self._timers[0][0] > self.time():
+                # Все задачи ждут: пропускаем простой
+                self._jump(self._timers[0][0])
+            now = self.time()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, future = heapq.heappop(self._timers)
+                if not future.done():
+                    future.set_result(None)
+            # Разбуженные задачи выполняются раньше, чем продолжится этот цикл
+            await asyncio.sleep(0)
+        if end > self.time():
+            self._jump(end)
+
+class MockBot:
+    """Заглушка бота: считает отправки и отвечает с задержкой в виртуальном времени"""
+
+    def __init__(self, clock: VirtualClock, latency: float):
+        self.clock = clock
+        self.latency = latency
+        self.sent = 0
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = None, message_thread_id: int = None):
+        if self.latency > 0:
+            await self.clock.delay(self.latency)
+        self.sent += 1
+
+    async def get_chat_member(self, chat_id: int, user_id: int):
+        class MockUser:
+            def __init__(self, user_id):
+                self.id = user_id
+                self.username = f"user{user_id}"
+                self.first_name = "Пользователь"
+
+        class MockMember:
+            def __init__(self, user_id):
+                self.user = MockUser(user_id)
+
+        return MockMember(user_id)
+
+def _population(size: int, randomizer: random.Random) -> dict:
+    """Набор уведомлений: разные пояса, времена начала, интервалы и немного правил"""
+    notifications = {}
+    for index in range(size):
+        chat_id = -1_000_000_000 - index
+        notification = {
+            'message': f"Напоминание {index}",
+            'interval_minutes': randomizer.choice(INTERVALS),
+            'start_hour': randomizer.randint(6, 12),
+            'start_minute': randomizer.choice((0, 15, 30, 45)),
+            'active': True,
+            'chat_id': chat_id,
+            'message_thread_id': None,
+            'tagged_users': [index + 1] if index % 4 == 0 else [],
+            'timezone': randomizer.choice(TIMEZONES),
+        }
+        if index % 20 == 0:
+            notification['cron'] = randomizer.choice(CRON_RULES)
+            notification['interval_minutes'] = 1
+        notifications[chat_id] = notification
+    return notifications
+
+async def _simulate(size: int, hours: float, latency: float, ramp: float, storage_file: str) -> dict:
+    clock = VirtualClock(START_TIME)
+    bot = MockBot(clock, latency)
+    manager = NotificationManager(bot, storage_file, clock=clock)
+    NotificationStorage(storage_file).save_notifications(_population(size, random.Random(size)))
+
+    # Память на уведомление: словари состояния, задачи и их кадры до первой проверки
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    await manager.restore_notifications(ramp_seconds=ramp)
+    await asyncio.sleep(0)
+    memory = (tracemalloc.get_traced_memory()[0] - before) / size
+    tracemalloc.stop()
+
+    clock.lags.clear()
+    started = time.perf_counter()
+    await clock.run_until(START_TIME + hours * 3600)
+    elapsed = time.perf_counter() - started
+
+    manager.closing = True
+    tasks = [data['task'] for data in manager.active_notifications.values() if data.get('task')]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    manager.journal.close()
+
+    lags = sorted(clock.lags)
+    return {
+        'elapsed': elapsed,
+        'ticks': len(lags),
+        'sends': bot.sent,
+        'memory': memory,
+        'lags': {percent: percentile(lags, percent) for percent in (50, 95, 99)},
+        'max_lag': lags[-1] if lags else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='число уведомлений через запятую')
+    parser.add_argument('--hours', type=float, default=24.0, help='длительность в виртуальных часах')
+    parser.add_argument('--latency', type=float, default=0.05, help='задержка ответа Telegram, виртуальные сек')
+    parser.add_argument('--ramp', type=float, default=60.0, help='разнесение первых проверок при восстановлении, сек')
+    args = parser.parse_args()
+
+    print(f"{'уведомлений':>11} {'реальн., с':>10} {'проверок/с':>11} {'отправок/с':>11} {'КБ/увед.':>9} "
+          f"{'p50 лаг, мс':>11} {'p95':>8} {'p99':>8} {'макс.':>8}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as directory:
+            storage_file = os.path.join(directory, 'notifications.json')
+            result = asyncio.run(_simulate(size, args.hours, args.latency, args.ramp, storage_file))
+        lags = result['lags']
+        print(f"{size:>11} {result['elapsed']:>10.1f} {result['ticks'] / result['elapsed']:>11.0f} "
+              f"{result['sends'] / result['elapsed']:>11.0f} {result['memory'] / 1024:>9.2f} "
+              f"{lags[50] * 1000:>11.1f} {lags[95] * 1000:>8.1f} {lags[99] * 1000:>8.1f} {result['max_lag'] * 1000:>8.1f}")
+
+    # ru_maxrss в Linux — в килобайтах
+    print(f"\nПиковый RSS процесса: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} МБ")
+
+if __name__ == "__main__":
+    main()
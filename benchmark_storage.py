@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк хранилища уведомлений: запись и загрузка на 1 000 – 100 000 записей
+
+Смеси изменений:
+  rewrite — изменения настроек (запуск, остановка, пауза), требующие полной записи;
+  field   — обновление одного поля last_sent после отправки.
+
+Для каждой смеси выводятся p50/p99 и средняя задержка и байты, записанные
+на одно изменение. Среднее и байты амортизированы: смесь длится не меньше
+одного цикла периодической полной записи (например, сжатия журнала),
+которая в p99 может не попасть. Для загрузки — p50/p99 и пиковый RSS процесса во время
+load_notifications (замеряется в отдельном процессе).
+
+Способы хранения регистрируются декоратором register_backend: новый
+backend достаточно описать классом с методами mutate, load, close и
+min_mutations.
+
+Запуск: python benchmark_storage.py [--sizes 1000,10000,100000] [--backends json,json+journal]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from config import MOSCOW_TZ
+from lag_monitor import percentile
+from storage import NotificationStorage
+from timeutils import get_zone
+
+TIMEZONES = [MOSCOW_TZ, 'Europe/Berlin', 'Asia/Yekaterinburg', 'America/New_York', 'Asia/Tokyo']
+
+BACKENDS: Dict[str, Callable[[str], object]] = {}
+
+def register_backend(name: str):
+    """Регистрирует класс хранилища под именем name"""
+    def decorator(backend_class):
+        BACKENDS[name] = backend_class
+        return backend_class
+    return decorator
+
+@register_backend('json')
+class JsonBackend:
+    """Текущий JSON-файл: любое изменение переписывает файл целиком"""
+
+    def __init__(self, path: str):
+        self.storage = NotificationStorage(path)
+
+    def mutate(self, notifications: Dict[int, Dict], chat_id: int, field: str):
+        self.storage.save_notifications(notifications)
+
+    def load(self) -> Dict[int, Dict]:
+        return self.storage.load_notifications()
+
+    def close(self):
+        self.storage.journal.close()
+
+    def min_mutations(self, mix: str) -> int:
+        """Сколько изменений смеси нужно, чтобы захватить периодические полные записи"""
+        return 0
+
+@register_backend('json+journal')
+class JournalBackend(JsonBackend):
+    """Как в NotificationManager: last_sent пишется в журнал доставки, файл — при сжатии журнала"""
+
+    def mutate(self, notifications: Dict[int, Dict], chat_id: int, field: str):
+        journal = self.storage.journal
+        if field != 'last_sent':
+            self.storage.save_notifications(notifications)
+            return
+        slot = int(notifications[chat_id]['last_sent'].timestamp())
+        journal.record_intent(chat_id, slot)
+        journal.mark_done(chat_id, slot)
+        if journal.needs_compaction():
+            self.storage.save_notifications(notifications)
+            journal.compact()
+
+    def load(self) -> Dict[int, Dict]:
+        notifications = self.storage.load_notifications()
+        self.storage.journal.recover()
+        return notifications
+
+    def min_mutations(self, mix: str) -> int:
+        # Изменение пишет в журнал две строки: за compact_threshold изменений журнал сжимается дважды
+        return self.storage.journal.compact_threshold if mix == 'field' else 0
+
+def _population(size: int, randomizer: random.Random) -> Dict[int, Dict]:
+    """Уведомления в том виде, в каком их держит NotificationManager"""
+    now = datetime(2024, 1, 1, 12, 0, tzinfo=get_zone(MOSCOW_TZ))
+    notifications = {}
+    for index in range(size):
+        chat_id = -1_000_000_000 - index
+        zone = get_zone(randomizer.choice(TIMEZONES))
+        notifications[chat_id] = {
+            'message': f"Напоминание {index}: пора заполнить отчет",
+            'interval_minutes': randomizer.choice((15, 30, 60, 120)),
+            'start_hour': randomizer.randint(6, 12),
+            'start_minute': randomizer.choice((0, 15, 30, 45)),
+            'active': True,
+            'task': None,
+            'chat_id': chat_id,
+            'message_thread_id': randomizer.choice((None, None, 17)),
+            'tagged_users': [index + 1, index + 2] if index % 4 == 0 else [],
+            'timezone': zone.key,
+            'last_response_time': None,
+            'last_sent': (now - timedelta(minutes=randomizer.randint(0, 120))).astimezone(zone),
+            'responded_users': set(),
+        }
+    return notifications
+
+def _written_bytes() -> Optional[int]:
+    """Байты, переданные процессом в write() (Linux, /proc/self/io)"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _peak_rss_kb() -> int:
+    """Пиковый RSS процесса в КБ
+
+    VmHWM сбрасывается при exec, а ru_maxrss наследуется от родителя,
+    поэтому в дочернем процессе сначала смотрим /proc/self/status.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss в Linux — в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _run_mix(backend, notifications: Dict[int, Dict], mix: str, count: int, randomizer: random.Random) -> Dict:
+    chat_ids = list(notifications)
+    latencies: List[float] = []
+    written_before = _written_bytes()
+    for _ in range(count):
+        chat_id = randomizer.choice(chat_ids)
+        notification = notifications[chat_id]
+        if mix == 'rewrite':
+            notification['active'] = not notification['active']
+            notification['last_response_time'] = None if notification['active'] else notification['last_sent']
+            field = 'active'
+        else:
+            notification['last_sent'] += timedelta(minutes=notification['interval_minutes'])
+            field = 'last_sent'
+        started = time.perf_counter()
+        backend.mutate(notifications, chat_id, field)
+        latencies.append(time.perf_counter() - started)
+    written_after = _written_bytes()
+
+    latencies.sort()
+    return {
+        'count': count,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'mean': sum(latencies) / count,
+        'bytes': (written_after - written_before) / count if written_before is not None else None,
+    }
+
+def _measure_load(backend_name: str, path: str) -> Dict:
+    """Загрузка в отдельном процессе: пиковый RSS нельзя сбросить внутри процесса"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure-load', backend_name, path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def _measure_load_child(backend_name: str, path: str):
+    backend = BACKENDS[backend_name](path)
+    baseline = _peak_rss_kb()
+    started = time.perf_counter()
+    notifications = backend.load()
+    elapsed = time.perf_counter() - started
+    peak = _peak_rss_kb()
+    backend.close()
+    print(json.dumps({'seconds': elapsed, 'entries': len(notifications), 'rss_kb': peak - baseline}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='число записей через запятую')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help=f"способы хранения: {', '.join(BACKENDS)}")
+    parser.add_argument('--mutations', type=int, default=0,
+                        help='изменений на смесь (по умолчанию 200, но не больше 2 000 000 / размер; '
+                             'не меньше цикла полной записи backend)')
+    parser.add_argument('--loads', type=int, default=5, help='число замеров загрузки')
+    parser.add_argument('--measure-load', nargs=2, metavar=('BACKEND', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_load:
+        _measure_load_child(*args.measure_load)
+        return
+
+    print(f"{'backend':<14} {'записей':>8} {'смесь':<8} {'изменений':>9} {'p50, мс':>9} {'p99, мс':>9} "
+          f"{'среднее, мс':>11} {'байт/изм.':>10}")
+    load_rows = []
+    for backend_name in args.backends.split(','):
+        for size in (int(value) for value in args.sizes.split(',')):
+            randomizer = random.Random(size)
+            count = args.mutations or max(5, min(200, 2_000_000 // size))
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'notifications.json')
+                notifications = _population(size, randomizer)
+                backend = BACKENDS[backend_name](path)
+                try:
+                    backend.mutate(notifications, next(iter(notifications)), 'active')
+                    for mix in ('rewrite', 'field'):
+                        mix_count = max(count, backend.min_mutations(mix))
+                        result = _run_mix(backend, notifications, mix, mix_count, randomizer)
+                        written = f"{result['bytes']:>10.0f}" if result['bytes'] is not None else f"{'н/д':>10}"
+                        print(f"{backend_name:<14} {size:>8} {mix:<8} {result['count']:>9} {result['p50'] * 1000:>9.2f} "
+                              f"{result['p99'] * 1000:>9.2f} {result['mean'] * 1000:>11.3f} {written}")
+                finally:
+                    backend.close()
+
+                loads = [_measure_load(backend_name, path) for _ in range(args.loads)]
+                assert all(load['entries'] == size for load in loads), "Загружены не все записи"
+                seconds = sorted(load['seconds'] for load in loads)
+                load_rows.append((backend_name, size, os.path.getsize(path), percentile(seconds, 50),
+                                  percentile(seconds, 99), max(load['rss_kb'] for load in loads)))
+
+    print(f"\n{'backend':<14} {'записей':>8} {'файл, КБ':>9} {'загрузка p50, мс':>17} {'p99, мс':>9} {'пик RSS, МБ':>12}")
+    for backend_name, size, file_size, p50, p99, rss_kb in load_rows:
+        print(f"{backend_name:<14} {size:>8} {file_size / 1024:>9.0f} {p50 * 1000:>17.1f} {p99 * 1000:>9.1f} "
+              f"{rss_kb / 1024:>12.1f}")
+
+if __name__ == "__main__":
+    main()
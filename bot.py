@@ -1,30 +1,199 @@
+import asyncio
 import logging
 import re
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from config import BOT_TOKEN
+import secrets
+import time
+from typing import Optional
+from zoneinfo import ZoneInfoNotFoundError
+from telegram import Bot, Update
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes
+from telegram.request import HTTPXRequest
+import config
+from config import BOT_TOKEN, MOSCOW_TZ
 from notification_manager import NotificationManager
+from acknowledgements import AcknowledgementAggregator
+from username_cache import UsernameCache
+from update_filters import NotificationChatFilter
+from timeutils import get_zone
+from metrics import MetricsServer, default_registry
+from lag_monitor import LagMonitor
+from profiling import LiveProfiler, ProfilerBusyError
+from recurrence import CronRule
+from logging_setup import parse_sample_rates, setup_logging
+from update_capture import UpdateCapture
+from active_windows import ALL_WEEKDAYS, ActiveWindows, default_window, format_minute, parse_weekdays, parse_window
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 class AnnoyingBot:
-    def __init__(self):
-        self.application = Application.builder().token(BOT_TOKEN).build()
-        self.notification_manager = NotificationManager(self.application.bot)
+    # Бот обрабатывает только обычные сообщения: команды и ответы пользователей
+    ALLOWED_UPDATES = [Update.MESSAGE]
+    
+    def __init__(self, bot: Optional[Bot] = None):
+        """bot — готовый объект бота вместо подключения к Bot API (воспроизведение записей)"""
+        # Момент запуска для измерения времени до первого обновления
+        self.started_at = time.monotonic()
+        self.first_update_logged = False
+        self.shutdown_started_at = None
+        self.metrics_server = None
+        
+        builder = Application.builder()
+        if bot is not None:
+            builder = builder.bot(bot)
+        else:
+            builder = (
+                builder.token(BOT_TOKEN)
+                .base_url(config.TELEGRAM_BASE_URL)
+                .request(self._build_request())
+                .get_updates_request(self._build_get_updates_request())
+            )
+        self.application = (
+            builder
+            .concurrent_updates(config.CONCURRENT_UPDATES)
+            .post_init(self._post_init)
+            .post_stop(self._post_stop)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
+        self.lag_monitor = LagMonitor(
+            interval=config.LAG_SAMPLE_INTERVAL,
+            window=config.LAG_WINDOW,
+            loop_lag_warn=config.LOOP_LAG_WARN_SECONDS,
+            send_lateness_warn=config.SEND_LATENESS_WARN_SECONDS,
+            send_duration_warn=config.SEND_DURATION_WARN_SECONDS
+        )
+        self.notification_manager = NotificationManager(
+            self.application.bot, config.STORAGE_FILE, journal_fsync=config.JOURNAL_FSYNC, lag_monitor=self.lag_monitor
+        )
+        self.acknowledgements = AcknowledgementAggregator(self.application.bot, config.ACK_WINDOW_SECONDS)
+        self.username_cache = UsernameCache(config.USERNAME_CACHE_FILE)
+        self.profiler = LiveProfiler(config.PERF_MAX_SECONDS)
+        
+        # Запись входящих обновлений для воспроизведения (replay_updates.py)
+        self.update_capture = None
+        if config.UPDATE_CAPTURE_FILE:
+            self.update_capture = UpdateCapture(
+                config.UPDATE_CAPTURE_FILE, config.UPDATE_CAPTURE_SALT or secrets.token_hex(16)
+            )
+            self.application.add_handler(TypeHandler(Update, self._capture_update), group=-2)
         
         # Регистрируем обработчики
-        self.application.add_handler(CommandHandler("begin_notif", self.begin_notif_command))
-        self.application.add_handler(CommandHandler("stop_notif", self.stop_notif_command))
-        self.application.add_handler(CommandHandler("status", self.status_command))
+        self.application.add_handler(TypeHandler(Update, self._log_first_update), group=-3)
+        # Username запоминаются по всем обновлениям, до фильтров обработчиков группы 0
+        self.application.add_handler(TypeHandler(Update, self._remember_username), group=-1)
+        # Обновления одного чата, меняющие или читающие его уведомление, обрабатываются строго по очереди
+        self.application.add_handler(CommandHandler("begin_notif", self._in_chat_order(self.begin_notif_command)))
+        self.application.add_handler(CommandHandler("stop_notif", self._in_chat_order(self.stop_notif_command)))
+        self.application.add_handler(CommandHandler("status", self._in_chat_order(self.status_command)))
         self.application.add_handler(CommandHandler("help", self.help_command))
         self.application.add_handler(CommandHandler("storage", self.storage_command))
         self.application.add_handler(CommandHandler("clear_all", self.clear_all_command))
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        # Служебные команды доступны только администраторам из ADMIN_IDS
+        self.admin_filter = filters.User(user_id=config.ADMIN_IDS)
+        self.application.add_handler(CommandHandler("lag", self.lag_command, filters=self.admin_filter))
+        self.application.add_handler(CommandHandler("perf", self.perf_command, filters=self.admin_filter))
+        
+        # Сообщения из чатов без напоминаний отбрасываются фильтром до вызова обработчика
+        self.notification_filter = NotificationChatFilter(
+            self.notification_manager, filter_authors=config.FILTER_UNTAGGED_AUTHORS
+        )
+        self.application.add_handler(MessageHandler(
+            filters.TEXT & ~filters.COMMAND & self.notification_filter, self._in_chat_order(self.handle_message)
+        ))
+        # Приветствие отправляем только в личных чатах, чтобы не отвечать на каждое сообщение в группах
+        self.application.add_handler(MessageHandler(
+            filters.TEXT & ~filters.COMMAND & filters.ChatType.PRIVATE, self.greeting_message
+        ))
+    
+    async def _post_init(self, application: Application):
+        """Восстанавливает сохраненные уведомления, когда цикл событий уже запущен"""
+        restore_started = time.monotonic()
+        restored = await self.notification_manager.restore_notifications(
+            batch_size=config.RESTORE_BATCH_SIZE,
+            ramp_seconds=config.RESTORE_RAMP_SECONDS,
+            resend_unconfirmed=config.JOURNAL_RESEND_UNCONFIRMED
+        )
+        logger.info("Registered %s saved notifications in %.3fs (catch-up spread over %.0fs)",
+                    restored, time.monotonic() - restore_started, config.RESTORE_RAMP_SECONDS)
+        
+        self.lag_monitor.start()
+        
+        # Число уведомлений по состоянию считается при каждом чтении метрик
+        default_registry.add_collector(self.notification_manager.collect_metrics)
+        if config.METRICS_PORT:
+            self.metrics_server = MetricsServer(default_registry, config.METRICS_HOST, config.METRICS_PORT)
+            await self.metrics_server.start()
+    
+    async def _post_stop(self, application: Application):
+        """Останавливает планировщик, пока HTTP-клиент бота еще открыт"""
+        self.shutdown_started_at = time.monotonic()
+        await self.acknowledgements.close()
+        await self.notification_manager.shutdown(config.SHUTDOWN_TIMEOUT)
+        await self.lag_monitor.stop()
+        default_registry.remove_collector(self.notification_manager.collect_metrics)
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        if self.update_capture is not None:
+            self.update_capture.close()
+        self.username_cache.flush()
+    
+    async def _post_shutdown(self, application: Application):
+        """Сообщает общую длительность остановки"""
+        if self.shutdown_started_at is not None:
+            logger.info("Annoying Bot stopped in %.3fs", time.monotonic() - self.shutdown_started_at)
+    
+    def _in_chat_order(self, callback):
+        """Оборачивает обработчик: он целиком выполняется под блокировкой чата
+
+        Иначе более поздняя команда, например /stop_notif, могла бы обогнать
+        /begin_notif, пока тот ждет ответа Bot API. Сам обработчик блокировку
+        чата не берет: она не повторно входимая.
+        """
+        async def handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            async with self.notification_manager.chat_lock(update.effective_chat.id):
+                await callback(update, context)
+        return handler
+    
+    async def _capture_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Записывает обновление в файл записи"""
+        self.update_capture.write(update.to_dict())
+    
+    async def _remember_username(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Пассивно запоминает username -> user_id автора для будущих тегов"""
+        user = update.effective_user
+        if user is not None:
+            self.username_cache.remember(user.username, user.id)
+    
+    async def _log_first_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Записывает в лог время от запуска до первого обновления"""
+        if self.first_update_logged:
+            return
+        self.first_update_logged = True
+        logger.info("Time to first update: %.3fs", time.monotonic() - self.started_at)
+    
+    @staticmethod
+    def _build_request() -> HTTPXRequest:
+        """Создает общий пул соединений для исходящих запросов к Bot API"""
+        return HTTPXRequest(
+            connection_pool_size=config.CONNECTION_POOL_SIZE,
+            pool_timeout=config.POOL_TIMEOUT,
+            connect_timeout=config.CONNECT_TIMEOUT,
+            read_timeout=config.READ_TIMEOUT,
+            write_timeout=config.WRITE_TIMEOUT,
+            http_version=config.HTTP_VERSION
+        )
+    
+    @staticmethod
+    def _build_get_updates_request() -> HTTPXRequest:
+        """Создает отдельное соединение для get_updates"""
+        return HTTPXRequest(
+            connection_pool_size=config.GET_UPDATES_POOL_SIZE,
+            pool_timeout=config.POOL_TIMEOUT,
+            connect_timeout=config.CONNECT_TIMEOUT,
+            read_timeout=config.GET_UPDATES_READ_TIMEOUT,
+            write_timeout=config.WRITE_TIMEOUT,
+            http_version=config.HTTP_VERSION
+        )
     
     async def begin_notif_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /begin_notif"""
@@ -33,11 +202,16 @@ class AnnoyingBot:
             if len(context.args) < 3:
                 await update.message.reply_text(
                     "❌ Неправильный формат команды!\n\n"
-                    "Использование: /begin_notif <сообщение> <интервал_в_минутах> <время_начала> [@username1 @username2 ...]\n\n"
+                    "Использование: /begin_notif <сообщение> <интервал_в_минутах> <время_начала> [@username1 @username2 ...] [tz=Область/Город]\n"
+                    "Вместо времени начала можно указать окна HH:MM-HH:MM и дни недели days=пн-пт,\n"
+                    "а вместо интервала и времени — правило cron <минута> <час> <день> <месяц> <день_недели>\n\n"
                     "Пример: /begin_notif \"Пора пить воду!\" 30 09:00\n"
                     "Пример с тегами: /begin_notif \"Пора пить воду!\" 30 09:00 @user1 @user2\n"
-                    "Пример без кавычек: /begin_notif sosal 10 10:00 @user1 @user2\n\n"
-                    "Время указывается в формате HH:MM по Москве\n"
+                    "Пример без кавычек: /begin_notif sosal 10 10:00 @user1 @user2\n"
+                    "Пример с часовым поясом: /begin_notif \"Пора пить воду!\" 30 09:00 tz=Europe/Berlin\n"
+                    "Пример с окнами: /begin_notif \"Пора пить воду!\" 30 09:00-13:00 14:00-18:00 days=пн-пт\n"
+                    "Пример с правилом: /begin_notif \"Пора пить воду!\" cron */30 9-18 * * пн-пт\n\n"
+                    "Время указывается в формате HH:MM, по умолчанию по Москве\n"
                     "Теги пользователей опциональны и работают только в группах"
                 )
                 return
@@ -47,8 +221,66 @@ class AnnoyingBot:
             start_time = None
             interval_index = -1
             time_index = -1
+            timezone = MOSCOW_TZ
+            windows = []
+            weekdays = ALL_WEEKDAYS
+            # Служебные аргументы, которые не входят в текст сообщения
+            option_indices = set()
+            
+            # Правило повторения: слово cron и пять полей после него
+            cron = None
+            cron_index = next((i for i, arg in enumerate(context.args) if arg.lower() == 'cron'), -1)
+            if cron_index >= 0:
+                cron = " ".join(context.args[cron_index + 1:cron_index + 6])
+                try:
+                    rule = CronRule(cron)
+                except ValueError as e:
+                    await update.message.reply_text(
+                        f"❌ Неверное правило повторения: {e}\n"
+                        "Формат: cron <минута> <час> <день> <месяц> <день_недели>, например cron */30 9-18 * * пн-пт"
+                    )
+                    return
+                if rule.next_fire(int(time.time())) is None:
+                    await update.message.reply_text(f"❌ Правило {rule.describe()} никогда не срабатывает")
+                    return
+                cron = rule.expression
+                option_indices.update(range(cron_index, cron_index + 6))
             
             for i, arg in enumerate(context.args):
+                if i in option_indices:
+                    continue
+                
+                # Проверяем, является ли аргумент часовым поясом (tz=Область/Город)
+                if arg.startswith('tz='):
+                    timezone = arg[3:]
+                    option_indices.add(i)
+                    continue
+                
+                # Проверяем, являются ли аргумент днями недели (days=пн-пт)
+                if arg.startswith('days='):
+                    weekdays = parse_weekdays(arg[5:])
+                    if not weekdays:
+                        await update.message.reply_text(
+                            f"❌ Неизвестные дни недели: {arg[5:]}\n"
+                            "Укажите их как days=пн-пт или days=mon,wed,fri"
+                        )
+                        return
+                    option_indices.add(i)
+                    continue
+                
+                # С правилом повторения интервал, время и окна не ищем
+                if cron is not None:
+                    continue
+                
+                # Проверяем, является ли аргумент окном (формат HH:MM-HH:MM)
+                window = parse_window(arg)
+                if window is not None:
+                    windows.append(window)
+                    option_indices.add(i)
+                    if time_index < 0:
+                        time_index = i
+                    continue
+                
                 # Проверяем, является ли аргумент интервалом (число)
                 if interval_minutes is None:
                     try:
@@ -65,14 +297,42 @@ class AnnoyingBot:
                     start_time = arg
                     time_index = i
             
+            # Время начала и окна взаимоисключающие: иначе одно из них молча потерялось бы
+            if windows and start_time is not None:
+                await update.message.reply_text(
+                    f"❌ Укажите либо время начала {start_time}, либо окна HH:MM-HH:MM, но не то и другое вместе.\n"
+                    "Пример с окнами: /begin_notif \"Пора пить воду!\" 30 09:00-13:00 14:00-18:00"
+                )
+                return
+            
             # Проверяем, что нашли интервал и время
-            if interval_minutes is None:
+            if cron is not None:
+                # Напоминание отправляется в каждую совпавшую с правилом минуту
+                interval_minutes = 1
+                start_time = "00:00"
+            elif interval_minutes is None:
                 await update.message.reply_text("❌ Не найден интервал! Укажите положительное число для интервала в минутах.")
                 return
-            
-            if start_time is None:
+            elif windows:
+                # Уведомления возобновляются с начала ближайшего окна
+                start_time = format_minute(windows[0][0])
+            elif start_time is None:
                 await update.message.reply_text("❌ Не найдено время! Укажите время в формате HH:MM (например, 09:00)")
                 return
+            else:
+                start_hour, start_minute = map(int, start_time.split(':'))
+                windows = [default_window(start_hour * 60 + start_minute, config.DEFAULT_END_HOUR)]
+            
+            # Проверяем часовой пояс по базе IANA; каталог (tz=Europe) или слишком
+            # длинное имя дают OSError
+            try:
+                get_zone(timezone)
+            except (ZoneInfoNotFoundError, ValueError, OSError):
+                await update.message.reply_text(
+                    f"❌ Неизвестный часовой пояс: {timezone}\n"
+                    "Укажите его в формате tz=Область/Город (например, tz=Europe/Berlin)"
+                )
+                return
             
             # Проверяем порядок: интервал должен быть перед временем
             if interval_index > time_index:
@@ -81,27 +341,21 @@ class AnnoyingBot:
             
             # Собираем сообщение и теги
             message_parts = []
-            tagged_users = []
+            usernames = []
             
             for i, arg in enumerate(context.args):
-                if i == interval_index or i == time_index:
-                    continue  # Пропускаем интервал и время
+                if i in (interval_index, time_index) or i in option_indices:
+                    continue  # Пропускаем интервал, время, окна и параметры
                 
                 if arg.startswith('@'):
                     # Это тег пользователя
-                    username = arg[1:]  # Убираем @
-                    try:
-                        # Пытаемся найти пользователя по username
-                        user = await context.bot.get_chat_member(update.effective_chat.id, f"@{username}")
-                        tagged_users.append(user.user.id)
-                    except Exception as e:
-                        logger.warning(f"Could not find user with username @{username}: {e}")
-                        # Сохраняем username без @ для последующего тегания
-                        tagged_users.append(username)
+                    usernames.append(arg[1:])  # Убираем @
                 else:
                     # Это часть сообщения
                     message_parts.append(arg)
             
+            tagged_users = await self._resolve_usernames(context, update.effective_chat.id, usernames)
+            
             # Собираем сообщение
             message = " ".join(message_parts)
             
@@ -115,17 +369,22 @@ class AnnoyingBot:
             message_thread_id = update.message.message_thread_id if update.message.message_thread_id else None
             
             await self.notification_manager.start_notification(
-                chat_id, message, interval_minutes, start_time, tagged_users, message_thread_id
+                chat_id, message, interval_minutes, start_time, tagged_users, message_thread_id,
+                timezone=timezone, windows=windows, weekdays=weekdays, cron=cron
             )
             
             # Формируем ответное сообщение
             response_text = (
                 f"✅ Уведомления запущены!\n\n"
                 f"📝 Сообщение: {message}\n"
-                f"⏰ Интервал: каждые {interval_minutes} минут\n"
-                f"🕐 Время начала: {start_time} (МСК)\n"
-                f"🕑 Время окончания: 02:00 следующего дня (МСК)\n\n"
             )
+            if cron is not None:
+                response_text += f"⏰ Расписание: {rule.describe()} ({self._timezone_label(timezone)})\n\n"
+            else:
+                response_text += (
+                    f"⏰ Интервал: каждые {interval_minutes} минут\n"
+                    f"🕐 Окна отправки: {ActiveWindows(windows, weekdays).describe()} ({self._timezone_label(timezone)})\n\n"
+                )
             
             if tagged_users:
                 response_text += f"👥 Тегированные пользователи: {len(tagged_users)}\n"
@@ -138,38 +397,80 @@ class AnnoyingBot:
             await update.message.reply_text(response_text)
             
         except Exception as e:
-            logger.error(f"Error in begin_notif command: {e}")
+            logger.error("Error in begin_notif command: %s", e)
             await update.message.reply_text("❌ Произошла ошибка при запуске уведомлений")
     
+    @staticmethod
+    def _describe_windows(notification) -> str:
+        """Описание окон отправки уведомления"""
+        windows = notification.get('compiled_windows')
+        if windows is None:
+            start = notification['start_hour'] * 60 + notification['start_minute']
+            windows = ActiveWindows(notification.get('windows') or [default_window(start, config.DEFAULT_END_HOUR)],
+                                    notification.get('weekdays', ALL_WEEKDAYS))
+        return windows.describe()
+    
+    @staticmethod
+    def _timezone_label(timezone: str) -> str:
+        """Подпись часового пояса для ответов бота"""
+        if not timezone or timezone == MOSCOW_TZ:
+            return "МСК"
+        return timezone
+    
+    async def _resolve_usernames(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int, usernames):
+        """Превращает username в user_id: сначала по кэшу, остальные запрашивает параллельно"""
+        tagged_users = [self.username_cache.get(username) for username in usernames]
+        unresolved = [i for i, user_id in enumerate(tagged_users) if user_id is None]
+        
+        if unresolved:
+            results = await asyncio.gather(
+                *(context.bot.get_chat_member(chat_id, f"@{usernames[i]}") for i in unresolved),
+                return_exceptions=True
+            )
+            for i, result in zip(unresolved, results):
+                username = usernames[i]
+                if isinstance(result, Exception):
+                    logger.warning("Could not find user with username @%s: %s", username, result)
+                    # Сохраняем username без @ для последующего тегания
+                    tagged_users[i] = username
+                else:
+                    tagged_users[i] = result.user.id
+                    self.username_cache.remember(username, result.user.id)
+        
+        return tagged_users
+    
     async def stop_notif_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /stop_notif"""
         try:
-            chat_id = update.effective_chat.id
-            await self.notification_manager.stop_notification(chat_id)
+            await self.notification_manager.stop_notification(update.effective_chat.id)
             
             await update.message.reply_text("✅ Уведомления остановлены!")
             
         except Exception as e:
-            logger.error(f"Error in stop_notif command: {e}")
+            logger.error("Error in stop_notif command: %s", e)
             await update.message.reply_text("❌ Произошла ошибка при остановке уведомлений")
     
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /status"""
         try:
             chat_id = update.effective_chat.id
-            active_notifications = self.notification_manager.get_active_notifications()
+            notification = self.notification_manager.get(chat_id)
             
-            if chat_id in active_notifications:
-                notification = active_notifications[chat_id]
+            if notification is not None:
                 status = "🟢 Активны" if notification['active'] else "🟡 Приостановлены"
+                timezone_label = self._timezone_label(notification.get('timezone'))
                 
                 status_text = (
                     f"📊 Статус уведомлений: {status}\n\n"
                     f"📝 Сообщение: {notification['message']}\n"
-                    f"⏰ Интервал: каждые {notification['interval_minutes']} минут\n"
-                    f"🕐 Время начала: {notification['start_hour']:02d}:{notification['start_minute']:02d} (МСК)\n"
-                    f"🕑 Время окончания: 02:00 следующего дня (МСК)"
                 )
+                if notification.get('cron'):
+                    status_text += f"⏰ Расписание: cron {notification['cron']} ({timezone_label})"
+                else:
+                    status_text += (
+                        f"⏰ Интервал: каждые {notification['interval_minutes']} минут\n"
+                        f"🕐 Окна отправки: {self._describe_windows(notification)} ({timezone_label})"
+                    )
                 
                 # Добавляем информацию о топике
                 if notification.get('message_thread_id'):
@@ -187,14 +488,14 @@ class AnnoyingBot:
                 await update.message.reply_text("📊 В этом чате нет активных уведомлений")
                 
         except Exception as e:
-            logger.error(f"Error in status command: {e}")
+            logger.error("Error in status command: %s", e)
             await update.message.reply_text("❌ Произошла ошибка при получении статуса")
     
     async def storage_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /storage - показывает информацию о хранилище"""
         try:
             storage_info = self.notification_manager.get_storage_info()
-            active_notifications = self.notification_manager.get_active_notifications()
+            active_count = len(self.notification_manager.notifications)
             
             if storage_info['exists']:
                 await update.message.reply_text(
@@ -202,19 +503,19 @@ class AnnoyingBot:
                     f"📁 Файл: {storage_info['file_path']}\n"
                     f"📊 Размер: {storage_info['size']} байт\n"
                     f"🔢 Сохранено уведомлений: {storage_info['notifications_count']}\n"
-                    f"🟢 Активных уведомлений: {len(active_notifications)}\n\n"
+                    f"🟢 Активных уведомлений: {active_count}\n\n"
                     f"✅ Хранилище работает корректно"
                 )
             else:
                 await update.message.reply_text(
                     f"💾 Информация о хранилище:\n\n"
                     f"📁 Файл: не найден\n"
-                    f"🟢 Активных уведомлений: {len(active_notifications)}\n\n"
+                    f"🟢 Активных уведомлений: {active_count}\n\n"
                     f"ℹ️ Хранилище будет создано при первом уведомлении"
                 )
                 
         except Exception as e:
-            logger.error(f"Error in storage command: {e}")
+            logger.error("Error in storage command: %s", e)
             await update.message.reply_text("❌ Произошла ошибка при получении информации о хранилище")
     
     async def clear_all_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -229,9 +530,51 @@ class AnnoyingBot:
             )
             
         except Exception as e:
-            logger.error(f"Error in clear_all command: {e}")
+            logger.error("Error in clear_all command: %s", e)
             await update.message.reply_text("❌ Произошла ошибка при очистке уведомлений")
     
+    async def lag_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /lag - запаздывание цикла событий и отправок (только для администраторов)"""
+        try:
+            await update.message.reply_text(self.lag_monitor.report())
+        except Exception as e:
+            logger.error("Error in lag command: %s", e)
+            await update.message.reply_text("❌ Произошла ошибка при получении статистики")
+    
+    async def perf_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /perf [секунды] - профилирование работающего бота (только для администраторов)"""
+        try:
+            try:
+                seconds = float(context.args[0]) if context.args else config.PERF_DEFAULT_SECONDS
+            except ValueError:
+                await update.message.reply_text("❌ Укажите длительность в секундах, например: /perf 10")
+                return
+            
+            if self.profiler.busy:
+                await update.message.reply_text("⏳ Профилирование уже запущено, дождитесь результата")
+                return
+            
+            seconds = min(max(seconds, 1.0), config.PERF_MAX_SECONDS)
+            await update.message.reply_text(f"⏱️ Профилирование на {seconds:.0f} с...")
+            try:
+                snapshot = await self.profiler.profile(seconds)
+            except ProfilerBusyError:
+                await update.message.reply_text("⏳ Профилирование уже запущено, дождитесь результата")
+                return
+            
+            await update.message.reply_text(
+                f"📊 Топ функций по накопленному времени за {snapshot.seconds:.0f} с:\n\n{snapshot.summary()}"
+            )
+            await update.message.reply_document(
+                document=snapshot.data,
+                filename=f"perf-{int(time.time())}.prof",
+                caption="Открыть: python -m pstats <файл> или snakeviz <файл>"
+            )
+            
+        except Exception as e:
+            logger.error("Error in perf command: %s", e)
+            await update.message.reply_text("❌ Произошла ошибка при профилировании")
+    
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /help"""
         help_text = """
@@ -239,12 +582,15 @@ class AnnoyingBot:
 
 *Доступные команды:*
 
-/begin\\_notif <сообщение> <интервал> <время\\_начала> [@username1 @username2 ...]
+/begin\\_notif <сообщение> <интервал> <время\\_начала | окна> [days=пн-пт] [@username1 @username2 ...] [tz=Область/Город]
 Запускает уведомления с указанными параметрами
 
 Пример: `/begin_notif "Пора пить воду!" 30 09:00`
 Пример с тегами: `/begin_notif "Пора пить воду!" 30 09:00 @user1 @user2`
 Пример без кавычек: `/begin_notif sosal 10 10:00 @user1 @user2`
+Пример с часовым поясом: `/begin_notif "Пора пить воду!" 30 09:00 tz=Europe/Berlin`
+Пример с окнами: `/begin_notif "Пора пить воду!" 30 09:00-13:00 14:00-18:00 days=пн-пт`
+Пример с правилом: `/begin_notif "Пора пить воду!" cron */30 9-18 * * пн-пт`
 
 /stop\\_notif
 Полностью останавливает уведомления
@@ -263,19 +609,23 @@ class AnnoyingBot:
 
 *Как это работает:*
 • Бот отправляет сообщение каждые N минут
-• Работает с указанного времени до 02:00 следующего дня
+• Работает с указанного времени до 02:00 следующего дня или в заданных окнах
 • В личных чатах: если вы отвечаете на любое сообщение, уведомления приостанавливаются до следующего времени начала
 • В группах: если указаны тегированные пользователи, бот тегает их в сообщениях
 • Когда все тегированные пользователи ответят, теги прекращаются до следующего времени начала
 • **Все уведомления отправляются в тот же топик, откуда была вызвана команда**
-• Время указывается по Москве (МСК)
+• Время указывается по Москве (МСК), если не задан часовой пояс tz=
 • **Уведомления сохраняются и восстанавливаются при перезагрузке бота**
 
 *Параметры:*
 • <сообщение> - текст для отправки
 • <интервал> - интервал в минутах (положительное число)
 • <время\\_начала> - время в формате HH:MM (например, 09:00)
+• <окна> - вместо времени начала: одно или несколько окон HH:MM-HH:MM (например, 09:00-18:00)
+• [days=пн-пт] - опциональные дни недели, в которые действуют окна
+• cron <минута> <час> <день> <месяц> <день\\_недели> - правило повторения вместо интервала и времени
 • [@username1 @username2 ...] - опциональные теги пользователей (только для групп)
+• [tz=Область/Город] - опциональный часовой пояс чата (например, tz=Asia/Yekaterinburg)
 
 *Особенности:*
 • 💾 Все уведомления автоматически сохраняются в файл
@@ -293,56 +643,95 @@ class AnnoyingBot:
             chat_id = update.effective_chat.id
             user_id = update.effective_user.id
             username = update.effective_user.username
+            message_thread_id = update.message.message_thread_id if update.message.is_topic_message else None
             
-            # Проверяем, есть ли активные уведомления в этом чате
-            active_notifications = self.notification_manager.get_active_notifications()
-            if chat_id in active_notifications:
-                notification = active_notifications[chat_id]
-                
+            # Фильтр уже проверил наличие уведомлений, но чат мог быть очищен после проверки;
+            # уведомление читается под блокировкой чата, поэтому оно не устарело
+            notification = self.notification_manager.get(chat_id)
+            if notification is not None:
                 # Если это групповой чат и есть тегированные пользователи
                 if update.effective_chat.type in ['group', 'supergroup'] and notification.get('tagged_users'):
-                    # Обрабатываем ответ пользователя (передаем username)
-                    self.notification_manager.handle_user_response(chat_id, user_id, username)
+                    # Обновляем кэш упоминаний: текст напоминания пересоберется только при изменении
+                    self.notification_manager.update_member_cache(
+                        chat_id, user_id, username, update.effective_user.first_name
+                    )
                     
-                    # Проверяем, ответили ли все тегированные пользователи
-                    responded_users = notification.get('responded_users', set())
-                    tagged_users = set(notification['tagged_users'])
+                    # Обрабатываем ответ пользователя (передаем username)
+                    all_responded = self.notification_manager.handle_user_response(chat_id, user_id, username)
                     
-                    if responded_users == tagged_users:
-                        await update.message.reply_text(
+                    # Подтверждения объединяются: не больше одного статуса в чате за окно
+                    if all_responded:
+                        await self.acknowledgements.acknowledge(
+                            chat_id,
                             "✅ Все тегированные пользователи ответили!\n\n"
                             "⏸️ Уведомления приостановлены до следующего времени начала\n"
-                            "💾 Состояние сохранено в хранилище"
+                            "💾 Состояние сохранено в хранилище",
+                            message_thread_id,
+                            final=True
                         )
-                    else:
-                        remaining = sum(1 for u in tagged_users if u not in responded_users)
-                        await update.message.reply_text(
-                            f"👥 Ответ засчитан! Осталось ответить: {remaining} пользователей"
+                    elif notification['active']:
+                        responded_users = notification.get('responded_users', set())
+                        remaining = sum(1 for u in notification['tagged_users'] if u not in responded_users)
+                        await self.acknowledgements.acknowledge(
+                            chat_id,
+                            f"👥 Ответ засчитан! Осталось ответить: {remaining} пользователей",
+                            message_thread_id
                         )
                 else:
                     # Для личных чатов или групп без тегов - приостанавливаем уведомления
+                    was_active = notification['active']
                     self.notification_manager.pause_notifications(chat_id, user_id)
                     
-                    await update.message.reply_text(
-                        "⏸️ Уведомления приостановлены до следующего времени начала!\n\n"
-                        "💡 Уведомления возобновятся автоматически в указанное время начала\n"
-                        "💾 Состояние сохранено в хранилище"
-                    )
-            else:
-                await update.message.reply_text(
-                    "👋 Привет! Я Annoying Bot.\n\n"
-                    "💡 Используйте /help для получения справки по командам\n"
-                    "💾 Все уведомления сохраняются и восстанавливаются при перезагрузке"
-                )
+                    # Подтверждаем только первую приостановку в цикле
+                    if was_active:
+                        await self.acknowledgements.acknowledge(
+                            chat_id,
+                            "⏸️ Уведомления приостановлены до следующего времени начала!\n\n"
+                            "💡 Уведомления возобновятся автоматически в указанное время начала\n"
+                            "💾 Состояние сохранено в хранилище",
+                            message_thread_id,
+                            final=True
+                        )
                 
         except Exception as e:
-            logger.error(f"Error handling message: {e}")
+            logger.error("Error handling message: %s", e)
+    
+    async def greeting_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик сообщений в личных чатах без уведомлений"""
+        try:
+            await update.message.reply_text(
+                "👋 Привет! Я Annoying Bot.\n\n"
+                "💡 Используйте /help для получения справки по командам\n"
+                "💾 Все уведомления сохраняются и восстанавливаются при перезагрузке"
+            )
+        except Exception as e:
+            logger.error("Error sending greeting: %s", e)
     
     def run(self):
         """Запускает бота"""
-        logger.info("Starting Annoying Bot...")
-        self.application.run_polling(allowed_updates=Update.ALL_TYPES)
+        if config.USE_WEBHOOK:
+            # Без публичного адреса PTB построил бы адрес из WEBHOOK_LISTEN, и Telegram отклонил бы setWebhook
+            if not config.WEBHOOK_URL:
+                raise ValueError("WEBHOOK_URL must be set to a public HTTPS URL when USE_WEBHOOK is enabled")
+            logger.info("Starting Annoying Bot with webhook on %s:%s/%s...", config.WEBHOOK_LISTEN, config.WEBHOOK_PORT, config.WEBHOOK_PATH)
+            self.application.run_webhook(
+                listen=config.WEBHOOK_LISTEN,
+                port=config.WEBHOOK_PORT,
+                url_path=config.WEBHOOK_PATH,
+                webhook_url=config.WEBHOOK_URL,
+                secret_token=config.WEBHOOK_SECRET_TOKEN,
+                max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=self.ALLOWED_UPDATES
+            )
+        else:
+            logger.info("Starting Annoying Bot...")
+            self.application.run_polling(allowed_updates=self.ALLOWED_UPDATES)
 
 if __name__ == "__main__":
-    bot = AnnoyingBot()
-    bot.run() 
\ No newline at end of file
+    # Логи пишутся через очередь в отдельном потоке, чтобы не блокировать цикл событий
+    log_listener = setup_logging(config.LOG_LEVEL, config.LOG_JSON, parse_sample_rates(config.LOG_SAMPLE_RATES))
+    try:
+        bot = AnnoyingBot()
+        bot.run()
+    finally:
+        log_listener.stop() 
\ No newline at end of file
@@ -6,8 +6,91 @@ load_dotenv()
 # Telegram Bot Token
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
+# Адрес Bot API; для нагрузочных тестов — локальный fake_telegram_server.py
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL', 'https://api.telegram.org/bot')
+
+# Файл хранилища уведомлений (журнал доставки лежит рядом)
+STORAGE_FILE = os.getenv('STORAGE_FILE', 'notifications.json')
+
 # Moscow timezone
 MOSCOW_TZ = 'Europe/Moscow'
 
 # Default notification end time (02:00 next day)
-DEFAULT_END_HOUR = 2 
\ No newline at end of file
+DEFAULT_END_HOUR = 2 
+
+# Пул HTTP-соединений для исходящих запросов (отправка напоминаний и ответов)
+CONNECTION_POOL_SIZE = int(os.getenv('CONNECTION_POOL_SIZE', '64'))
+POOL_TIMEOUT = float(os.getenv('POOL_TIMEOUT', '10.0'))
+CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT', '5.0'))
+READ_TIMEOUT = float(os.getenv('READ_TIMEOUT', '10.0'))
+WRITE_TIMEOUT = float(os.getenv('WRITE_TIMEOUT', '10.0'))
+
+# Версия HTTP: '1.1' или '2' (для HTTP/2 нужен пакет httpx[http2])
+HTTP_VERSION = os.getenv('HTTP_VERSION', '1.1')
+
+# Отдельное соединение для get_updates, чтобы long polling не занимал общий пул
+GET_UPDATES_POOL_SIZE = int(os.getenv('GET_UPDATES_POOL_SIZE', '1'))
+GET_UPDATES_READ_TIMEOUT = float(os.getenv('GET_UPDATES_READ_TIMEOUT', '30.0'))
+
+# В группах с тегами обрабатывать только сообщения тегированных пользователей
+FILTER_UNTAGGED_AUTHORS = os.getenv('FILTER_UNTAGGED_AUTHORS', 'true').lower() in ('1', 'true', 'yes')
+
+# Окно объединения подтверждений ответов: не больше одного статуса в чате за окно, сек
+ACK_WINDOW_SECONDS = float(os.getenv('ACK_WINDOW_SECONDS', '30'))
+
+# Режим получения обновлений: webhook вместо long polling
+USE_WEBHOOK = os.getenv('USE_WEBHOOK', 'false').lower() in ('1', 'true', 'yes')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+# Публичный HTTPS-адрес webhook, доступный Telegram; обязателен при USE_WEBHOOK
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Сколько обновлений обрабатывать одновременно; обработчики команд и ответов одного чата
+# выполняются по очереди под блокировкой чата
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+
+# Файл кэша username -> user_id, пополняемого по сообщениям пользователей
+USERNAME_CACHE_FILE = os.getenv('USERNAME_CACHE_FILE', 'usernames.json')
+
+# Восстановление уведомлений при запуске: размер пачки и разнесение первых отправок, сек
+RESTORE_BATCH_SIZE = int(os.getenv('RESTORE_BATCH_SIZE', '100'))
+RESTORE_RAMP_SECONDS = float(os.getenv('RESTORE_RAMP_SECONDS', '30'))
+
+# Сколько ждать завершения текущих отправок при остановке бота, сек
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', '10'))
+
+# Журнал доставки: fsync после каждой записи и повтор неподтвержденных отправок после сбоя
+JOURNAL_FSYNC = os.getenv('JOURNAL_FSYNC', 'false').lower() in ('1', 'true', 'yes')
+JOURNAL_RESEND_UNCONFIRMED = os.getenv('JOURNAL_RESEND_UNCONFIRMED', 'false').lower() in ('1', 'true', 'yes')
+
+# Метрики в текстовом формате Prometheus на http://METRICS_HOST:METRICS_PORT/metrics (0 — выключены)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Администраторы бота (user_id через запятую): им доступны служебные команды
+ADMIN_IDS = [int(user_id) for user_id in os.getenv('ADMIN_IDS', '').replace(' ', '').split(',') if user_id]
+
+# Монитор запаздывания: частота замеров цикла событий, размер окна и пороги p95 для предупреждений, сек
+LAG_SAMPLE_INTERVAL = float(os.getenv('LAG_SAMPLE_INTERVAL', '0.5'))
+LAG_WINDOW = int(os.getenv('LAG_WINDOW', '1000'))
+LOOP_LAG_WARN_SECONDS = float(os.getenv('LOOP_LAG_WARN_SECONDS', '0.1'))
+SEND_LATENESS_WARN_SECONDS = float(os.getenv('SEND_LATENESS_WARN_SECONDS', '5'))
+SEND_DURATION_WARN_SECONDS = float(os.getenv('SEND_DURATION_WARN_SECONDS', '2'))
+
+# Профилирование командой /perf: длительность по умолчанию и максимальная, сек
+PERF_DEFAULT_SECONDS = float(os.getenv('PERF_DEFAULT_SECONDS', '10'))
+PERF_MAX_SECONDS = float(os.getenv('PERF_MAX_SECONDS', '60'))
+
+# Логирование: уровень, вывод в JSON и доля записей об отдельных отправках по модулям
+# (например "notification_manager=0.1" — писать каждую десятую)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_JSON = os.getenv('LOG_JSON', 'false').lower() in ('1', 'true', 'yes')
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+
+# Запись входящих обновлений (анонимизированных) в файл JSON lines для replay_updates.py;
+# соль задает псевдонимы id и username (без нее — случайная на каждый запуск)
+UPDATE_CAPTURE_FILE = os.getenv('UPDATE_CAPTURE_FILE', '')
+UPDATE_CAPTURE_SALT = os.getenv('UPDATE_CAPTURE_SALT', '')
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Локальная замена Telegram Bot API для нагрузочных тестов
+
+Поддерживает getMe, getUpdates (long polling), setWebhook/deleteWebhook
+с доставкой обновлений на webhook бота, sendMessage, editMessageText,
+sendDocument и getChatMember. Задержка ответа, доля ошибок (429 с
+retry_after, 403, 5xx) и ограничения частоты отправки настраиваются.
+
+Бот направляется на сервер переменной TELEGRAM_BASE_URL, например
+TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot. Обновления добавляются
+методом push_update или POST-запросом на /fake/updates (объект или список).
+
+Пример:
+    python fake_telegram_server.py --port 8081 --latency 0.05 --error-429 0.01 --chat-rate 1
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from collections import Counter, deque
+from email.parser import BytesParser
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {
+    'id': 100000001,
+    'is_bot': True,
+    'first_name': 'Fake Bot',
+    'username': 'fake_annoying_bot',
+    'can_join_groups': True,
+    'can_read_all_group_messages': False,
+    'supports_inline_queries': False,
+}
+
+# Методы, отправляющие сообщения: на них действуют ограничения частоты
+SEND_METHODS = {'sendmessage', 'editmessagetext', 'senddocument'}
+# Методы, в которые внедряются ошибки
+FAULT_METHODS = SEND_METHODS | {'getchatmember'}
+# Строковые параметры PTB передает без JSON-кодирования
+STRING_PARAMETERS = {'text', 'caption', 'parse_mode', 'url', 'secret_token'}
+
+ERRORS = {
+    403: "Forbidden: bot was blocked by the user",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+}
+REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 409: 'Conflict',
+           429: 'Too Many Requests', 500: 'Internal Server Error', 502: 'Bad Gateway'}
+
+class _ApiError(Exception):
+    def __init__(self, code: int, description: str):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+
+class _TokenBucket:
+    """Ограничение частоты: rate запросов в секунду с запасом burst"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Забирает токен; если его нет — возвращает, сколько секунд ждать"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+def _parse_value(name: str, value: str):
+    if name in STRING_PARAMETERS:
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+def _parse_body(headers: Dict[str, str], body: bytes) -> Dict:
+    """Разбирает параметры запроса: JSON, форма или multipart (файлы пропускаются)"""
+    content_type = headers.get('content-type', '')
+    if not body:
+        return {}
+    if content_type.startswith('application/json'):
+        return json.loads(body)
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+        parameters = {}
+        for part in message.get_payload():
+            name = part.get_param('name', header='content-disposition')
+            if name and part.get_filename() is None:
+                parameters[name] = _parse_value(name, part.get_payload(decode=True).decode('utf-8'))
+        return parameters
+    return {name: _parse_value(name, value) for name, value in parse_qsl(body.decode('utf-8'))}
+
+class FakeTelegramServer:
+    """HTTP-сервер с подмножеством Bot API
+
+    error_rates — доля ответов с ошибкой по кодам (429, 403, 500, 502) для
+    отправок и getChatMember. global_rate и chat_rate — ограничения
+    частоты отправок в секунду на весь сервер и на чат (0 — без
+    ограничения); при превышении отвечает 429 с retry_after. on_request
+    вызывается для каждого запроса к методу до задержки и ошибок.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rates: Optional[Dict[int, float]] = None, retry_after: int = 1,
+                 global_rate: float = 0.0, chat_rate: float = 0.0, chat_burst: float = 3.0, seed: int = 0,
+                 on_request: Optional[Callable[[str, Dict], None]] = None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rates = error_rates or {}
+        self.retry_after = retry_after
+        self.global_bucket = _TokenBucket(global_rate, max(global_rate, 1.0)) if global_rate > 0 else None
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._chat_buckets: Dict[int, _TokenBucket] = {}
+        self._random = random.Random(seed)
+        self.on_request = on_request
+
+        # Счетчики вызовов методов и ответов с ошибкой
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self._message_id = 0
+
+        self._next_update_id = 1
+        self._updates: Deque[Dict] = deque()
+        self._update_event = asyncio.Event()
+        self.webhook_url: Optional[str] = None
+        self._webhook_secret: Optional[str] = None
+        self._webhook_queue: Optional[asyncio.Queue] = None
+        self._webhook_workers: List[asyncio.Task] = []
+        self._webhook_client: Optional[httpx.AsyncClient] = None
+        self.webhook_failures = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    @property
+    def base_url(self) -> str:
+        """Значение для TELEGRAM_BASE_URL"""
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        """Запускает сервер в текущем цикле событий"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # При port=0 система выбирает свободный порт
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Fake Bot API listening on %s", self.base_url)
+
+    async def stop(self):
+        """Останавливает сервер и доставку на webhook"""
+        await self._stop_webhook()
+        if self._server is not None:
+            self._server.close()
+            # Открытые соединения (например, long polling) закрываем сами
+            for connection in list(self._connections):
+                connection.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def push_update(self, update: Dict) -> int:
+        """Добавляет обновление в очередь и возвращает его update_id"""
+        update = dict(update)
+        update['update_id'] = self._next_update_id
+        self._next_update_id += 1
+        if self._webhook_queue is not None:
+            self._webhook_queue.put_nowait(update)
+        else:
+            self._updates.append(update)
+            self._update_event.set()
+        return update['update_id']
+
+    @property
+    def pending_updates(self) -> int:
+        queued = self._webhook_queue.qsize() if self._webhook_queue is not None else 0
+        return len(self._updates) + queued
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Соединения keep-alive: клиент бота держит пул открытых соединений
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                parts = request_line.decode('latin-1').split()
+                status, payload = await self._dispatch(parts[1] if len(parts) > 1 else '/', headers, body)
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+    async def _dispatch(self, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict]:
+        url = urlsplit(target)
+        try:
+            if url.path == '/fake/updates':
+                updates = json.loads(body)
+                updates = updates if isinstance(updates, list) else [updates]
+                return 200, {'ok': True, 'result': [self.push_update(update) for update in updates]}
+            parameters = dict(parse_qsl(url.query))
+            parameters.update(_parse_body(headers, body))
+        except ValueError as e:
+            return 400, {'ok': False, 'error_code': 400, 'description': f"Bad Request: {e}"}
+
+        # Путь вида /bot<token>/<method>
+        segments = url.path.strip('/').split('/')
+        if len(segments) != 2 or not segments[0].startswith('bot'):
+            return 404, {'ok': False, 'error_code': 404, 'description': "Not Found"}
+        return await self.call(segments[1], parameters)
+
+    async def call(self, method: str, parameters: Dict) -> Tuple[int, Dict]:
+        """Выполняет метод Bot API без HTTP: код ответа и тело в формате Telegram"""
+        method = method.lower()
+        handler = getattr(self, f"_method_{method}", None)
+        if handler is None:
+            return 404, {'ok': False, 'error_code': 404, 'description': "Not Found: method not found"}
+
+        self.calls[method] += 1
+        if self.on_request is not None:
+            self.on_request(method, parameters)
+
+        if method != 'getupdates':
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        failure = self._inject_failure(method, parameters)
+        if failure is not None:
+            self.errors[failure[0]] += 1
+            return failure
+        try:
+            return 200, {'ok': True, 'result': await handler(parameters)}
+        except _ApiError as e:
+            self.errors[e.code] += 1
+            return e.code, {'ok': False, 'error_code': e.code, 'description': e.description}
+        except Exception as e:
+            # Ошибка обработчика не должна обрывать соединение или вызов RecordingBot
+            logger.exception("Fake Bot API method %s failed", method)
+            self.errors[500] += 1
+            return 500, {'ok': False, 'error_code': 500, 'description': f"{ERRORS[500]}: {e}"}
+
+    def _inject_failure(self, method: str, parameters: Dict) -> Optional[Tuple[int, Dict]]:
+        if method in SEND_METHODS:
+            wait = self._rate_limit_wait(parameters.get('chat_id'))
+            if wait > 0:
+                return self._too_many_requests(math.ceil(wait))
+        if method in FAULT_METHODS:
+            for code, rate in self.error_rates.items():
+                if rate > 0 and self._random.random() < rate:
+                    if code == 429:
+                        return self._too_many_requests(self.retry_after)
+                    return code, {'ok': False, 'error_code': code, 'description': ERRORS.get(code, "Error")}
+        return None
+
+    def _rate_limit_wait(self, chat_id) -> float:
+        if self.global_bucket is not None:
+            wait = self.global_bucket.take()
+            if wait > 0:
+                return wait
+        if self.chat_rate > 0 and chat_id is not None:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._chat_buckets[chat_id] = _TokenBucket(self.chat_rate, self.chat_burst)
+            return bucket.take()
+        return 0.0
+
+    @staticmethod
+    def _too_many_requests(retry_after: int) -> Tuple[int, Dict]:
+        return 429, {
+            'ok': False, 'error_code': 429,
+            'description': f"Too Many Requests: retry after {retry_after}",
+            'parameters': {'retry_after': retry_after},
+        }
+
+    def _message(self, parameters: Dict) -> Dict:
+        self._message_id += 1
+        chat_id = parameters.get('chat_id', 0)
+        message = {
+            'message_id': parameters.get('message_id') or self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if isinstance(chat_id, int) and chat_id > 0 else 'supergroup'},
+            'from': {key: BOT_USER[key] for key in ('id', 'is_bot', 'first_name', 'username')},
+        }
+        if parameters.get('text') is not None:
+            message['text'] = parameters['text']
+        if parameters.get('message_thread_id') is not None:
+            message['message_thread_id'] = parameters['message_thread_id']
+        return message
+
+    async def _method_getme(self, parameters: Dict):
+        return BOT_USER
+
+    async def _method_getupdates(self, parameters: Dict):
+        if self._webhook_queue is not None:
+            raise _ApiError(409, "Conflict: can't use getUpdates method while webhook is active")
+
+        # Обновления с id меньше offset подтверждены ботом
+        offset = int(parameters.get('offset') or 0)
+        while self._updates and self._updates[0]['update_id'] < offset:
+            self._updates.popleft()
+
+        deadline = time.monotonic() + float(parameters.get('timeout') or 0)
+        while not self._updates:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._update_event.clear()
+            try:
+                await asyncio.wait_for(self._update_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+        limit = int(parameters.get('limit') or 100)
+        return [update for _, update in zip(range(limit), self._updates)]
+
+    async def _method_setwebhook(self, parameters: Dict):
+        await self._stop_webhook()
+        self.webhook_url = parameters['url']
+        self._webhook_secret = parameters.get('secret_token')
+        self._webhook_queue = asyncio.Queue()
+        if parameters.get('drop_pending_updates'):
+            self._updates.clear()
+        while self._updates:
+            self._webhook_queue.put_nowait(self._updates.popleft())
+        self._webhook_client = httpx.AsyncClient(timeout=30.0)
+        self._webhook_workers = [
+            asyncio.create_task(self._deliver_webhooks())
+            for _ in range(int(parameters.get('max_connections') or 40))
+        ]
+        return True
+
+    async def _method_deletewebhook(self, parameters: Dict):
+        await self._stop_webhook()
+        if parameters.get('drop_pending_updates'):
+            self._updates.clear()
+        return True
+
+    async def _method_getwebhookinfo(self, parameters: Dict):
+        return {'url': self.webhook_url or '', 'has_custom_certificate': False,
+                'pending_update_count': self.pending_updates}
+
+    async def _method_sendmessage(self, parameters: Dict):
+        return self._message(parameters)
+
+    async def _method_editmessagetext(self, parameters: Dict):
+        return self._message(parameters)
+
+    async def _method_senddocument(self, parameters: Dict):
+        return self._message(parameters)
+
+    async def _method_getchatmember(self, parameters: Dict):
+        try:
+            user_id = int(parameters['user_id'])
+        except (KeyError, ValueError):
+            raise _ApiError(400, "Bad Request: invalid user_id specified")
+        return {
+            'status': 'member',
+            'user': {'id': user_id, 'is_bot': False, 'first_name': f"User {user_id}", 'username': f"user{user_id}"},
+        }
+
+    async def _stop_webhook(self):
+        for worker in self._webhook_workers:
+            worker.cancel()
+        await asyncio.gather(*self._webhook_workers, return_exceptions=True)
+        self._webhook_workers = []
+        if self._webhook_queue is not None:
+            # Недоставленные обновления снова доступны через getUpdates
+            while not self._webhook_queue.empty():
+                self._updates.append(self._webhook_queue.get_nowait())
+            self._webhook_queue = None
+        if self._webhook_client is not None:
+            await self._webhook_client.aclose()
+            self._webhook_client = None
+        self.webhook_url = None
+
+    async def _deliver_webhooks(self):
+        headers = {'X-Telegram-Bot-Api-Secret-Token': self._webhook_secret} if self._webhook_secret else {}
+        while True:
+            update = await self._webhook_queue.get()
+            # Как и Telegram, повторяем доставку, пока бот не ответит 2xx
+            for attempt in range(3):
+                try:
+                    response = await self._webhook_client.post(self.webhook_url, json=update, headers=headers)
+                    if response.status_code < 300:
+                        break
+                except httpx.HTTPError as e:
+                    logger.debug("Webhook delivery failed: %s", e)
+                await asyncio.sleep(0.5 * (attempt + 1))
+            else:
+                self.webhook_failures += 1
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Параметры сервера командной строки, общие с load_driver.py"""
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа, сек')
+    parser.add_argument('--jitter', type=float, default=0.0, help='случайная добавка к задержке до jitter сек')
+    parser.add_argument('--error-429', type=float, default=0.0, help='доля ответов 429')
+    parser.add_argument('--error-403', type=float, default=0.0, help='доля ответов 403')
+    parser.add_argument('--error-5xx', type=float, default=0.0, help='доля ответов 502')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after во внедренных 429, сек')
+    parser.add_argument('--global-rate', type=float, default=0.0, help='отправок в секунду на весь сервер (0 — без ограничения)')
+    parser.add_argument('--chat-rate', type=float, default=0.0, help='отправок в секунду на чат (0 — без ограничения)')
+
+def server_from_arguments(args: argparse.Namespace, **kwargs) -> FakeTelegramServer:
+    return FakeTelegramServer(
+        latency=args.latency, jitter=args.jitter,
+        error_rates={429: args.error_429, 403: args.error_403, 502: args.error_5xx},
+        retry_after=args.retry_after, global_rate=args.global_rate, chat_rate=args.chat_rate, **kwargs
+    )
+
+async def _serve(server: FakeTelegramServer):
+    await server.start()
+    print(f"🧪 Fake Bot API: TELEGRAM_BASE_URL={server.base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1', help='адрес сервера')
+    parser.add_argument('--port', type=int, default=8081, help='порт сервера')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    try:
+        asyncio.run(_serve(server_from_arguments(args, host=args.host, port=args.port)))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
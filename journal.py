@@ -0,0 +1,111 @@
+import os
+import logging
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+class DeliveryJournal:
+    """Журнал доставки напоминаний (write-ahead log)
+
+    Перед отправкой записывается намерение «I <chat_id> <slot>», после
+    отправки — отметка «D <chat_id> <slot>», где slot — запланированное время
+    отправки в секундах эпохи. Записи дописываются в конец файла одной
+    строкой, поэтому журнал дешев на горячем пути. После перезапуска
+    recover() показывает, какие отправки точно завершены, а какие могли
+    прерваться.
+    """
+
+    def __init__(self, journal_file: str, fsync: bool = False, compact_threshold: int = 1000):
+        self.journal_file = journal_file
+        self.fsync = fsync
+        self.compact_threshold = compact_threshold
+        self.pending: Dict[int, int] = {}
+        self.entries = 0
+        self._file = None
+
+    def _write(self, line: str):
+        if self._file is None:
+            self._file = open(self.journal_file, 'a', encoding='utf-8')
+        self._file.write(line)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.entries += 1
+
+    def record_intent(self, chat_id: int, slot: int):
+        """Записывает намерение отправить напоминание"""
+        self.pending[chat_id] = slot
+        self._write(f"I {chat_id} {slot}\n")
+
+    def mark_done(self, chat_id: int, slot: int):
+        """Отмечает отправку завершенной"""
+        if self.pending.get(chat_id) == slot:
+            del self.pending[chat_id]
+        self._write(f"D {chat_id} {slot}\n")
+
+    def forget(self, chat_id: int):
+        """Забывает незавершенное намерение чата (уведомление остановлено)"""
+        self.pending.pop(chat_id, None)
+
+    def recover(self) -> Dict[int, Tuple[int, bool]]:
+        """Читает журнал: chat_id -> (последний slot, отправка завершена)"""
+        state: Dict[int, Tuple[int, bool]] = {}
+        if not os.path.exists(self.journal_file):
+            return state
+
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    # Последняя строка могла оборваться при сбое
+                    if len(parts) != 3 or parts[0] not in ('I', 'D'):
+                        continue
+                    kind, chat_id, slot = parts[0], int(parts[1]), int(parts[2])
+                    previous = state.get(chat_id)
+                    if previous is None or slot > previous[0]:
+                        state[chat_id] = (slot, kind == 'D')
+                    elif slot == previous[0] and kind == 'D':
+                        state[chat_id] = (slot, True)
+        except Exception as e:
+            logger.error("Error reading delivery journal: %s", e)
+
+        return state
+
+    def needs_compaction(self) -> bool:
+        """Проверяет, пора ли сжать журнал"""
+        return self.entries >= self.compact_threshold
+
+    def compact(self):
+        """Оставляет в журнале только незавершенные намерения
+
+        Вызывается после полной записи хранилища, когда завершенные отправки
+        уже отражены в нем.
+        """
+        try:
+            self.close()
+            if not self.pending and not os.path.exists(self.journal_file):
+                # Журнала нет и писать в него нечего
+                self.entries = 0
+                return
+            tmp_file = f"{self.journal_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                for chat_id, slot in self.pending.items():
+                    f.write(f"I {chat_id} {slot}\n")
+            os.replace(tmp_file, self.journal_file)
+            self.entries = len(self.pending)
+        except Exception as e:
+            logger.error("Error compacting delivery journal: %s", e)
+
+    def close(self):
+        """Закрывает файл журнала"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        """Удаляет журнал"""
+        self.close()
+        self.pending.clear()
+        self.entries = 0
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
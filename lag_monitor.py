@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Sequence
+
+from metrics import default_registry
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = default_registry.histogram(
+    'notifier_event_loop_lag_seconds', 'Event loop lag sampled at a fixed interval',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+SEND_LATENESS = default_registry.histogram(
+    'notifier_send_lateness_seconds', 'Delay between planned and actual reminder send start'
+)
+
+PERCENTILES = (50, 95, 99)
+
+def _rank(count: int, percent: float) -> int:
+    """Индекс перцентиля в отсортированной выборке из count значений (ближайший ранг)"""
+    rank = max(int(count * percent / 100.0 + 0.5) - 1, 0)
+    return min(rank, count - 1)
+
+def percentile(sorted_samples: Sequence[float], percent: float) -> float:
+    """Перцентиль по отсортированной выборке (ближайший ранг)"""
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[_rank(len(sorted_samples), percent)]
+
+class _Series:
+    """Скользящее окно последних значений с порогом предупреждения по p95
+
+    Число значений выше порога ведется при добавлении, поэтому проверка
+    порога не сортирует окно: p95 выше порога, когда таких значений не
+    меньше, чем позиций от ранга p95 до конца окна.
+    """
+
+    def __init__(self, name: str, window: int, warn_p95: float):
+        self.name = name
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.warn_p95 = warn_p95
+        self.warned = False
+        self.over = 0
+
+    def add(self, value: float):
+        if len(self.samples) == self.samples.maxlen and self.samples[0] > self.warn_p95:
+            # Самое старое значение выше порога вытесняется из окна
+            self.over -= 1
+        self.samples.append(value)
+        if value > self.warn_p95:
+            self.over += 1
+
+    def percentiles(self) -> Dict[int, float]:
+        ordered = sorted(self.samples)
+        return {percent: percentile(ordered, percent) for percent in PERCENTILES}
+
+    def check(self) -> Optional[float]:
+        """Возвращает p95, если он впервые превысил порог; сбрасывается, когда p95 снова в норме"""
+        if not self.samples or self.warn_p95 <= 0:
+            return None
+        count = len(self.samples)
+        if self.over >= count - _rank(count, 95):
+            if not self.warned:
+                self.warned = True
+                # Сортировка нужна только для значения в предупреждении
+                return percentile(sorted(self.samples), 95)
+        else:
+            self.warned = False
+        return None
+
+class LagMonitor:
+    """Монитор запаздывания цикла событий и отправок
+
+    Раз в interval секунд измеряет, насколько позже запланированного
+    просыпается цикл событий. Для каждого напоминания записывает
+    запланированный и фактический момент начала отправки и длительность
+    запроса к Telegram: так видно, опаздывают ли напоминания из-за
+    загруженного цикла или из-за Telegram. При превышении порогов по p95
+    пишет предупреждение в лог.
+    """
+
+    def __init__(self, interval: float = 0.5, window: int = 1000,
+                 loop_lag_warn: float = 0.1, send_lateness_warn: float = 5.0, send_duration_warn: float = 2.0):
+        self.interval = interval
+        self.loop_lag = _Series('event loop lag', window, loop_lag_warn)
+        self.send_lateness = _Series('send lateness', window, send_lateness_warn)
+        self.send_duration = _Series('send duration', window, send_duration_warn)
+        self.max_loop_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запускает замеры в текущем цикле событий"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Останавливает замеры"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - expected, 0.0)
+            self.loop_lag.add(lag)
+            self.max_loop_lag = max(self.max_loop_lag, lag)
+            LOOP_LAG.observe(lag)
+            self._check(self.loop_lag)
+
+    def record_send(self, planned: float, started: float, duration: float):
+        """Записывает отправку: запланированный и фактический момент начала (секунды эпохи) и длительность"""
+        lateness = max(started - planned, 0.0)
+        self.send_lateness.add(lateness)
+        self.send_duration.add(duration)
+        SEND_LATENESS.observe(lateness)
+        self._check(self.send_lateness)
+        self._check(self.send_duration)
+
+    def _check(self, series: _Series):
+        p95 = series.check()
+        if p95 is not None:
+            logger.warning("%s p95 is %.3fs over the last %s samples (threshold %.3fs)",
+                           series.name, p95, len(series.samples), series.warn_p95)
+
+    def snapshot(self) -> Dict[str, Dict[int, float]]:
+        """Текущие перцентили всех рядов"""
+        return {
+            'loop_lag': self.loop_lag.percentiles(),
+            'send_lateness': self.send_lateness.percentiles(),
+            'send_duration': self.send_duration.percentiles(),
+        }
+
+    def report(self) -> str:
+        """Сводка для команды администратора"""
+        lines = ["📈 Запаздывание (p50 / p95 / p99, сек)", ""]
+        for title, series in (("Цикл событий", self.loop_lag),
+                              ("Начало отправки после плана", self.send_lateness),
+                              ("Запрос к Telegram", self.send_duration)):
+            if series.samples:
+                values = series.percentiles()
+                text = " / ".join(f"{values[percent]:.3f}" for percent in PERCENTILES)
+                warning = " ⚠️" if series.warned else ""
+                lines.append(f"{title}: {text} (замеров: {len(series.samples)}){warning}")
+            else:
+                lines.append(f"{title}: нет данных")
+        lines.append("")
+        lines.append(f"Максимальная задержка цикла: {self.max_loop_lag:.3f}")
+        return "\n".join(lines)
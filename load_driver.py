@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест бота против локального сервера Bot API
+
+Запускает fake_telegram_server, затем bot.py отдельным процессом с
+TELEGRAM_BASE_URL, указывающим на сервер, и подает синтетические
+обновления с заданной частотой: /status, /help и обычные сообщения в
+личных чатах. На каждое такое обновление бот отвечает одним сообщением;
+сквозная задержка — от постановки обновления в очередь сервера до
+прихода ответа бота в sendMessage.
+
+Пример:
+    python load_driver.py --updates 10000 --rate 2000 --mode webhook --latency 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from typing import Deque, Dict, List
+
+from fake_telegram_server import FakeTelegramServer, add_server_arguments, server_from_arguments
+from lag_monitor import percentile
+
+TEXTS = ["/status", "/help", "привет"]
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _update(index: int, chat_id: int) -> Dict:
+    text = TEXTS[index % len(TEXTS)]
+    message = {
+        'message_id': index + 1,
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private', 'first_name': f"User {chat_id}"},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': f"User {chat_id}", 'username': f"user{chat_id}"},
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+    return {'message': message}
+
+class LoadDriver:
+    """Подает обновления и сопоставляет их с ответами бота по чату (по порядку)"""
+
+    def __init__(self):
+        self.pushed_at: Dict[int, Deque[float]] = {}
+        self.latencies: List[float] = []
+        self.unexpected = 0
+        self.first_push = None
+        self.last_reply = None
+        self.ready = asyncio.Event()
+
+    def on_request(self, method: str, parameters: Dict):
+        if method in ('getupdates', 'setwebhook'):
+            self.ready.set()
+        if method != 'sendmessage':
+            return
+        pending = self.pushed_at.get(parameters.get('chat_id'))
+        if not pending:
+            self.unexpected += 1
+            return
+        self.last_reply = time.perf_counter()
+        self.latencies.append(self.last_reply - pending.popleft())
+
+    def push(self, server: FakeTelegramServer, index: int, chat_id: int):
+        now = time.perf_counter()
+        if self.first_push is None:
+            self.first_push = now
+        self.pushed_at.setdefault(chat_id, deque()).append(now)
+        server.push_update(_update(index, chat_id))
+
+async def _drive(args: argparse.Namespace) -> int:
+    driver = LoadDriver()
+    server = server_from_arguments(args, on_request=driver.on_request)
+    await server.start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ,
+                   BOT_TOKEN="123456:LOAD-TEST",
+                   TELEGRAM_BASE_URL=server.base_url,
+                   STORAGE_FILE=os.path.join(directory, 'notifications.json'),
+                   USERNAME_CACHE_FILE=os.path.join(directory, 'usernames.json'),
+                   METRICS_PORT='0',
+                   LOG_LEVEL=args.log_level)
+        if args.mode == 'webhook':
+            port = _free_port()
+            env.update(USE_WEBHOOK='true', WEBHOOK_LISTEN='127.0.0.1', WEBHOOK_PORT=str(port),
+                       WEBHOOK_PATH='telegram', WEBHOOK_URL=f"http://127.0.0.1:{port}/telegram",
+                       WEBHOOK_SECRET_TOKEN=secrets.token_hex(16))
+        else:
+            env['USE_WEBHOOK'] = 'false'
+
+        log_path = os.path.join(directory, 'bot.log')
+        with open(log_path, 'w') as log:
+            bot = subprocess.Popen([sys.executable, 'bot.py'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            await asyncio.wait_for(driver.ready.wait(), args.startup_timeout)
+            # После setWebhook бот уже слушает порт; даем ему закончить запуск
+            await asyncio.sleep(0.5)
+
+            step = 0.01
+            per_step = max(args.rate * step, 1.0)
+            started = time.perf_counter()
+            pushed = 0.0
+            for index in range(args.updates):
+                # Равномерная подача: отстаем — догоняем пачкой, опережаем — ждем
+                pushed += 1
+                if pushed >= per_step:
+                    pushed = 0.0
+                    delay = started + index / args.rate - time.perf_counter()
+                    await asyncio.sleep(max(delay, 0.0))
+                driver.push(server, index, 1 + index % args.chats)
+            push_seconds = time.perf_counter() - started
+
+            deadline = time.perf_counter() + args.timeout
+            while len(driver.latencies) < args.updates and time.perf_counter() < deadline:
+                await asyncio.sleep(0.05)
+        finally:
+            bot.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(asyncio.to_thread(bot.wait), 30)
+            except asyncio.TimeoutError:
+                bot.kill()
+            await server.stop()
+
+        if bot.returncode not in (0, -signal.SIGINT) or not driver.latencies:
+            with open(log_path) as log:
+                print(log.read()[-3000:])
+
+    latencies = sorted(driver.latencies)
+    answered = len(latencies)
+    print(f"📨 Подано обновлений: {args.updates} за {push_seconds:.2f} с ({args.updates / push_seconds:.0f}/с), "
+          f"режим: {args.mode}")
+    if answered:
+        elapsed = driver.last_reply - driver.first_push
+        print(f"✅ Ответов: {answered} ({answered / elapsed:.0f}/с), без ответа: {args.updates - answered}")
+        print("⏱  Сквозная задержка, мс: " + ", ".join(
+            f"p{percent} {percentile(latencies, percent) * 1000:.1f}" for percent in (50, 95, 99)
+        ) + f", max {latencies[-1] * 1000:.1f}")
+    else:
+        print("❌ Бот не ответил ни на одно обновление")
+    print(f"📊 Вызовы API: {dict(server.calls)}; внедренные ошибки: {dict(server.errors)}; "
+          f"неожиданных ответов: {driver.unexpected}; недоставленных webhook: {server.webhook_failures}")
+    return 0 if answered else 1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=5000, help='число обновлений')
+    parser.add_argument('--rate', type=float, default=1000.0, help='обновлений в секунду')
+    parser.add_argument('--chats', type=int, default=1000, help='число личных чатов')
+    parser.add_argument('--mode', choices=('polling', 'webhook'), default='polling', help='способ получения обновлений')
+    parser.add_argument('--timeout', type=float, default=30.0, help='сколько ждать ответов после подачи, сек')
+    parser.add_argument('--startup-timeout', type=float, default=30.0, help='сколько ждать запуска бота, сек')
+    parser.add_argument('--log-level', default='WARNING', help='уровень логирования бота')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_drive(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Атрибуты, которые есть у любой записи; все остальное пришло через extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sampled'}
+
+# Аргументы этих типов не меняются, пока запись ждет в очереди
+_IMMUTABLE_ARGS = (str, bytes, int, float, complex, type(None), datetime.date, datetime.time, datetime.timedelta)
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Разбирает строку вида "notification_manager=0.1,acknowledgements=0.5" """
+    rates = {}
+    for item in value.replace(' ', '').split(','):
+        if not item:
+            continue
+        name, _, rate = item.partition('=')
+        if not name or not rate:
+            raise ValueError(f"Invalid sample rate: {item}")
+        rates[name] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON: время, уровень, логгер, сообщение и поля из extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только часть записей, помеченных extra={'sampled': True}
+
+    Частота задается для модуля (имени логгера); остальные записи проходят
+    всегда. Выборка детерминированная: при частоте 0.1 проходит каждая
+    десятая запись модуля.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Частота 0.1 означает «каждая десятая запись»; 0 — не писать совсем
+        self.every = {name: round(1 / rate) if rate > 0 else 0 for name, rate in rates.items()}
+        self._counts: Dict[str, int] = {}
+        # Логировать могут и другие потоки (слушатель, профилировщик, библиотеки)
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False):
+            return True
+        every = self.every.get(record.name)
+        if every is None:
+            return True
+        if every == 0:
+            return False
+        with self._lock:
+            count = self._counts.get(record.name, 0)
+            self._counts[record.name] = count + 1
+        return count % every == 0
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Кладет запись в очередь как есть: аргументы форматируются в потоке слушателя
+
+    Стандартный QueueHandler.prepare форматирует сообщение в вызывающем
+    потоке, то есть в цикле событий. Записи с неизменяемыми аргументами
+    (строки, числа, даты) передаются в поток слушателя без копии. Остальные,
+    например словари параметров запросов в DEBUG-логах PTB, могут измениться
+    до записи, поэтому их сообщение форматируется сразу.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if not args or (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)):
+            return record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def setup_logging(level: str = 'INFO', json_format: bool = False,
+                  sample_rates: Optional[Dict[str, float]] = None, stream=None) -> logging.handlers.QueueListener:
+    """Настраивает корневой логгер на запись через очередь и запускает слушателя
+
+    Цикл событий только кладет запись в очередь; форматирование и запись
+    в поток выполняет отдельный поток. Слушателя нужно остановить перед
+    выходом, чтобы дописать оставшиеся записи.
+    """
+    output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    output.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,53 @@
+import html
+import re
+from typing import Optional, Tuple
+
+# Теги, которые Telegram принимает в режиме parse_mode='HTML'
+ALLOWED_TAGS = {
+    'b', 'strong', 'i', 'em', 'u', 'ins', 's', 'strike', 'del',
+    'span', 'tg-spoiler', 'tg-emoji', 'a', 'code', 'pre', 'blockquote'
+}
+
+TAG_RE = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9-]*)((?:\s+[^<>]*)?)>')
+BARE_AMPERSAND_RE = re.compile(r'&(?!(?:lt|gt|amp|quot|#\d+|#x[0-9a-fA-F]+);)')
+
+def is_valid_html(text: str) -> bool:
+    """Проверяет, что текст пройдет HTML-парсер Telegram без ошибок"""
+    if BARE_AMPERSAND_RE.search(text):
+        return False
+
+    stack = []
+    position = 0
+    for match in TAG_RE.finditer(text):
+        # Между тегами не должно быть «сырых» угловых скобок
+        if '<' in text[position:match.start()] or '>' in text[position:match.start()]:
+            return False
+        position = match.end()
+
+        closing, tag, _ = match.groups()
+        tag = tag.lower()
+        if tag not in ALLOWED_TAGS:
+            return False
+
+        if closing:
+            if not stack or stack.pop() != tag:
+                return False
+        else:
+            stack.append(tag)
+
+    if '<' in text[position:] or '>' in text[position:]:
+        return False
+
+    return not stack
+
+def prepare_message_markup(message: str, needs_html: bool) -> Tuple[str, Optional[str]]:
+    """Определяет один раз, как отправлять сообщение: возвращает (текст, parse_mode)
+
+    Корректная разметка сохраняется как есть. Некорректная экранируется, если
+    HTML нужен для упоминаний, иначе сообщение отправляется без разметки.
+    """
+    if is_valid_html(message):
+        return message, 'HTML'
+    if needs_html:
+        return html.escape(message, quote=False), 'HTML'
+    return message, None
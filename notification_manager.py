@@ -1,58 +1,266 @@
 import asyncio
+import html
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Optional, List
-import pytz
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from types import MappingProxyType
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional, List, Tuple, Mapping
 from telegram import Bot
 from telegram.error import TelegramError
 from storage import NotificationStorage
+from markup import prepare_message_markup
+from timeutils import Clock, ZoneTransitions, default_clock, get_zone
+from active_windows import ALL_WEEKDAYS, ActiveWindows, default_window, minute_of_week
+from recurrence import CronRule
+from metrics import default_registry
+from lag_monitor import LagMonitor
+from config import MOSCOW_TZ, DEFAULT_END_HOUR
 
 logger = logging.getLogger(__name__)
 
+NOTIFICATIONS = default_registry.gauge('notifier_notifications', 'Registered notifications by state', ['state'])
+TICK_LAG = default_registry.histogram('notifier_tick_lag_seconds', 'Delay between planned and actual notification checks')
+SEND_DURATION = default_registry.histogram('notifier_send_duration_seconds', 'Duration of reminder send_message calls')
+SENDS = default_registry.counter('notifier_sends_total', 'Reminder sends by result', ['result'])
+MEMBER_CACHE = default_registry.counter('notifier_member_cache_requests_total', 'Member mention lookups', ['result'])
+
 class NotificationManager:
-    def __init__(self, bot: Bot, storage_file: str = "notifications.json"):
+    def __init__(self, bot: Bot, storage_file: str = "notifications.json", journal_fsync: bool = False,
+                 clock: Optional[Clock] = None, lag_monitor: Optional[LagMonitor] = None):
         self.bot = bot
-        self.storage = NotificationStorage(storage_file)
+        # Общий источник времени: в бенчмарках подменяется виртуальными часами
+        self.clock = clock or default_clock
+        # Необязательный монитор: запланированное и фактическое время отправок
+        self.lag_monitor = lag_monitor
+        self.storage = NotificationStorage(storage_file, journal_fsync=journal_fsync)
+        self.journal = self.storage.journal
         self.active_notifications: Dict[int, Dict] = {}
-        self.moscow_tz = pytz.timezone('Europe/Moscow')
+        self._notifications_view = MappingProxyType(self.active_notifications)
+        # Блокировки чатов: изменения одного чата выполняются строго по очереди;
+        # число задач, которые держат или ждут блокировку, чтобы удалять ненужные
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_lock_users: Dict[int, int] = {}
+        # Кэш готовых упоминаний участников: (chat_id, user_id) -> HTML-упоминание
+        self.member_cache: Dict[Tuple[int, int], str] = {}
+        # Часовой пояс по умолчанию для уведомлений без собственного пояса
+        self.moscow_tz = get_zone(MOSCOW_TZ)
+        # Устанавливается при остановке: новые отправки не начинаются
+        self.closing = False
+        
+        # Число уведомлений по состоянию считает collect_metrics(); сборщик в реестре
+        # регистрирует владелец менеджера (бот), чтобы реестр не держал все менеджеры процесса
         
-        # Загружаем сохраненные уведомления при инициализации
-        self._load_saved_notifications()
+        # Сохраненные уведомления восстанавливаются в restore_notifications(),
+        # когда уже запущен цикл событий приложения
     
-    def _load_saved_notifications(self):
-        """Загружает сохраненные уведомления и восстанавливает задачи"""
+    async def restore_notifications(self, batch_size: int = 100, ramp_seconds: float = 0.0,
+                                    resend_unconfirmed: bool = False) -> int:
+        """Загружает сохраненные уведомления и восстанавливает задачи
+
+        Уведомления регистрируются пачками по batch_size, между пачками цикл
+        событий успевает обработать входящие обновления. Первые проверки
+        восстановленных уведомлений равномерно распределяются на ramp_seconds,
+        чтобы догоняющие напоминания не отправлялись все в одну секунду.
+        Отправки из журнала доставки учитываются в last_sent; прерванные
+        отправки повторяются только при resend_unconfirmed=True.
+        """
         try:
             saved_notifications = self.storage.load_notifications()
+            total = len(saved_notifications)
+            self._apply_journal(saved_notifications, resend_unconfirmed)
             
-            for chat_id, notification_data in saved_notifications.items():
+            for index, (chat_id, notification_data) in enumerate(saved_notifications.items()):
+                self._resolve_markup(notification_data)
+                self._resolve_zone(notification_data)
+                self._compile_windows(notification_data)
+                self._rule(notification_data)
                 self.active_notifications[chat_id] = notification_data
                 
                 # Создаем новую задачу для восстановленного уведомления
+                delay = ramp_seconds * index / total if ramp_seconds > 0 else 0.0
                 notification_data['task'] = asyncio.create_task(
-                    self._notification_loop(chat_id, notification_data)
+                    self._delayed_notification_loop(chat_id, notification_data, delay)
                 )
                 
-                logger.info(f"Restored notification for chat {chat_id}: {notification_data['message']}")
+                logger.debug("Restored notification for chat %s: %s", chat_id, notification_data['message'])
+                
+                if (index + 1) % batch_size == 0:
+                    await asyncio.sleep(0)
             
             if saved_notifications:
-                logger.info(f"Restored {len(saved_notifications)} notifications from storage")
+                logger.info("Restored %s notifications from storage", total)
+            return total
                 
         except Exception as e:
-            logger.error(f"Error loading saved notifications: {e}")
+            logger.error("Error loading saved notifications: %s", e)
+            return 0
+    
+    def _apply_journal(self, notifications: Dict[int, Dict], resend_unconfirmed: bool):
+        """Восстанавливает last_sent по журналу доставки и сжимает журнал"""
+        recovered = self.journal.recover()
+        if not recovered:
+            return
+        
+        skipped = resent = 0
+        for chat_id, (slot, done) in recovered.items():
+            notification_data = notifications.get(chat_id)
+            if notification_data is None:
+                continue
+            
+            if not done and resend_unconfirmed:
+                resent += 1
+                continue
+            
+            zone = get_zone(notification_data.get('timezone') or MOSCOW_TZ)
+            sent_at = datetime.fromtimestamp(slot, zone)
+            last_sent = notification_data.get('last_sent')
+            if last_sent is None or last_sent < sent_at:
+                notification_data['last_sent'] = sent_at
+            if not done:
+                skipped += 1
+        
+        # Журнал отражен в хранилище: сохраняем его и начинаем журнал заново
+        self.storage.save_notifications(notifications)
+        self.journal.pending.clear()
+        self.journal.compact()
+        logger.info("Recovered %s journal entries: %s unconfirmed sends skipped, %s will be resent", len(recovered), skipped, resent)
+    
+    async def _delayed_notification_loop(self, chat_id: int, notification_data: Dict, delay: float):
+        """Запускает цикл уведомлений после задержки"""
+        if delay > 0:
+            await self.clock.sleep(delay)
+        await self._notification_loop(chat_id, notification_data)
+    
+    def _reschedule(self, chat_id: int, notification_data: Dict):
+        """Перезапускает задачу уведомления после изменения его состояния или настроек
+
+        Приостановленное уведомление сразу переходит к ожиданию момента
+        возобновления вместо ежеминутных проверок.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Нет цикла событий (синхронный вызов): задача будет создана при запуске
+            return
+        
+        task = notification_data.get('task')
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        
+        notification_data['task'] = loop.create_task(self._notification_loop(chat_id, notification_data))
+    
+    def _resolve_zone(self, notification_data: Dict) -> ZoneTransitions:
+        """Привязывает к уведомлению часовой пояс и общую таблицу переходов
+
+        Зона разрешается один раз при создании или восстановлении уведомления,
+        поэтому проверки в цикле не обращаются к базе часовых поясов.
+        """
+        zone = get_zone(notification_data.get('timezone') or MOSCOW_TZ)
+        transitions = self.clock.transitions(zone)
+        notification_data['zone_transitions'] = transitions
+        return transitions
+    
+    def _transitions(self, notification_data: Dict) -> ZoneTransitions:
+        """Возвращает таблицу переходов часового пояса уведомления"""
+        transitions = notification_data.get('zone_transitions')
+        if transitions is None:
+            transitions = self._resolve_zone(notification_data)
+        return transitions
+    
+    def _compile_windows(self, notification_data: Dict) -> ActiveWindows:
+        """Компилирует окна уведомления в отсортированные интервалы минут недели"""
+        windows = notification_data.get('windows')
+        if not windows:
+            # По умолчанию — с времени начала до DEFAULT_END_HOUR следующего дня
+            start = notification_data['start_hour'] * 60 + notification_data['start_minute']
+            windows = [default_window(start, DEFAULT_END_HOUR)]
+        compiled = ActiveWindows(windows, notification_data.get('weekdays', ALL_WEEKDAYS))
+        notification_data['compiled_windows'] = compiled
+        return compiled
+    
+    def _windows(self, notification_data: Dict) -> ActiveWindows:
+        """Возвращает скомпилированные окна уведомления"""
+        compiled = notification_data.get('compiled_windows')
+        if compiled is None:
+            compiled = self._compile_windows(notification_data)
+        return compiled
+    
+    def _rule(self, notification_data: Dict) -> Optional[CronRule]:
+        """Возвращает скомпилированное правило повторения или None для интервальных уведомлений"""
+        expression = notification_data.get('cron')
+        if not expression:
+            return None
+        rule = notification_data.get('compiled_rule')
+        if rule is None:
+            rule = notification_data['compiled_rule'] = CronRule(expression)
+        return rule
+    
+    def _next_check_delay(self, notification_data: Dict) -> float:
+        """Пауза до следующей проверки: минута или время до срабатывания правила"""
+        rule = self._rule(notification_data)
+        if rule is None:
+            return 60
+        
+        transitions = self._transitions(notification_data)
+        now = self.clock.time()
+        fire = rule.next_fire(int(now) + transitions.offset_at(now))
+        if fire is None:
+            return 86400
+        return max(transitions.local_to_utc(fire) - now, 0.0)
+    
+    def _now(self, notification_data: Dict) -> datetime:
+        """Текущее время в часовом поясе уведомления"""
+        return self.clock.now(self._transitions(notification_data).zone)
+    
+    @asynccontextmanager
+    async def chat_lock(self, chat_id: int) -> AsyncIterator[None]:
+        """Удерживает блокировку чата для упорядочивания изменений его уведомлений
+
+        Блокировка не повторно входимая. Когда ее больше никто не держит и не
+        ждет, а уведомлений в чате нет, она удаляется из реестра.
+        """
+        lock = self._chat_locks.get(chat_id)
+        if lock is None:
+            lock = self._chat_locks[chat_id] = asyncio.Lock()
+        self._chat_lock_users[chat_id] = self._chat_lock_users.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            users = self._chat_lock_users[chat_id] - 1
+            if users:
+                self._chat_lock_users[chat_id] = users
+            else:
+                del self._chat_lock_users[chat_id]
+                if chat_id not in self.active_notifications:
+                    del self._chat_locks[chat_id]
     
     def _save_notifications(self):
         """Сохраняет текущие уведомления в хранилище"""
         try:
             self.storage.save_notifications(self.active_notifications)
         except Exception as e:
-            logger.error(f"Error saving notifications: {e}")
+            logger.error("Error saving notifications: %s", e)
         
     async def start_notification(self, chat_id: int, message: str, interval_minutes: int, start_time: str, 
-                                tagged_users: Optional[List[int]] = None, message_thread_id: Optional[int] = None):
-        """Запускает уведомления для чата (личного или группового)"""
+                                tagged_users: Optional[List[int]] = None, message_thread_id: Optional[int] = None,
+                                timezone: str = MOSCOW_TZ, windows: Optional[List[Tuple[int, int]]] = None,
+                                weekdays: int = ALL_WEEKDAYS, cron: Optional[str] = None):
+        """Запускает уведомления для чата (личного или группового)
+
+        Время начала и окна отправки считаются в часовом поясе timezone.
+        windows — окна (начало, конец) в минутах суток, по умолчанию одно окно
+        с времени начала до DEFAULT_END_HOUR следующего дня; weekdays —
+        маска дней недели, в которые окна действуют. cron — правило повторения
+        вида «минута час день месяц день_недели»; с ним окна и интервал не
+        используются, напоминание отправляется в каждую совпавшую минуту.
+        """
         try:
             # Парсим время начала (формат HH:MM)
             start_hour, start_minute = map(int, start_time.split(':'))
+            if not windows:
+                windows = [default_window(start_hour * 60 + start_minute, DEFAULT_END_HOUR)]
             
             notification_data = {
                 'message': message,
@@ -65,9 +273,21 @@ class NotificationManager:
                 'chat_id': chat_id,
                 'message_thread_id': message_thread_id,  # ID топика
                 'tagged_users': tagged_users or [],
-                'responded_users': set()  # Пользователи, которые ответили
+                'timezone': timezone,  # Часовой пояс чата (имя IANA)
+                'windows': list(windows),  # Окна отправки в минутах суток
+                'weekdays': weekdays,  # Маска дней недели (бит 0 — понедельник)
+                'cron': cron,  # Правило повторения вместо интервала и окон
+                'responded_users': set(),  # Пользователи, которые ответили
+                'render_version': 0,  # Версия текста напоминания
+                'rendered_text': None  # Кэш: (версия, готовый текст)
             }
             
+            # Проверяем разметку один раз, чтобы каждая отправка проходила с первой попытки
+            self._resolve_markup(notification_data)
+            self._resolve_zone(notification_data)
+            self._compile_windows(notification_data)
+            self._rule(notification_data)
+            
             # Останавливаем предыдущие уведомления если есть
             if chat_id in self.active_notifications:
                 await self.stop_notification(chat_id)
@@ -80,10 +300,10 @@ class NotificationManager:
             # Сохраняем в хранилище
             self._save_notifications()
             
-            logger.info(f"Started notifications for chat {chat_id} (topic: {message_thread_id}): {message} every {interval_minutes} minutes starting at {start_time}")
+            logger.info("Started notifications for chat %s (topic: %s): %s every %s minutes starting at %s (%s)", chat_id, message_thread_id, message, interval_minutes, start_time, timezone)
             
         except Exception as e:
-            logger.error(f"Error starting notification for chat {chat_id}: {e}")
+            logger.error("Error starting notification for chat %s: %s", chat_id, e)
             raise
     
     async def stop_notification(self, chat_id: int):
@@ -102,14 +322,19 @@ class NotificationManager:
             # Сохраняем изменения в хранилище
             self._save_notifications()
             
-            logger.info(f"Stopped notifications for chat {chat_id}")
+            # Записи журнала ключуются только chat_id: без сжатия отметки старого
+            # уведомления при восстановлении попали бы в last_sent нового в этом чате
+            self.journal.forget(chat_id)
+            self.journal.compact()
+            
+            logger.info("Stopped notifications for chat %s", chat_id)
     
     def pause_notifications(self, chat_id: int, user_id: Optional[int] = None):
         """Приостанавливает уведомления до следующего времени начала"""
         if chat_id in self.active_notifications:
             notification_data = self.active_notifications[chat_id]
             notification_data['active'] = False
-            notification_data['last_response_time'] = datetime.now(self.moscow_tz)
+            notification_data['last_response_time'] = self._now(notification_data)
             
             # Если указан пользователь и есть тегированные пользователи, добавляем его в список ответивших
             if user_id and notification_data.get('tagged_users'):
@@ -117,14 +342,22 @@ class NotificationManager:
                 # Сбрасываем список ответивших если все тегированные пользователи ответили
                 if notification_data['responded_users'] == set(notification_data['tagged_users']):
                     notification_data['responded_users'].clear()
+                self._bump_render_version(notification_data)
             
             # Сохраняем изменения в хранилище
             self._save_notifications()
             
-            logger.info(f"Paused notifications for chat {chat_id} until next start time")
+            # Вместо ежеминутных проверок ставим один таймер до возобновления
+            self._reschedule(chat_id, notification_data)
+            
+            logger.info("Paused notifications for chat %s until next start time", chat_id)
     
-    def handle_user_response(self, chat_id: int, user_id: int, username: str = None):
-        """Обрабатывает ответ пользователя в групповом чате"""
+    def handle_user_response(self, chat_id: int, user_id: int, username: str = None) -> bool:
+        """Обрабатывает ответ пользователя в групповом чате
+
+        Возвращает True, если этим ответом ответили все тегированные пользователи.
+        """
+        all_responded = False
         if chat_id in self.active_notifications:
             notification_data = self.active_notifications[chat_id]
             tagged_users = notification_data.get('tagged_users', [])
@@ -143,155 +376,301 @@ class NotificationManager:
                     changed = True
 
             if changed:
+                self._bump_render_version(notification_data)
                 # Если все тегированные пользователи ответили, приостанавливаем уведомления
                 if set(tagged_users) == responded_users:
                     notification_data['active'] = False
-                    notification_data['last_response_time'] = datetime.now(self.moscow_tz)
+                    notification_data['last_response_time'] = self._now(notification_data)
                     notification_data['responded_users'].clear()
-                    logger.info(f"All tagged users responded in chat {chat_id}, pausing notifications until next start time")
+                    all_responded = True
+                    self._reschedule(chat_id, notification_data)
+                    logger.info("All tagged users responded in chat %s, pausing notifications until next start time", chat_id)
                 else:
-                    logger.info(f"User {user_id} ({username}) responded in chat {chat_id}, {len(responded_users)}/{len(tagged_users)} users responded")
+                    logger.info("User %s (%s) responded in chat %s, %s/%s users responded", user_id, username, chat_id, len(responded_users), len(tagged_users))
                 self._save_notifications()
+        return all_responded
     
     async def _notification_loop(self, chat_id: int, notification_data: Dict):
         """Основной цикл отправки уведомлений"""
+        # Запланированный момент следующей проверки, для метрики запаздывания
+        planned_at = None
         while True:
             try:
-                now = datetime.now(self.moscow_tz)
-                
-                # Проверяем, нужно ли возобновить уведомления
+                # Приостановленное уведомление не тикает: один таймер до момента возобновления
                 if not notification_data['active'] and notification_data['last_response_time']:
-                    next_start = self._get_next_start_time(notification_data)
-                    if now >= next_start:
-                        notification_data['active'] = True
-                        notification_data['last_response_time'] = None
-                        
-                        # Сбрасываем список ответивших пользователей при возобновлении
-                        if notification_data.get('tagged_users'):
-                            notification_data['responded_users'].clear()
-                        
-                        # Сохраняем изменения в хранилище
-                        self._save_notifications()
-                        
-                        logger.info(f"Resumed notifications for chat {chat_id} at {next_start.strftime('%H:%M')}")
+                    delay = self._get_next_start_time(notification_data).timestamp() - self.clock.time()
+                    if delay > 0:
+                        planned_at = self.clock.time() + delay
+                        await self.clock.sleep(delay)
                 
-                if notification_data['active']:
-                    # Проверяем, находимся ли мы в активном временном окне
-                    if self._is_in_active_window(now, notification_data):
-                        # Проверяем, нужно ли отправить уведомление
-                        if self._should_send_notification(now, notification_data):
-                            await self._send_notification(chat_id, notification_data)
-                            notification_data['last_sent'] = now
+                # Изменения состояния чата упорядочены с обработчиками команд и ответов
+                async with self.chat_lock(chat_id):
+                    if self.closing:
+                        break
+                    
+                    # Запланированный момент этой проверки (нет у первой проверки)
+                    tick_planned, planned_at = planned_at, None
+                    if tick_planned is not None:
+                        TICK_LAG.observe(max(self.clock.time() - tick_planned, 0.0))
+                    
+                    now = self._now(notification_data)
+                    
+                    # Проверяем, нужно ли возобновить уведомления
+                    if not notification_data['active'] and notification_data['last_response_time']:
+                        next_start = self._get_next_start_time(notification_data)
+                        if now >= next_start:
+                            notification_data['active'] = True
+                            notification_data['last_response_time'] = None
+                            
+                            # Сбрасываем список ответивших пользователей при возобновлении
+                            if notification_data.get('tagged_users'):
+                                notification_data['responded_users'].clear()
+                                self._bump_render_version(notification_data)
                             
-                            # Сохраняем время последней отправки
+                            # Сохраняем изменения в хранилище
                             self._save_notifications()
+                            
+                            logger.info("Resumed notifications for chat %s at %s", chat_id, next_start.strftime('%H:%M'))
+                    
+                    if notification_data['active']:
+                        # Проверяем, находимся ли мы в активном временном окне
+                        if self._is_in_active_window(now, notification_data):
+                            # Проверяем, нужно ли отправить уведомление
+                            if self._should_send_notification(now, notification_data):
+                                # Намерение записывается до отправки, отметка — после:
+                                # после сбоя журнал покажет, была ли отправка
+                                slot = int(now.timestamp())
+                                self.journal.record_intent(chat_id, slot)
+                                send_started = self.clock.time()
+                                await self._send_notification(chat_id, notification_data)
+                                if self.lag_monitor is not None:
+                                    self.lag_monitor.record_send(
+                                        tick_planned if tick_planned is not None else send_started,
+                                        send_started, self.clock.time() - send_started
+                                    )
+                                notification_data['last_sent'] = now
+                                self.journal.mark_done(chat_id, slot)
+                                
+                                # Время отправки уже в журнале; хранилище переписываем при его сжатии
+                                if self.journal.needs_compaction():
+                                    self._save_notifications()
+                                    self.journal.compact()
                 
-                # Ждем 1 минуту перед следующей проверкой
-                await asyncio.sleep(60)
+                # Таймер сработал чуть раньше времени возобновления: ждем его снова
+                if not notification_data['active'] and notification_data['last_response_time']:
+                    continue
+                
+                # Ждем 1 минуту (или до срабатывания правила) перед следующей проверкой
+                delay = self._next_check_delay(notification_data)
+                planned_at = self.clock.time() + delay
+                await self.clock.sleep(delay)
                 
             except asyncio.CancelledError:
-                logger.info(f"Notification loop cancelled for chat {chat_id}")
+                logger.info("Notification loop cancelled for chat %s", chat_id)
                 break
             except Exception as e:
-                logger.error(f"Error in notification loop for chat {chat_id}: {e}")
-                await asyncio.sleep(60)
+                logger.error("Error in notification loop for chat %s: %s", chat_id, e)
+                await self.clock.sleep(60)
     
     def _get_next_start_time(self, notification_data: Dict) -> datetime:
-        """Вычисляет время следующего запуска уведомлений"""
+        """Вычисляет время следующего запуска уведомлений (начало ближайшего окна)
+
+        Расчет идет в целых секундах местного времени по таблице переходов
+        часового пояса чата, поэтому переходы на летнее время учитываются.
+        """
+        transitions = self._transitions(notification_data)
+        windows = self._windows(notification_data)
+        rule = self._rule(notification_data)
+        
         # Используем время последнего ответа как базовое время
         if notification_data['last_response_time']:
-            base_time = notification_data['last_response_time']
+            base = notification_data['last_response_time'].timestamp()
         else:
-            base_time = datetime.now(self.moscow_tz)
+            base = self.clock.time()
         
-        next_start = base_time.replace(
-            hour=notification_data['start_hour'],
-            minute=notification_data['start_minute'],
-            second=0,
-            microsecond=0
-        )
+        local = int(base) + transitions.offset_at(base)
         
-        # Если время начала уже прошло в день последнего ответа, переносим на следующий день
-        if next_start <= base_time:
-            next_start += timedelta(days=1)
+        if rule is not None:
+            # Правило возобновляется с первого срабатывания следующих суток
+            next_day = local - local % 86400 + 86400
+            fire = rule.next_fire(next_day - 1)
+            next_start = transitions.local_to_utc(fire if fire is not None else next_day)
+            return datetime.fromtimestamp(next_start, transitions.zone)
         
-        return next_start
-    
-    def _is_in_active_window(self, now: datetime, notification_data: Dict) -> bool:
-        """Проверяет, находимся ли мы в активном временном окне"""
-        start_time = now.replace(
-            hour=notification_data['start_hour'],
-            minute=notification_data['start_minute'],
-            second=0,
-            microsecond=0
-        )
+        second_of_week = minute_of_week(local) * 60 + local % 60
+        start_local = local + windows.next_start(second_of_week)
+        next_start = transitions.local_to_utc(start_local)
         
-        end_time = start_time + timedelta(days=1)
-        end_time = end_time.replace(hour=2, minute=0, second=0, microsecond=0)
+        # При переводе часов назад начало окна может оказаться до базового времени
+        if next_start <= base:
+            second_of_week = (second_of_week + start_local - local) % (7 * 86400)
+            next_start = transitions.local_to_utc(start_local + windows.next_start(second_of_week))
         
-        return start_time <= now < end_time
+        return datetime.fromtimestamp(next_start, transitions.zone)
+    
+    def _is_in_active_window(self, now: datetime, notification_data: Dict) -> bool:
+        """Проверяет, находимся ли мы в одном из активных окон
+
+        Минута недели по времени чата ищется бинарным поиском среди
+        скомпилированных интервалов; смещение зоны берется из таблицы переходов.
+        Для правила повторения окном считается каждая совпавшая минута.
+        """
+        epoch = int(now.timestamp())
+        local = epoch + self._transitions(notification_data).offset_at(epoch)
+        rule = self._rule(notification_data)
+        if rule is not None:
+            return rule.matches(local)
+        return self._windows(notification_data).contains(minute_of_week(local))
     
     def _should_send_notification(self, now: datetime, notification_data: Dict) -> bool:
         """Проверяет, нужно ли отправить уведомление"""
         if 'last_sent' not in notification_data:
             return True
         
+        if self._rule(notification_data) is not None:
+            # По правилу отправляем не больше одного раза за совпавшую минуту
+            return int(now.timestamp()) // 60 != int(notification_data['last_sent'].timestamp()) // 60
+        
         time_since_last = now - notification_data['last_sent']
         return time_since_last.total_seconds() >= notification_data['interval_minutes'] * 60
     
+    def _resolve_markup(self, notification_data: Dict):
+        """Сохраняет безопасный для отправки текст и режим разметки"""
+        message_text, parse_mode = prepare_message_markup(
+            notification_data['message'], bool(notification_data.get('tagged_users'))
+        )
+        notification_data['message_text'] = message_text
+        notification_data['parse_mode'] = parse_mode
+    
+    def _bump_render_version(self, notification_data: Dict):
+        """Помечает закэшированный текст напоминания как устаревший"""
+        notification_data['render_version'] = notification_data.get('render_version', 0) + 1
+
+    def update_member_cache(self, chat_id: int, user_id: int, username: Optional[str] = None,
+                            first_name: Optional[str] = None):
+        """Обновляет упоминание участника в кэше и сбрасывает текст напоминания при изменении"""
+        mention = self._format_mention(user_id, username, first_name)
+        key = (chat_id, user_id)
+        if self.member_cache.get(key) == mention:
+            return
+        
+        self.member_cache[key] = mention
+        
+        notification_data = self.active_notifications.get(chat_id)
+        if notification_data and user_id in notification_data.get('tagged_users', []):
+            self._bump_render_version(notification_data)
+    
+    @staticmethod
+    def _format_mention(user_id: int, username: Optional[str], first_name: Optional[str]) -> str:
+        """Формирует упоминание пользователя для HTML-разметки"""
+        if username:
+            return f"@{username}"
+        name = html.escape(first_name) if first_name else "Пользователь"
+        return f'<a href="tg://user?id={user_id}">{name}</a>'
+    
+    async def _get_member_mention(self, chat_id: int, user_id: int) -> Tuple[str, bool]:
+        """Возвращает упоминание участника, запрашивая его у Telegram только при промахе кэша
+
+        Второй элемент — False, если вместо упоминания возвращена заглушка.
+        """
+        key = (chat_id, user_id)
+        mention = self.member_cache.get(key)
+        if mention is not None:
+            MEMBER_CACHE.labels('hit').inc()
+            return mention, True
+        
+        MEMBER_CACHE.labels('miss').inc()
+        try:
+            member = await self.bot.get_chat_member(chat_id, user_id)
+        except TelegramError as e:
+            logger.warning("Could not get user info for %s: %s", user_id, e)
+            # Не кэшируем заглушку, чтобы повторить запрос при следующей отрисовке
+            return self._format_mention(user_id, None, None), False
+        
+        mention = self._format_mention(user_id, member.user.username, member.user.first_name)
+        self.member_cache[key] = mention
+        return mention, True
+    
+    async def _render_notification_text(self, chat_id: int, notification_data: Dict) -> str:
+        """Возвращает текст напоминания, пересобирая его только при смене версии"""
+        version = notification_data.get('render_version', 0)
+        cached = notification_data.get('rendered_text')
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        if 'message_text' not in notification_data:
+            self._resolve_markup(notification_data)
+        
+        message = notification_data['message_text']
+        tagged_users = notification_data.get('tagged_users', [])
+        responded_users = notification_data.get('responded_users', set())
+        # Текст с заглушкой вместо упоминания не кэшируется: запрос повторится при следующей отправке
+        complete = True
+        
+        # Если есть тегированные пользователи, добавляем теги только тех, кто ещё не ответил
+        if tagged_users:
+            user_tags = []
+            for user in tagged_users:
+                # Пропускаем тех, кто уже ответил
+                if user in responded_users:
+                    continue
+                    
+                if isinstance(user, int):
+                    # Это user_id (число)
+                    mention, resolved = await self._get_member_mention(chat_id, user)
+                    user_tags.append(mention)
+                    complete = complete and resolved
+                elif isinstance(user, str):
+                    # Это username (строка)
+                    username = user.lstrip('@')  # Убираем @ если есть
+                    user_tags.append(f"@{username}")
+                else:
+                    logger.warning("Unknown user type: %s for user %s", type(user), user)
+            
+            if user_tags:
+                message += f"\n\n{' '.join(user_tags)}"
+        
+        # Версия могла измениться, пока мы ждали ответа от Telegram
+        if complete and notification_data.get('render_version', 0) == version:
+            notification_data['rendered_text'] = (version, message)
+        return message
+    
     async def _send_notification(self, chat_id: int, notification_data: Dict):
         """Отправляет уведомление в чат"""
+        message = notification_data['message']
+        message_thread_id = notification_data.get('message_thread_id')
         try:
-            message = notification_data['message']
-            tagged_users = notification_data.get('tagged_users', [])
-            responded_users = notification_data.get('responded_users', set())
-            message_thread_id = notification_data.get('message_thread_id')
-            
-            # Если есть тегированные пользователи, добавляем теги только тех, кто ещё не ответил
-            if tagged_users:
-                user_tags = []
-                for user in tagged_users:
-                    # Пропускаем тех, кто уже ответил
-                    if user in responded_users:
-                        continue
-                        
-                    if isinstance(user, int):
-                        # Это user_id (число)
-                        try:
-                            member = await self.bot.get_chat_member(chat_id, user)
-                            if member.user.username:
-                                user_tags.append(f"@{member.user.username}")
-                            else:
-                                user_tags.append(f'<a href="tg://user?id={user}">{member.user.first_name}</a>')
-                        except TelegramError as e:
-                            logger.warning(f"Could not get user info for {user}: {e}")
-                            user_tags.append(f'<a href="tg://user?id={user}">Пользователь</a>')
-                    elif isinstance(user, str):
-                        # Это username (строка)
-                        username = user.lstrip('@')  # Убираем @ если есть
-                        user_tags.append(f"@{username}")
-                    else:
-                        logger.warning(f"Unknown user type: {type(user)} for user {user}")
-                
-                if user_tags:
-                    message += f"\n\n{' '.join(user_tags)}"
+            message = await self._render_notification_text(chat_id, notification_data)
             
             # Отправляем сообщение с учетом топика
             send_params = {
                 'chat_id': chat_id,
-                'text': message,
-                'parse_mode': 'HTML'
+                'text': message
             }
             
+            # Режим разметки определен при создании уведомления
+            if notification_data.get('parse_mode'):
+                send_params['parse_mode'] = notification_data['parse_mode']
+            
             if message_thread_id is not None:
                 send_params['message_thread_id'] = message_thread_id
             
-            await self.bot.send_message(**send_params)
-            logger.info(f"Sent notification to chat {chat_id} (topic: {message_thread_id}): {notification_data['message']}")
+            started = self.clock.monotonic()
+            try:
+                await self.bot.send_message(**send_params)
+            finally:
+                SEND_DURATION.observe(self.clock.monotonic() - started)
+            SENDS.labels('ok').inc()
+            logger.info("Sent notification to chat %s (topic: %s): %s", chat_id, message_thread_id, notification_data['message'],
+                        extra={'sampled': True})
             
         except TelegramError as e:
-            logger.error(f"Failed to send notification to chat {chat_id}: {e}")
-            # Если HTML не сработал, пробуем без разметки
+            SENDS.labels('error').inc()
+            logger.error("Failed to send notification to chat %s: %s", chat_id, e)
+            if not notification_data.get('parse_mode'):
+                return
+            
+            # Если HTML всё же не сработал, пробуем без разметки
             try:
                 send_params = {
                     'chat_id': chat_id,
@@ -302,18 +681,89 @@ class NotificationManager:
                     send_params['message_thread_id'] = message_thread_id
                 
                 await self.bot.send_message(**send_params)
-                logger.info(f"Sent notification without markup to chat {chat_id}")
+                SENDS.labels('fallback').inc()
+                logger.info("Sent notification without markup to chat %s", chat_id, extra={'sampled': True})
             except TelegramError as e2:
-                logger.error(f"Failed to send notification without markup to chat {chat_id}: {e2}")
+                logger.error("Failed to send notification without markup to chat %s: %s", chat_id, e2)
     
     def get_active_notifications(self) -> Dict[int, Dict]:
-        """Возвращает активные уведомления"""
+        """Возвращает копию активных уведомлений"""
         return self.active_notifications.copy()
     
+    def get(self, chat_id: int) -> Optional[Dict]:
+        """Возвращает уведомление чата без копирования реестра"""
+        return self.active_notifications.get(chat_id)
+    
+    def contains(self, chat_id: int) -> bool:
+        """Проверяет, есть ли уведомления в чате"""
+        return chat_id in self.active_notifications
+    
+    __contains__ = contains
+    
+    @property
+    def notifications(self) -> Mapping[int, Dict]:
+        """Живое представление реестра только для чтения"""
+        return self._notifications_view
+    
+    def count_by_state(self) -> Tuple[int, int]:
+        """Возвращает число активных и приостановленных уведомлений"""
+        active = sum(1 for data in self.active_notifications.values() if data['active'])
+        return active, len(self.active_notifications) - active
+    
+    def collect_metrics(self):
+        """Обновляет число активных и приостановленных уведомлений за один проход"""
+        active, paused = self.count_by_state()
+        NOTIFICATIONS.labels('active').set(active)
+        NOTIFICATIONS.labels('paused').set(paused)
+    
     def get_storage_info(self) -> Dict:
         """Возвращает информацию о хранилище"""
         return self.storage.get_storage_info()
     
+    async def shutdown(self, timeout: float = 10.0) -> float:
+        """Останавливает планировщик и один раз сохраняет согласованное состояние
+
+        Отправки, начатые до остановки, дожидаются завершения (каждая идет под
+        блокировкой чата), но не дольше timeout секунд. После этого все задачи
+        отменяются, а хранилище атомарно записывается один раз.
+        Возвращает длительность остановки в секундах.
+        """
+        started = time.monotonic()
+        self.closing = True
+        
+        # Захватываем блокировки всех чатов: это дожидается текущих отправок
+        acquired = AsyncExitStack()
+        acquired_count = 0
+        
+        async def acquire_all():
+            nonlocal acquired_count
+            for chat_id in list(self.active_notifications):
+                await acquired.enter_async_context(self.chat_lock(chat_id))
+                acquired_count += 1
+        
+        try:
+            await asyncio.wait_for(acquire_all(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown deadline of %ss reached, %s sends still in flight",
+                           timeout, len(self.active_notifications) - acquired_count)
+        
+        try:
+            tasks = [data['task'] for data in self.active_notifications.values() if data.get('task')]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            
+            # Единственная запись состояния при остановке
+            self._save_notifications()
+            self.journal.compact()
+            self.journal.close()
+        finally:
+            await acquired.aclose()
+        
+        elapsed = time.monotonic() - started
+        logger.info("Notification manager stopped in %.3fs, %s notifications saved", elapsed, len(self.active_notifications))
+        return elapsed
+    
     async def clear_all_notifications(self):
         """Очищает все уведомления"""
         try:
@@ -327,6 +777,9 @@ class NotificationManager:
                         pass
             
             self.active_notifications.clear()
+            # Блокировки, которые никто не держит, больше не нужны
+            for chat_id in [chat_id for chat_id in self._chat_locks if chat_id not in self._chat_lock_users]:
+                del self._chat_locks[chat_id]
             
             # Очищаем хранилище
             self.storage.delete_storage()
@@ -334,4 +787,4 @@ class NotificationManager:
             logger.info("Cleared all notifications")
             
         except Exception as e:
-            logger.error(f"Error clearing notifications: {e}") 
\ No newline at end of file
+            logger.error("Error clearing notifications: %s", e) 
\ No newline at end of file
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Отправляет записанные обновления на локальный webhook бота
+
+Файл содержит по одному JSON-объекту на строку: либо сам Update,
+либо запись вида {"update": {...}}.
+
+Пример:
+    python post_updates.py updates.jsonl --url http://127.0.0.1:8443/telegram --secret my_secret
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import httpx
+import config
+
+def load_updates(path: str):
+    """Читает обновления из файла JSON lines"""
+    updates = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            updates.append(record.get('update', record))
+    return updates
+
+async def post_updates(updates, url: str, secret_token: str = None, concurrency: int = 1):
+    """Отправляет обновления POST-запросами и возвращает статистику"""
+    headers = {}
+    if secret_token:
+        headers['X-Telegram-Bot-Api-Secret-Token'] = secret_token
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(headers=headers) as client:
+        async def post(update):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, json=update)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        await asyncio.gather(*(post(update) for update in updates))
+
+    latencies.sort()
+    return {
+        'sent': len(updates),
+        'errors': errors,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0
+    }
+
+def main():
+    default_url = f"http://{config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}/{config.WEBHOOK_PATH}"
+
+    parser = argparse.ArgumentParser(description="Отправка записанных обновлений на webhook бота")
+    parser.add_argument('path', help="файл с обновлениями (JSON lines)")
+    parser.add_argument('--url', default=default_url, help="адрес webhook")
+    parser.add_argument('--secret', default=config.WEBHOOK_SECRET_TOKEN, help="секретный токен webhook")
+    parser.add_argument('--concurrency', type=int, default=1, help="число одновременных запросов")
+    args = parser.parse_args()
+
+    updates = load_updates(args.path)
+    stats = asyncio.run(post_updates(updates, args.url, args.secret, args.concurrency))
+    print(f"📨 Отправлено: {stats['sent']}, ошибок: {stats['errors']}, "
+          f"p50: {stats['p50_ms']:.1f} мс, max: {stats['max_ms']:.1f} мс")
+
+if __name__ == "__main__":
+    main()
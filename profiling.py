@@ -0,0 +1,59 @@
+import asyncio
+import cProfile
+import logging
+import marshal
+import pstats
+
+logger = logging.getLogger(__name__)
+
+class ProfilerBusyError(RuntimeError):
+    """Профилирование уже запущено"""
+
+class ProfileSnapshot:
+    """Результат профилирования: сводка по функциям и сырые данные .prof"""
+
+    def __init__(self, profile: cProfile.Profile, seconds: float):
+        self.seconds = seconds
+        self.stats = pstats.Stats(profile)
+        # Формат файла совпадает с Profile.dump_stats: его открывают pstats и snakeviz
+        self.data = marshal.dumps(self.stats.stats)
+
+    def summary(self, limit: int = 15) -> str:
+        """Короткая таблица «накопленное время, вызовы, функция» для сообщения"""
+        rows = sorted(self.stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        lines = [f"{'cum, s':>8} {'calls':>8}  function"]
+        for (filename, line, name), (_, calls, _, cumulative, _) in rows:
+            location = filename.rsplit('/', 1)[-1]
+            lines.append(f"{cumulative:8.3f} {calls:8d}  {location}:{line}({name})")
+        return "\n".join(lines)
+
+class LiveProfiler:
+    """Включает cProfile на работающем процессе на заданное время
+
+    Профилируется поток цикла событий целиком: обработчики, цикл напоминаний,
+    запись хранилища. Одновременно может идти только один замер.
+    """
+
+    def __init__(self, max_seconds: float = 60.0):
+        self.max_seconds = max_seconds
+        self._lock = asyncio.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(self, seconds: float) -> ProfileSnapshot:
+        """Профилирует процесс seconds секунд (не больше max_seconds)"""
+        if self._lock.locked():
+            raise ProfilerBusyError("Profiling is already running")
+
+        seconds = min(max(seconds, 0.1), self.max_seconds)
+        async with self._lock:
+            profile = cProfile.Profile()
+            logger.info("Profiling for %.1fs", seconds)
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+            return ProfileSnapshot(profile, seconds)
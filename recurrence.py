@@ -0,0 +1,159 @@
+from datetime import date
+from typing import Optional, Tuple
+
+from active_windows import parse_weekdays
+
+# 01.01.1970 — четверг; порядковый номер дня для date.fromordinal
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_EPOCH_WEEKDAY = 3
+
+# Правило без совпадений ищется не дальше этого горизонта (29 февраля
+# в понедельник повторяется реже, чем раз в 28 лет)
+MAX_SEARCH_DAYS = 29 * 366
+
+def _lowest_bit_from(mask: int, start: int) -> int:
+    """Номер младшего установленного бита mask не меньше start или -1"""
+    mask >>= start
+    if not mask:
+        return -1
+    return (mask & -mask).bit_length() - 1 + start
+
+def _parse_field(field: str, low: int, high: int) -> int:
+    """Разбирает поле cron (*, */n, a-b, a-b/n, списки через запятую) в битовую маску"""
+    mask = 0
+    for part in field.split(','):
+        value, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if step <= 0:
+            raise ValueError(f"неверный шаг в «{part}»")
+
+        if value == '*':
+            first, last = low, high
+        elif '-' in value:
+            first, last = (int(bound) for bound in value.split('-', 1))
+        else:
+            first = last = int(value)
+            if step > 1:
+                last = high
+
+        if not low <= first <= last <= high:
+            raise ValueError(f"значение «{part}» вне диапазона {low}-{high}")
+        for bit in range(first, last + 1, step):
+            mask |= 1 << bit
+    return mask
+
+def _parse_weekday_field(field: str) -> int:
+    """Дни недели: названия (mon-fri, пн-пт) или числа cron (0 и 7 — воскресенье)
+
+    Результат — маска с битом 0 для понедельника, как в active_windows.
+    """
+    if any(char.isalpha() for char in field):
+        mask = parse_weekdays(field)
+        if mask is None:
+            raise ValueError(f"неизвестные дни недели «{field}»")
+        return mask
+
+    cron_mask = _parse_field(field, 0, 7)
+    # В cron 1 — понедельник, 0 и 7 — воскресенье
+    mask = (cron_mask >> 1) & 0b0111111
+    if cron_mask & 0b10000001:
+        mask |= 1 << 6
+    return mask
+
+class CronRule:
+    """Правило повторения в стиле cron, скомпилированное в битовые маски
+
+    Поля: минута, час, день месяца, месяц, день недели. Время следующего
+    срабатывания внутри суток находится несколькими битовыми операциями,
+    подходящие дни перебираются по порядковому номеру дня. Время — местное,
+    в секундах «как если бы в UTC».
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("нужно 5 полей: минута час день месяц день_недели")
+
+        self.expression = " ".join(fields)
+        try:
+            self.minutes = _parse_field(fields[0], 0, 59)
+            self.hours = _parse_field(fields[1], 0, 23)
+            self.days = _parse_field(fields[2], 1, 31)
+            self.months = _parse_field(fields[3], 1, 12)
+            self.weekdays = _parse_weekday_field(fields[4])
+        except ValueError as e:
+            raise ValueError(f"неверное выражение «{self.expression}»: {e}") from None
+
+        # Как в cron: если ограничены и день месяца, и день недели, подходит любой из них
+        self._day_any = fields[2] != '*' and fields[4] != '*'
+        self._first_minute = _lowest_bit_from(self.minutes, 0)
+
+    def _day_matches(self, days: int) -> bool:
+        """Проверяет день (номер дня от 01.01.1970) по маскам месяца и дня"""
+        day = date.fromordinal(_EPOCH_ORDINAL + days)
+        if not self.months >> day.month & 1:
+            return False
+        day_match = self.days >> day.day & 1
+        weekday_match = self.weekdays >> (days + _EPOCH_WEEKDAY) % 7 & 1
+        if self._day_any:
+            return bool(day_match or weekday_match)
+        return bool(day_match and weekday_match)
+
+    def _first_in_day(self, hour: int, minute: int) -> Optional[Tuple[int, int]]:
+        """Первое срабатывание в сутках не раньше hour:minute"""
+        next_hour = _lowest_bit_from(self.hours, hour)
+        if next_hour == hour:
+            next_minute = _lowest_bit_from(self.minutes, minute)
+            if next_minute >= 0:
+                return hour, next_minute
+            next_hour = _lowest_bit_from(self.hours, hour + 1)
+        if next_hour < 0:
+            return None
+        return next_hour, self._first_minute
+
+    def matches(self, local_seconds: int) -> bool:
+        """Проверяет, совпадает ли минута local_seconds с правилом"""
+        minute_of_day = local_seconds % 86400 // 60
+        return bool(self.minutes >> minute_of_day % 60 & 1
+                    and self.hours >> minute_of_day // 60 & 1
+                    and self._day_matches(local_seconds // 86400))
+
+    def next_fire(self, local_seconds: int) -> Optional[int]:
+        """Местное время (в секундах) ближайшего срабатывания строго после local_seconds"""
+        days, second_of_day = divmod(local_seconds // 60 * 60 + 60, 86400)
+        hour, minute = divmod(second_of_day // 60, 60)
+        limit = days + MAX_SEARCH_DAYS
+
+        while days < limit:
+            day = date.fromordinal(_EPOCH_ORDINAL + days)
+            if not self.months >> day.month & 1:
+                # Неподходящий месяц пропускаем целиком
+                month = _lowest_bit_from(self.months, day.month + 1)
+                year = day.year
+                if month < 0:
+                    month = _lowest_bit_from(self.months, 1)
+                    year += 1
+                days = date(year, month, 1).toordinal() - _EPOCH_ORDINAL
+                hour = minute = 0
+                continue
+
+            if self._day_matches(days):
+                found = self._first_in_day(hour, minute)
+                if found is not None:
+                    return days * 86400 + found[0] * 3600 + found[1] * 60
+            days += 1
+            hour = minute = 0
+        return None
+
+    def naive_next_fire(self, local_seconds: int) -> Optional[int]:
+        """Поминутный перебор для сравнения в бенчмарке"""
+        candidate = local_seconds // 60 * 60 + 60
+        for _ in range(MAX_SEARCH_DAYS * 1440):
+            if self.matches(candidate):
+                return candidate
+            candidate += 60
+        return None
+
+    def describe(self) -> str:
+        """Выражение правила для ответов бота"""
+        return f"cron {self.expression}"
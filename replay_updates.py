@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Воспроизводит записанные обновления через обработчики AnnoyingBot
+
+Запись создается ботом при заданном UPDATE_CAPTURE_FILE: по одному
+объекту {"ts": ..., "update": {...}} на строку. Обновления подаются в
+Application.process_update с исходными интервалами, ускоренными в
+--speed раз (0 — без пауз). Запросы к Bot API выполняет RecordingBot без
+сети, с задержкой --latency. Для каждого обработчика выводятся перцентили
+длительности обработки обновления и число запросов к API на обновление.
+
+Пример:
+    python replay_updates.py updates.jsonl --speed 10 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ExtBot
+
+import config
+from bot import AnnoyingBot
+from fake_telegram_server import FakeTelegramServer
+from lag_monitor import percentile
+from update_capture import read_capture
+
+class ReplayResult:
+    """Результат обработки одного обновления"""
+
+    def __init__(self, category: str):
+        self.category = category
+        self.latency = 0.0
+        self.calls: Counter = Counter()
+        self.done = False
+
+# Обновление, которое обрабатывает текущая задача; задачи, созданные обработчиком, наследуют его
+CURRENT_UPDATE: ContextVar[Optional[ReplayResult]] = ContextVar('current_update', default=None)
+
+class RecordingBot(ExtBot):
+    """Бот без сети: запросы выполняет FakeTelegramServer.call в этом же процессе
+
+    Запросы, сделанные во время обработки обновления, записываются в его
+    результат; остальные (напоминания, отложенные подтверждения, getMe)
+    считаются фоновыми.
+    """
+
+    def __init__(self, token: str, api: FakeTelegramServer):
+        super().__init__(token)
+        # Атрибуты объектов PTB заморожены после создания
+        with self._unfrozen():
+            self.api = api
+            self.background_calls: Counter = Counter()
+
+    async def _do_post(self, endpoint: str, data: Dict, **kwargs):
+        result = CURRENT_UPDATE.get()
+        if result is not None and not result.done:
+            result.calls[endpoint] += 1
+        else:
+            self.background_calls[endpoint] += 1
+
+        _, payload = await self.api.call(endpoint, data)
+        if not payload['ok']:
+            raise TelegramError(payload['description'])
+        return payload['result']
+
+def update_category(update: Dict) -> str:
+    """Команда (/status) или тип обновления (message)"""
+    message = update.get('message') or update.get('edited_message')
+    if message is None:
+        return next((key for key in update if key != 'update_id'), 'unknown')
+    text = message.get('text') or ''
+    if text.startswith('/'):
+        return text.split()[0].split('@')[0]
+    return 'message'
+
+async def _process(application, update: Update, result: ReplayResult):
+    CURRENT_UPDATE.set(result)
+    started = time.perf_counter()
+    try:
+        await application.process_update(update)
+    finally:
+        result.latency = time.perf_counter() - started
+        result.done = True
+
+async def replay(records: List[Dict], speed: float = 1.0, latency: float = 0.0) -> Tuple[List[ReplayResult], Counter]:
+    """Подает записи в обработчики бота и возвращает результаты и фоновые запросы"""
+    bot = RecordingBot("123456:REPLAY", FakeTelegramServer(latency=latency))
+    annoying_bot = AnnoyingBot(bot=bot)
+    application = annoying_bot.application
+
+    results = []
+    tasks = []
+    async with application:
+        await application.post_init(application)
+        started = time.perf_counter()
+        first_ts = records[0]['ts'] if records else 0.0
+        for record in records:
+            if speed > 0:
+                delay = started + (record['ts'] - first_ts) / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            result = ReplayResult(update_category(record['update']))
+            results.append(result)
+            tasks.append(asyncio.create_task(
+                _process(application, Update.de_json(record['update'], bot), result)
+            ))
+        await asyncio.gather(*tasks)
+        await application.post_stop(application)
+    return results, bot.background_calls
+
+def format_report(results: List[ReplayResult], background_calls: Counter) -> str:
+    """Таблица по обработчикам: длительность обработки и запросы к API на обновление"""
+    by_category: Dict[str, List[ReplayResult]] = {}
+    for result in results:
+        by_category.setdefault(result.category, []).append(result)
+
+    lines = [f"{'обработчик':<14} {'обновлений':>10} {'p50, мс':>8} {'p95':>8} {'p99':>8} {'макс.':>8}  запросов на обновление"]
+    for category, items in sorted(by_category.items(), key=lambda item: -len(item[1])):
+        latencies = sorted(item.latency for item in items)
+        calls = Counter()
+        for item in items:
+            calls.update(item.calls)
+        per_update = ", ".join(f"{method} {count / len(items):.2f}" for method, count in calls.most_common()) or "—"
+        lines.append(
+            f"{category:<14} {len(items):>10} {percentile(latencies, 50) * 1000:>8.2f} "
+            f"{percentile(latencies, 95) * 1000:>8.2f} {percentile(latencies, 99) * 1000:>8.2f} "
+            f"{latencies[-1] * 1000:>8.2f}  {per_update}"
+        )
+    background = ", ".join(f"{method} {count}" for method, count in background_calls.most_common()) or "—"
+    lines.append(f"\nФоновые запросы (напоминания, подтверждения, запуск): {background}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='файл записи (JSON lines)')
+    parser.add_argument('--speed', type=float, default=1.0, help='ускорение относительно записи (0 — без пауз)')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа Bot API, сек')
+    args = parser.parse_args()
+
+    records = sorted(read_capture(args.path), key=lambda record: record['ts'])
+    with tempfile.TemporaryDirectory() as directory:
+        # Воспроизведение не трогает настоящие хранилище и кэш
+        config.STORAGE_FILE = os.path.join(directory, 'notifications.json')
+        config.USERNAME_CACHE_FILE = os.path.join(directory, 'usernames.json')
+        config.UPDATE_CAPTURE_FILE = ''
+        config.METRICS_PORT = 0
+        started = time.perf_counter()
+        results, background_calls = asyncio.run(replay(records, args.speed, args.latency))
+        elapsed = time.perf_counter() - started
+
+    print(f"▶️  Воспроизведено обновлений: {len(results)} за {elapsed:.2f} с")
+    if results:
+        print(format_report(results, background_calls))
+
+if __name__ == "__main__":
+    main()
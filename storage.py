@@ -1,19 +1,31 @@
 import json
 import os
 import logging
-from datetime import datetime
-from typing import Dict, Any
-import pytz
+import time
+from datetime import datetime, tzinfo
+from typing import Dict, Any, Optional
+from journal import DeliveryJournal
+from active_windows import ALL_WEEKDAYS
+from timeutils import get_zone
+from metrics import default_registry
+from config import MOSCOW_TZ
 
 logger = logging.getLogger(__name__)
 
+FLUSHES = default_registry.counter('notifier_storage_flushes_total', 'Full storage writes')
+FLUSH_DURATION = default_registry.histogram('notifier_storage_flush_duration_seconds', 'Duration of full storage writes')
+FLUSH_BYTES = default_registry.counter('notifier_storage_flush_bytes_total', 'Bytes written by full storage writes')
+
 class NotificationStorage:
-    def __init__(self, storage_file: str = "notifications.json"):
+    def __init__(self, storage_file: str = "notifications.json", journal_fsync: bool = False):
         self.storage_file = storage_file
-        self.moscow_tz = pytz.timezone('Europe/Moscow')
+        self.moscow_tz = get_zone(MOSCOW_TZ)
+        # Журнал доставки хранится рядом с файлом уведомлений
+        self.journal = DeliveryJournal(f"{storage_file}.journal", fsync=journal_fsync)
     
     def save_notifications(self, notifications: Dict[int, Dict[str, Any]]) -> bool:
         """Сохраняет уведомления в JSON файл"""
+        started = time.monotonic()
         try:
             # Подготавливаем данные для сохранения
             serializable_notifications = {}
@@ -28,9 +40,19 @@ class NotificationStorage:
                     'active': notification_data['active'],
                     'chat_id': notification_data.get('chat_id', chat_id),
                     'message_thread_id': notification_data.get('message_thread_id'),
-                    'tagged_users': notification_data.get('tagged_users', [])
+                    'tagged_users': notification_data.get('tagged_users', []),
+                    'timezone': notification_data.get('timezone') or MOSCOW_TZ,
+                    'weekdays': notification_data.get('weekdays', ALL_WEEKDAYS)
                 }
                 
+                # Сохраняем правило повторения, если оно задано
+                if notification_data.get('cron'):
+                    serializable_data['cron'] = notification_data['cron']
+                
+                # Сохраняем окна отправки, если они заданы
+                if notification_data.get('windows'):
+                    serializable_data['windows'] = [list(window) for window in notification_data['windows']]
+                
                 # Сохраняем время последнего ответа если есть
                 if notification_data.get('last_response_time'):
                     serializable_data['last_response_time'] = notification_data['last_response_time'].isoformat()
@@ -45,22 +67,29 @@ class NotificationStorage:
                 
                 serializable_notifications[str(chat_id)] = serializable_data
             
-            # Сохраняем в файл
-            with open(self.storage_file, 'w', encoding='utf-8') as f:
+            # Сохраняем во временный файл и атомарно подменяем им хранилище,
+            # чтобы сбой во время записи не оставил поврежденный JSON
+            tmp_file = f"{self.storage_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(serializable_notifications, f, ensure_ascii=False, indent=2)
+            size = os.path.getsize(tmp_file)
+            os.replace(tmp_file, self.storage_file)
             
-            logger.info(f"Saved {len(serializable_notifications)} notifications to {self.storage_file}")
+            FLUSHES.inc()
+            FLUSH_BYTES.inc(size)
+            FLUSH_DURATION.observe(time.monotonic() - started)
+            logger.info("Saved %s notifications to %s", len(serializable_notifications), self.storage_file)
             return True
             
         except Exception as e:
-            logger.error(f"Error saving notifications: {e}")
+            logger.error("Error saving notifications: %s", e)
             return False
     
     def load_notifications(self) -> Dict[int, Dict[str, Any]]:
         """Загружает уведомления из JSON файла"""
         try:
             if not os.path.exists(self.storage_file):
-                logger.info(f"Storage file {self.storage_file} not found, starting with empty notifications")
+                logger.info("Storage file %s not found, starting with empty notifications", self.storage_file)
                 return {}
             
             with open(self.storage_file, 'r', encoding='utf-8') as f:
@@ -71,6 +100,9 @@ class NotificationStorage:
             
             for chat_id_str, notification_data in data.items():
                 chat_id = int(chat_id_str)
+                # Старые записи без часового пояса считаются московскими
+                timezone = notification_data.get('timezone') or MOSCOW_TZ
+                zone = get_zone(timezone)
                 
                 # Восстанавливаем datetime объекты
                 restored_data = {
@@ -82,27 +114,33 @@ class NotificationStorage:
                     'task': None,  # Задача будет создана заново
                     'chat_id': notification_data.get('chat_id', chat_id),
                     'message_thread_id': notification_data.get('message_thread_id'),
-                    'tagged_users': notification_data.get('tagged_users', [])
+                    'tagged_users': notification_data.get('tagged_users', []),
+                    'timezone': timezone,
+                    'weekdays': notification_data.get('weekdays', ALL_WEEKDAYS)
                 }
                 
+                # Восстанавливаем правило повторения
+                if notification_data.get('cron'):
+                    restored_data['cron'] = notification_data['cron']
+                
+                # Восстанавливаем окна отправки (старые записи — окно по умолчанию)
+                if notification_data.get('windows'):
+                    restored_data['windows'] = [tuple(window) for window in notification_data['windows']]
+                
                 # Восстанавливаем время последнего ответа
                 if notification_data.get('last_response_time'):
                     try:
-                        restored_data['last_response_time'] = datetime.fromisoformat(
-                            notification_data['last_response_time']
-                        ).replace(tzinfo=self.moscow_tz)
+                        restored_data['last_response_time'] = self._parse_datetime(notification_data['last_response_time'], zone)
                     except Exception as e:
-                        logger.warning(f"Error parsing last_response_time for chat {chat_id}: {e}")
+                        logger.warning("Error parsing last_response_time for chat %s: %s", chat_id, e)
                         restored_data['last_response_time'] = None
                 
                 # Восстанавливаем время последней отправки
                 if notification_data.get('last_sent'):
                     try:
-                        restored_data['last_sent'] = datetime.fromisoformat(
-                            notification_data['last_sent']
-                        ).replace(tzinfo=self.moscow_tz)
+                        restored_data['last_sent'] = self._parse_datetime(notification_data['last_sent'], zone)
                     except Exception as e:
-                        logger.warning(f"Error parsing last_sent for chat {chat_id}: {e}")
+                        logger.warning("Error parsing last_sent for chat %s: %s", chat_id, e)
                         restored_data['last_sent'] = None
                 
                 # Восстанавливаем список ответивших пользователей
@@ -113,22 +151,32 @@ class NotificationStorage:
                 
                 notifications[chat_id] = restored_data
             
-            logger.info(f"Loaded {len(notifications)} notifications from {self.storage_file}")
+            logger.info("Loaded %s notifications from %s", len(notifications), self.storage_file)
             return notifications
             
         except Exception as e:
-            logger.error(f"Error loading notifications: {e}")
+            logger.error("Error loading notifications: %s", e)
             return {}
     
+    def _parse_datetime(self, value: str, zone: Optional[tzinfo] = None) -> datetime:
+        """Восстанавливает время из ISO-строки и переводит его в часовой пояс чата"""
+        zone = zone or self.moscow_tz
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            # Старые записи без смещения считаются московским временем
+            return parsed.replace(tzinfo=self.moscow_tz).astimezone(zone)
+        return parsed.astimezone(zone)
+    
     def delete_storage(self) -> bool:
         """Удаляет файл хранилища"""
         try:
             if os.path.exists(self.storage_file):
                 os.remove(self.storage_file)
-                logger.info(f"Deleted storage file {self.storage_file}")
+                logger.info("Deleted storage file %s", self.storage_file)
+            self.journal.clear()
             return True
         except Exception as e:
-            logger.error(f"Error deleting storage file: {e}")
+            logger.error("Error deleting storage file: %s", e)
             return False
     
     def get_storage_info(self) -> Dict[str, Any]:
@@ -151,7 +199,7 @@ class NotificationStorage:
                 'file_path': os.path.abspath(self.storage_file)
             }
         except Exception as e:
-            logger.error(f"Error getting storage info: {e}")
+            logger.error("Error getting storage info: %s", e)
             return {
                 'exists': False,
                 'size': 0,
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Тест объединения подтверждений ответов в группах
+"""
+
+import asyncio
+from acknowledgements import AcknowledgementAggregator
+
+class MockMessage:
+    def __init__(self, message_id: int):
+        self.message_id = message_id
+
+class MockBot:
+    """Мок-объект бота, записывающий исходящие вызовы"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def send_message(self, chat_id: int, text: str, message_thread_id: int = None):
+        self.calls.append(('send', chat_id, text))
+        return MockMessage(len(self.calls))
+
+    async def edit_message_text(self, text: str, chat_id: int, message_id: int):
+        self.calls.append(('edit', chat_id, text))
+
+async def _run_aggregation():
+    mock_bot = MockBot()
+    aggregator = AcknowledgementAggregator(mock_bot, window_seconds=0.2)
+    chat_id = -1001234567890
+
+    # Поток сообщений в пределах окна дает один вызов API сразу и одно редактирование позже
+    for remaining in (4, 3, 2):
+        await aggregator.acknowledge(chat_id, f"Осталось ответить: {remaining}")
+    print(f"   Вызовы в окне: {mock_bot.calls}")
+    assert mock_bot.calls == [('send', chat_id, "Осталось ответить: 4")]
+
+    await asyncio.sleep(0.3)
+    print(f"   После окна: {mock_bot.calls}")
+    assert mock_bot.calls[-1] == ('edit', chat_id, "Осталось ответить: 2")
+    assert len(mock_bot.calls) == 2
+
+    # Финальный статус завершает цикл, следующий начинается с нового сообщения
+    await aggregator.acknowledge(chat_id, "Все ответили", final=True)
+    await asyncio.sleep(0.5)
+    await aggregator.acknowledge(chat_id, "Осталось ответить: 4")
+    print(f"   Новый цикл: {mock_bot.calls}")
+    assert mock_bot.calls[2] == ('edit', chat_id, "Все ответили")
+    assert mock_bot.calls[3] == ('send', chat_id, "Осталось ответить: 4")
+
+    # После финального статуса и закрытия окна состояние чата удаляется
+    await aggregator.acknowledge(chat_id, "Все ответили", final=True)
+    await asyncio.sleep(0.5)
+    assert chat_id not in aggregator._chats, "Состояние чата должно удаляться"
+    assert mock_bot.calls[-1] == ('edit', chat_id, "Все ответили")
+
+    await aggregator.close()
+
+async def _run_final_is_sticky():
+    mock_bot = MockBot()
+    aggregator = AcknowledgementAggregator(mock_bot, window_seconds=0.2)
+    chat_id = -1001234567890
+
+    await aggregator.acknowledge(chat_id, "Осталось ответить: 2")
+    # Запоздалый промежуточный статус приходит после финального в том же окне
+    await aggregator.acknowledge(chat_id, "Все ответили", final=True)
+    await aggregator.acknowledge(chat_id, "Осталось ответить: 1")
+    await asyncio.sleep(0.3)
+    print(f"   Вызовы: {mock_bot.calls}")
+    assert mock_bot.calls == [
+        ('send', chat_id, "Осталось ответить: 2"),
+        ('edit', chat_id, "Все ответили")
+    ]
+
+    await aggregator.close()
+
+def test_acknowledgement_aggregation():
+    """Тестирует, что число вызовов API не растет вместе с числом сообщений"""
+    print("🧪 Тестирование объединения подтверждений")
+    asyncio.run(_run_aggregation())
+    print("✅ Подтверждения объединяются корректно")
+
+def test_final_acknowledgement_is_sticky():
+    """Тестирует, что промежуточный статус не заменяет ожидающий финальный"""
+    print("🧪 Тестирование финального статуса")
+    asyncio.run(_run_final_is_sticky())
+    print("✅ Финальный статус не перезаписывается")
+
+if __name__ == "__main__":
+    test_acknowledgement_aggregation()
+    test_final_acknowledgement_is_sticky()
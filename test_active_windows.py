@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Тест активных окон: несколько окон в сутки, дни недели и время возобновления
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+from telegram import Update
+import config
+from active_windows import ActiveWindows, default_window, parse_weekdays, parse_window
+from bot import AnnoyingBot
+from fake_telegram_server import FakeTelegramServer
+from notification_manager import NotificationManager
+from replay_updates import RecordingBot
+from timeutils import get_zone
+
+class MockBot:
+    pass
+
+def test_parsing():
+    """Тестирует разбор окон и дней недели"""
+    print("🧪 Тестирование разбора окон")
+
+    assert parse_window("09:00-18:00") == (540, 1080)
+    assert parse_window("22:00-02:00") == (1320, 1560)
+    assert parse_window("09:00") is None
+    assert parse_window("25:00-26:00") is None
+
+    assert parse_weekdays("пн-пт") == 0b0011111
+    assert parse_weekdays("sat,sun") == 0b1100000
+    assert parse_weekdays("fri-mon") == 0b1110001
+    assert parse_weekdays("foo") is None
+    print("✅ Окна и дни недели разбираются корректно")
+
+def test_compiled_windows():
+    """Тестирует поиск по скомпилированным интервалам"""
+    print("🧪 Тестирование скомпилированных окон")
+
+    # Будни, два окна в день; неделя начинается с понедельника 00:00
+    windows = ActiveWindows([(540, 780), (840, 1080)], parse_weekdays("пн-пт"))
+    assert windows.contains(600)
+    assert not windows.contains(800)
+    assert not windows.contains(5 * 1440 + 600), "Суббота не входит в окна"
+
+    # Из перерыва — до начала второго окна, из вечера пятницы — до понедельника
+    assert windows.next_start(800 * 60) == 40 * 60
+    friday_evening = (4 * 1440 + 1100) * 60
+    assert windows.next_start(friday_evening) == (7 * 1440 + 540) * 60 - friday_evening
+
+    # Окно воскресенья переходит в понедельник
+    windows = ActiveWindows([(1320, 1560)], parse_weekdays("вс"))
+    assert windows.contains(6 * 1440 + 1400)
+    assert windows.contains(60)
+    assert not windows.contains(200)
+
+    # Окно длиннее суток покрывает всю неделю
+    windows = ActiveWindows([default_window(60, 2)])
+    assert all(windows.contains(minute) for minute in range(0, 7 * 1440, 17))
+    print("✅ Интервалы ищутся корректно")
+
+def test_manager_windows():
+    """Тестирует окна и возобновление в менеджере уведомлений"""
+    print("🧪 Тестирование окон в менеджере")
+
+    manager = NotificationManager(MockBot(), "test_active_windows_notifications.json")
+    moscow = get_zone('Europe/Moscow')
+    # 07.06.2024 — пятница
+    notification_data = {'start_hour': 9, 'start_minute': 0, 'windows': [(540, 780), (840, 1080)],
+                         'weekdays': parse_weekdays("пн-пт"), 'last_response_time': None}
+
+    test_cases = [
+        (datetime(2024, 6, 7, 10, 0, tzinfo=moscow), True),
+        (datetime(2024, 6, 7, 13, 30, tzinfo=moscow), False),
+        (datetime(2024, 6, 7, 17, 59, tzinfo=moscow), True),
+        (datetime(2024, 6, 8, 10, 0, tzinfo=moscow), False),
+    ]
+    for now, expected in test_cases:
+        result = manager._is_in_active_window(now, notification_data)
+        print(f"   {'✅' if result == expected else '❌'} {now.strftime('%a %d.%m %H:%M')}: {result}")
+        assert result == expected
+
+    # Ответ в первом окне: возобновление со второго окна
+    notification_data['last_response_time'] = datetime(2024, 6, 7, 10, 0, tzinfo=moscow)
+    assert manager._get_next_start_time(notification_data) == datetime(2024, 6, 7, 14, 0, tzinfo=moscow)
+
+    # Ответ в пятницу вечером: возобновление в понедельник
+    notification_data['last_response_time'] = datetime(2024, 6, 7, 15, 0, tzinfo=moscow)
+    next_start = manager._get_next_start_time(notification_data)
+    print(f"   Возобновление: {next_start.strftime('%a %d.%m %H:%M')}")
+    assert next_start == datetime(2024, 6, 10, 9, 0, tzinfo=moscow)
+    print("✅ Окна учитываются при отправке и возобновлении")
+
+async def _run_commands(texts):
+    replies = []
+
+    def on_request(method, parameters):
+        if method == 'sendmessage':
+            replies.append(parameters['text'])
+
+    server = FakeTelegramServer(on_request=on_request)
+    bot = RecordingBot("123456:WINDOWS", server)
+    annoying_bot = AnnoyingBot(bot=bot)
+    async with annoying_bot.application:
+        for update_id, text in enumerate(texts, 1):
+            await annoying_bot.application.process_update(Update.de_json({'update_id': update_id, 'message': {
+                'message_id': update_id, 'date': 0, 'text': text,
+                'chat': {'id': 42, 'type': 'private', 'first_name': "Тест"},
+                'from': {'id': 42, 'is_bot': False, 'first_name': "Тест"},
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len("/begin_notif")}],
+            }}, bot))
+        running = annoying_bot.notification_manager.contains(42)
+        await annoying_bot.notification_manager.shutdown(1.0)
+    return replies, running
+
+def test_time_with_windows_reply():
+    """Тестирует ошибку, когда вместе с окнами указано время начала"""
+    print("🧪 Тестирование времени начала вместе с окнами")
+    texts = [
+        "/begin_notif Вода 30 09:00 10:00-13:00",
+        "/begin_notif Вода 30 10:00-13:00 09:00",
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        saved = config.STORAGE_FILE, config.USERNAME_CACHE_FILE
+        config.STORAGE_FILE = os.path.join(directory, 'notifications.json')
+        config.USERNAME_CACHE_FILE = os.path.join(directory, 'usernames.json')
+        try:
+            replies, running = asyncio.run(_run_commands(texts))
+        finally:
+            config.STORAGE_FILE, config.USERNAME_CACHE_FILE = saved
+
+    assert len(replies) == len(texts)
+    for text, reply in zip(texts, replies):
+        print(f"   {text}: {reply.splitlines()[0]}")
+        assert reply.startswith("❌ Укажите либо время начала 09:00"), reply
+    assert not running
+    print("✅ Время начала вместе с окнами отклоняется")
+
+if __name__ == "__main__":
+    test_parsing()
+    test_compiled_windows()
+    test_manager_windows()
+    test_time_with_windows_reply()
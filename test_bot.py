@@ -7,7 +7,7 @@ import asyncio
 import logging
 import os
 from datetime import datetime
-import pytz
+from zoneinfo import ZoneInfo
 from notification_manager import NotificationManager
 from storage import NotificationStorage
 
@@ -32,8 +32,8 @@ async def test_storage():
             'start_hour': 9,
             'start_minute': 0,
             'active': True,
-            'last_response_time': datetime.now(pytz.timezone('Europe/Moscow')),
-            'last_sent': datetime.now(pytz.timezone('Europe/Moscow'))
+            'last_response_time': datetime.now(ZoneInfo('Europe/Moscow')),
+            'last_sent': datetime.now(ZoneInfo('Europe/Moscow'))
         }
     }
     
@@ -123,7 +123,7 @@ def test_moscow_timezone():
     """Тестирует работу с московским часовым поясом"""
     print("\n🌍 Тестирование московского часового пояса...")
     
-    moscow_tz = pytz.timezone('Europe/Moscow')
+    moscow_tz = ZoneInfo('Europe/Moscow')
     now = datetime.now(moscow_tz)
     
     print(f"✅ Текущее время в Москве: {now.strftime('%Y-%m-%d %H:%M:%S %Z')}")
@@ -156,6 +156,7 @@ async def test_persistence():
     print("\n2. Создание второго менеджера (перезагрузка)...")
     bot2 = MockBot()
     manager2 = NotificationManager(bot2, test_file)
+    await manager2.restore_notifications()
     
     # Проверяем, восстановились ли уведомления
     active2 = manager2.get_active_notifications()
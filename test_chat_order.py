@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Тест порядка обработки обновлений одного чата
+"""
+
+import asyncio
+import os
+import tempfile
+import config
+from telegram import Update
+from bot import AnnoyingBot
+from fake_telegram_server import FakeTelegramServer
+from replay_updates import RecordingBot
+
+CHAT = {'id': -1001234567890, 'type': 'supergroup', 'title': "Рабочий чат"}
+USER = {'id': 5550001, 'is_bot': False, 'first_name': "Иван", 'username': "ivan"}
+
+class SlowMemberBot(RecordingBot):
+    """Бот, у которого поиск участника по username отвечает медленно"""
+
+    async def get_chat_member(self, *args, **kwargs):
+        await asyncio.sleep(0.2)
+        return await super().get_chat_member(*args, **kwargs)
+
+def _command(update_id: int, text: str) -> dict:
+    command = text.split()[0]
+    return {'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': 1700000000, 'chat': CHAT, 'from': USER, 'text': text,
+        'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+    }}
+
+async def _run_overtake():
+    bot = SlowMemberBot("123456:ORDER", FakeTelegramServer())
+    annoying_bot = AnnoyingBot(bot=bot)
+    application = annoying_bot.application
+    manager = annoying_bot.notification_manager
+    async with application:
+        begin = asyncio.create_task(application.process_update(
+            Update.de_json(_command(1, "/begin_notif \"Пора пить воду!\" 30 09:00 @petr"), bot)
+        ))
+        # /stop_notif приходит, пока /begin_notif ждет get_chat_member
+        await asyncio.sleep(0.05)
+        stop = asyncio.create_task(application.process_update(Update.de_json(_command(2, "/stop_notif"), bot)))
+        await asyncio.gather(begin, stop)
+
+        running = manager.contains(CHAT['id'])
+        locks = dict(manager._chat_locks)
+        await manager.shutdown(1.0)
+    return running, locks
+
+def test_stop_does_not_overtake_begin():
+    """Тестирует, что /stop_notif выполняется после более раннего /begin_notif"""
+    print("🧪 Тестирование порядка команд в чате")
+    with tempfile.TemporaryDirectory() as directory:
+        saved = config.STORAGE_FILE, config.USERNAME_CACHE_FILE
+        config.STORAGE_FILE = os.path.join(directory, 'notifications.json')
+        config.USERNAME_CACHE_FILE = os.path.join(directory, 'usernames.json')
+        try:
+            running, locks = asyncio.run(_run_overtake())
+        finally:
+            config.STORAGE_FILE, config.USERNAME_CACHE_FILE = saved
+
+    print(f"   Уведомления после /stop_notif: {'запущены' if running else 'остановлены'}, блокировки: {locks}")
+    assert not running, "/stop_notif обогнал /begin_notif и уведомления снова запущены"
+    assert CHAT['id'] not in locks, "Блокировка чата без уведомлений должна удаляться"
+    print("✅ Команды одного чата выполняются в порядке поступления")
+
+if __name__ == "__main__":
+    test_stop_does_not_overtake_begin()
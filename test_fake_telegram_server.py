@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Тест локального сервера Bot API: методы, внедрение ошибок и ограничения частоты
+"""
+
+import asyncio
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from fake_telegram_server import FakeTelegramServer
+
+TOKEN = "123456:FAKE-TOKEN"
+
+async def _run_methods():
+    requests = []
+    server = FakeTelegramServer(on_request=lambda method, parameters: requests.append((method, parameters)))
+    await server.start()
+    try:
+        async with Bot(TOKEN, base_url=server.base_url) as bot:
+            assert bot.username == 'fake_annoying_bot'
+
+            message = await bot.send_message(42, "Пора пить воду!", message_thread_id=7)
+            assert message.chat.id == 42
+            assert message.text == "Пора пить воду!"
+            assert message.message_thread_id == 7
+
+            member = await bot.get_chat_member(-100, 555)
+            assert member.user.id == 555
+            assert member.user.username == 'user555'
+
+            server.push_update({'message': {
+                'message_id': 1, 'date': 0, 'chat': {'id': 42, 'type': 'private'},
+                'from': {'id': 42, 'is_bot': False, 'first_name': 'Тест'}, 'text': "123",
+            }})
+            updates = await bot.get_updates(timeout=1)
+            assert len(updates) == 1
+            assert updates[0].message.text == "123"
+
+            # Подтвержденные обновления больше не возвращаются
+            assert await bot.get_updates(offset=updates[0].update_id + 1, timeout=0) == ()
+    finally:
+        await server.stop()
+    return requests
+
+def test_methods():
+    """Тестирует основные методы через настоящий клиент PTB"""
+    print("🧪 Тестирование методов сервера")
+    requests = asyncio.run(_run_methods())
+    methods = [method for method, _ in requests]
+    print(f"   Вызовы: {methods}")
+    assert methods[0] == 'getme'
+    assert ('sendmessage', {'chat_id': 42, 'text': "Пора пить воду!", 'message_thread_id': 7}) in requests
+    print("✅ Методы Bot API отвечают в формате Telegram")
+
+class BrokenServer(FakeTelegramServer):
+    """Сервер, у которого обработчик метода падает с непредвиденной ошибкой"""
+
+    async def _method_sendmessage(self, parameters):
+        raise KeyError('chat_id')
+
+async def _expect_error(server: FakeTelegramServer, request) -> NetworkError:
+    await server.start()
+    try:
+        async with Bot(TOKEN, base_url=server.base_url) as bot:
+            try:
+                await request(bot)
+            except NetworkError as e:
+                error = e
+            else:
+                raise AssertionError("Ожидалась ошибка")
+            # Соединение переживает ошибку, сервер продолжает отвечать
+            assert (await bot.get_me()).username == 'fake_annoying_bot'
+    finally:
+        await server.stop()
+    return error
+
+async def _run_invalid_parameters():
+    return {
+        'user_id': await _expect_error(FakeTelegramServer(), lambda bot: bot.get_chat_member(-100, "@petr")),
+        'handler': await _expect_error(BrokenServer(), lambda bot: bot.send_message(1, "текст")),
+    }
+
+def test_invalid_parameters():
+    """Тестирует ответы на неверный user_id и на падение обработчика"""
+    print("🧪 Тестирование неверных параметров")
+    results = asyncio.run(_run_invalid_parameters())
+    print(f"   {results}")
+    assert isinstance(results['user_id'], BadRequest)
+    assert "Invalid user_id" in results['user_id'].message
+    assert not isinstance(results['handler'], BadRequest)
+    assert "Internal Server Error" in results['handler'].message
+    print("✅ Ошибки параметров и обработчиков приходят в формате Telegram")
+
+async def _run_errors():
+    results = {}
+    for code, error in ((429, RetryAfter), (403, Forbidden), (502, NetworkError)):
+        server = FakeTelegramServer(error_rates={code: 1.0}, retry_after=3)
+        await server.start()
+        try:
+            async with Bot(TOKEN, base_url=server.base_url) as bot:
+                try:
+                    await bot.send_message(1, "текст")
+                except error as e:
+                    results[code] = e
+                else:
+                    raise AssertionError(f"Ожидалась ошибка {code}")
+            assert server.errors[code] == 1
+        finally:
+            await server.stop()
+    return results
+
+def test_error_injection():
+    """Тестирует внедрение ошибок 429, 403 и 5xx"""
+    print("🧪 Тестирование внедрения ошибок")
+    results = asyncio.run(_run_errors())
+    print(f"   {results}")
+    assert results[429].retry_after == 3
+    print("✅ Ошибки приходят в формате Telegram, 429 с retry_after")
+
+async def _run_rate_limit():
+    server = FakeTelegramServer(chat_rate=1.0, chat_burst=2)
+    await server.start()
+    try:
+        async with Bot(TOKEN, base_url=server.base_url) as bot:
+            await bot.send_message(1, "первое")
+            await bot.send_message(1, "второе")
+            # Другой чат ограничивается отдельно
+            await bot.send_message(2, "первое")
+            try:
+                await bot.send_message(1, "третье")
+            except RetryAfter as e:
+                return e.retry_after
+            raise AssertionError("Третье сообщение подряд должно упереться в ограничение")
+    finally:
+        await server.stop()
+
+def test_rate_limit():
+    """Тестирует ограничение частоты отправок в чат"""
+    print("🧪 Тестирование ограничения частоты")
+    retry_after = asyncio.run(_run_rate_limit())
+    assert retry_after == 1
+    print("✅ Превышение частоты отвечает 429")
+
+if __name__ == "__main__":
+    test_methods()
+    test_invalid_parameters()
+    test_error_injection()
+    test_rate_limit()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Тест журнала доставки: восстановление после сбоя между отправкой и сохранением
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from journal import DeliveryJournal
+from notification_manager import NotificationManager
+from storage import NotificationStorage
+
+class MockBot:
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = None, message_thread_id: int = None):
+        pass
+
+def test_journal_recover():
+    """Тестирует чтение журнала, включая оборванную строку"""
+    print("🧪 Тестирование чтения журнала доставки")
+    journal_file = "test_journal.journal"
+    journal = DeliveryJournal(journal_file)
+
+    try:
+        journal.record_intent(1, 1000)
+        journal.mark_done(1, 1000)
+        journal.record_intent(2, 2000)
+        journal.close()
+
+        # Имитируем оборванную при сбое запись
+        with open(journal_file, 'a', encoding='utf-8') as f:
+            f.write("D 2 20")
+
+        recovered = DeliveryJournal(journal_file).recover()
+        print(f"   Восстановлено: {recovered}")
+        assert recovered == {1: (1000, True), 2: (2000, False)}
+
+        # Сжатие оставляет только незавершенные намерения
+        journal.compact()
+        assert DeliveryJournal(journal_file).recover() == {2: (2000, False)}
+    finally:
+        journal.clear()
+
+    print("✅ Журнал читается корректно")
+
+async def _run_crash_recovery(resend_unconfirmed: bool):
+    moscow_tz = ZoneInfo('Europe/Moscow')
+    storage_file = "test_journal_notifications.json"
+    storage = NotificationStorage(storage_file)
+    old_sent = datetime.now(moscow_tz) - timedelta(hours=2)
+
+    # В хранилище осталось старое время отправки
+    storage.save_notifications({
+        1: {'message': 'Завершенная отправка', 'interval_minutes': 30, 'start_hour': 9, 'start_minute': 0,
+            'active': True, 'last_sent': old_sent},
+        2: {'message': 'Прерванная отправка', 'interval_minutes': 30, 'start_hour': 9, 'start_minute': 0,
+            'active': True, 'last_sent': old_sent}
+    })
+
+    # Сбой после отправки, но до записи хранилища
+    slot = int(datetime.now(moscow_tz).timestamp())
+    storage.journal.record_intent(1, slot)
+    storage.journal.mark_done(1, slot)
+    storage.journal.record_intent(2, slot)
+    storage.journal.close()
+
+    manager = NotificationManager(MockBot(), storage_file)
+    try:
+        await manager.restore_notifications(resend_unconfirmed=resend_unconfirmed)
+        for task in (data['task'] for data in manager.active_notifications.values()):
+            task.cancel()
+
+        restored = manager.active_notifications
+        print(f"   resend_unconfirmed={resend_unconfirmed}: "
+              f"{ {chat_id: data['last_sent'].strftime('%H:%M:%S') for chat_id, data in restored.items()} }")
+        assert int(restored[1]['last_sent'].timestamp()) == slot, "Завершенная отправка не должна повторяться"
+        if resend_unconfirmed:
+            assert restored[2]['last_sent'] < restored[1]['last_sent'], "Прерванная отправка должна повториться"
+        else:
+            assert int(restored[2]['last_sent'].timestamp()) == slot, "Прерванная отправка должна пропускаться"
+
+        # Восстановление сохраняет результат и очищает журнал
+        assert storage.journal.recover() == {}
+    finally:
+        await manager.clear_all_notifications()
+
+async def _run_stop_clears_journal():
+    storage_file = "test_journal_stop_notifications.json"
+    storage = NotificationStorage(storage_file)
+    storage.save_notifications({
+        1: {'message': 'Старое уведомление', 'interval_minutes': 30, 'start_hour': 9, 'start_minute': 0,
+            'active': True},
+        2: {'message': 'Соседний чат', 'interval_minutes': 30, 'start_hour': 9, 'start_minute': 0,
+            'active': True}
+    })
+
+    manager = NotificationManager(MockBot(), storage_file)
+    try:
+        await manager.restore_notifications()
+        # Цикл соседнего чата не должен дописывать журнал во время теста
+        manager.active_notifications[2]['task'].cancel()
+        slot = int(datetime.now(ZoneInfo('Europe/Moscow')).timestamp())
+        manager.journal.record_intent(1, slot)
+        manager.journal.mark_done(1, slot)
+        manager.journal.record_intent(1, slot + 60)
+        manager.journal.record_intent(2, slot)
+
+        await manager.stop_notification(1)
+        recovered = DeliveryJournal(manager.journal.journal_file).recover()
+        print(f"   После /stop_notif в журнале: {recovered}")
+        assert 1 not in recovered, "Записи остановленного уведомления не должны дожить до нового"
+        assert recovered == {2: (slot, False)}, "Незавершенная отправка другого чата сохраняется"
+    finally:
+        await manager.clear_all_notifications()
+
+def test_stop_clears_journal():
+    """Тестирует, что остановка уведомления убирает его записи из журнала"""
+    print("🧪 Тестирование журнала при остановке уведомления")
+    asyncio.run(_run_stop_clears_journal())
+    assert not os.path.exists("test_journal_stop_notifications.json.journal")
+    print("✅ Новое уведомление в чате не наследует записи старого")
+
+def test_crash_recovery():
+    """Тестирует восстановление last_sent из журнала"""
+    print("🧪 Тестирование восстановления после сбоя")
+    asyncio.run(_run_crash_recovery(resend_unconfirmed=False))
+    asyncio.run(_run_crash_recovery(resend_unconfirmed=True))
+    assert not os.path.exists("test_journal_notifications.json.journal")
+    print("✅ Журнал предотвращает повторные напоминания")
+
+if __name__ == "__main__":
+    test_journal_recover()
+    test_crash_recovery()
+    test_stop_clears_journal()
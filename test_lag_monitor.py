@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Тест монитора запаздывания: замеры цикла событий, отправки и предупреждения
+"""
+
+import asyncio
+import logging
+import random
+import time
+from lag_monitor import LagMonitor, _Series, percentile
+from notification_manager import NotificationManager
+
+class MockBot:
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = None, message_thread_id: int = None):
+        await asyncio.sleep(0.05)
+
+class WarningCollector(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def test_percentile():
+    """Тестирует вычисление перцентилей"""
+    print("🧪 Тестирование перцентилей")
+    samples = [float(value) for value in range(1, 101)]
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 95) == 95
+    assert percentile(samples, 99) == 99
+    assert percentile([], 95) == 0.0
+    print("✅ Перцентили вычисляются корректно")
+
+def test_threshold_count():
+    """Тестирует, что счетчик значений выше порога совпадает с p95 по сортировке"""
+    print("🧪 Тестирование проверки порога без сортировки")
+    generator = random.Random(7)
+    series = _Series('test', 40, 0.5)
+    for _ in range(2000):
+        # Серии выбросов то поднимают p95 выше порога, то опускают обратно
+        series.add(generator.random() * (0.55 if generator.random() < 0.9 else 5.0))
+        p95 = percentile(sorted(series.samples), 95)
+        assert series.over == sum(1 for value in series.samples if value > 0.5)
+        series.check()
+        assert series.warned == (p95 > 0.5)
+    print("✅ Порог проверяется по счетчику")
+
+async def _run_loop_lag():
+    monitor = LagMonitor(interval=0.02, loop_lag_warn=0.05)
+    monitor.start()
+    await asyncio.sleep(0.2)
+    # Блокирующий вызов задерживает цикл событий
+    for _ in range(3):
+        time.sleep(0.1)
+        await asyncio.sleep(0.03)
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+    return monitor
+
+def test_loop_lag():
+    """Тестирует замеры цикла событий и предупреждение по p95"""
+    print("🧪 Тестирование замеров цикла событий")
+    collector = WarningCollector()
+    logging.getLogger('lag_monitor').addHandler(collector)
+    try:
+        monitor = asyncio.run(_run_loop_lag())
+    finally:
+        logging.getLogger('lag_monitor').removeHandler(collector)
+
+    print(f"   Максимальная задержка: {monitor.max_loop_lag:.3f} с, предупреждения: {collector.messages}")
+    assert monitor.max_loop_lag >= 0.08
+    assert any("event loop lag" in message for message in collector.messages)
+    assert "Цикл событий" in monitor.report()
+    print("✅ Задержка цикла событий обнаруживается")
+
+async def _run_send_records():
+    monitor = LagMonitor()
+    manager = NotificationManager(MockBot(), "test_lag_monitor_notifications.json", lag_monitor=monitor)
+    try:
+        await manager.start_notification(1, "Пора пить воду!", 30, "00:00")
+        await asyncio.sleep(0.2)
+    finally:
+        await manager.clear_all_notifications()
+    return monitor
+
+def test_send_records():
+    """Тестирует запись запланированного и фактического времени отправки"""
+    print("🧪 Тестирование записи отправок")
+    monitor = asyncio.run(_run_send_records())
+    snapshot = monitor.snapshot()
+    print(f"   {snapshot}")
+    assert len(monitor.send_duration.samples) == 1
+    assert snapshot['send_duration'][50] >= 0.04, "Длительность запроса к Telegram учитывается"
+    assert snapshot['send_lateness'][50] < 0.05
+    print("✅ Отправки записываются")
+
+if __name__ == "__main__":
+    test_percentile()
+    test_threshold_count()
+    test_loop_lag()
+    test_send_records()
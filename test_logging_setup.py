@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Тест логирования через очередь: JSON-формат, ленивые аргументы и выборка
+"""
+
+import io
+import json
+import logging
+import threading
+from logging_setup import JsonFormatter, SamplingFilter, parse_sample_rates, setup_logging
+
+class Lazy:
+    """Считает, сколько раз аргумент превращали в строку"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "lazy"
+
+def _record(name: str, message: str, sampled: bool = False) -> logging.LogRecord:
+    record = logging.LogRecord(name, logging.INFO, __file__, 1, message, (), None)
+    if sampled:
+        record.sampled = True
+    return record
+
+def test_parse_sample_rates():
+    """Тестирует разбор настройки выборки"""
+    print("🧪 Тестирование разбора LOG_SAMPLE_RATES")
+    assert parse_sample_rates("") == {}
+    assert parse_sample_rates("notification_manager=0.1, storage=2") == {'notification_manager': 0.1, 'storage': 1.0}
+    try:
+        parse_sample_rates("notification_manager")
+    except ValueError:
+        print("   ✅ Некорректная запись отклонена")
+    else:
+        raise AssertionError("Запись без частоты должна быть отклонена")
+    print("✅ Настройка выборки разбирается корректно")
+
+def test_sampling_filter():
+    """Тестирует выборку записей об отправках по модулям"""
+    print("🧪 Тестирование выборки записей")
+    sampling = SamplingFilter({'notification_manager': 0.1})
+    passed = sum(sampling.filter(_record('notification_manager', "sent", sampled=True)) for _ in range(100))
+    assert passed == 10, f"Должна пройти каждая десятая запись, прошло {passed}"
+    # Непомеченные записи и другие модули не прореживаются
+    assert all(sampling.filter(_record('notification_manager', "paused")) for _ in range(10))
+    assert all(sampling.filter(_record('storage', "sent", sampled=True)) for _ in range(10))
+
+    # Счетчики не теряют записи при логировании из нескольких потоков
+    sampling = SamplingFilter({'notification_manager': 0.5})
+    passed = []
+
+    def log_many():
+        passed.append(sum(sampling.filter(_record('notification_manager', "sent", sampled=True)) for _ in range(1000)))
+
+    threads = [threading.Thread(target=log_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(passed) == 2000, f"Из 4000 записей должна пройти половина, прошло {sum(passed)}"
+    print("✅ Выборка работает только для помеченных записей")
+
+def test_json_formatter():
+    """Тестирует формат JSON"""
+    print("🧪 Тестирование JSON-формата")
+    record = logging.LogRecord('notification_manager', logging.INFO, __file__, 1,
+                               "Sent notification to chat %s: %s", (42, "Пора пить воду!"), None)
+    record.sampled = True
+    record.chat_id = 42
+    data = json.loads(JsonFormatter().format(record))
+    print(f"   {data}")
+    assert data['level'] == 'INFO'
+    assert data['logger'] == 'notification_manager'
+    assert data['message'] == "Sent notification to chat 42: Пора пить воду!"
+    assert data['chat_id'] == 42
+    assert 'sampled' not in data
+    assert data['ts'].endswith('Z')
+    print("✅ Записи выводятся одной строкой JSON")
+
+def test_queue_listener():
+    """Тестирует запись через очередь с ленивым форматированием"""
+    print("🧪 Тестирование записи через очередь")
+    stream = io.StringIO()
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    listener = setup_logging('INFO', json_format=True, sample_rates={'test_sampled': 0.5}, stream=stream)
+    try:
+        lazy = Lazy()
+        logging.getLogger('test_queue').debug("Skipped %s", lazy)
+        logging.getLogger('test_queue').info("Value %s", lazy)
+        for index in range(4):
+            logging.getLogger('test_sampled').info("Send %s", index, extra={'sampled': True})
+        # Изменяемый аргумент форматируется до того, как его изменят
+        parameters = {'chat_id': 1}
+        logging.getLogger('test_queue').info("Request %s", parameters)
+        parameters['chat_id'] = 2
+    finally:
+        listener.stop()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        for handler in saved_handlers:
+            root.addHandler(handler)
+        root.setLevel(saved_level)
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    print(f"   {lines}")
+    assert lazy.calls == 1, "Аргументы отключенного уровня не форматируются"
+    assert lines[0]['message'] == "Value lazy"
+    assert [line['message'] for line in lines[1:3]] == ["Send 0", "Send 2"]
+    assert lines[3]['message'] == "Request {'chat_id': 1}"
+    print("✅ Записи проходят через очередь и дописываются при остановке")
+
+if __name__ == "__main__":
+    test_parse_sample_rates()
+    test_sampling_filter()
+    test_json_formatter()
+    test_queue_listener()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Тест проверки HTML-разметки сообщений при создании уведомления
+"""
+
+from markup import is_valid_html, prepare_message_markup
+
+def test_html_validation():
+    """Тестирует распознавание корректной и некорректной разметки"""
+    print("🧪 Тестирование проверки HTML-разметки")
+    print("=" * 50)
+
+    test_cases = [
+        ("Пора пить воду!", True),
+        ("Пора пить воду! <b>жирный</b> <i>курсив</i>", True),
+        ('<a href="https://example.com">ссылка</a>', True),
+        ("Tom &amp; Jerry", True),
+        ("1 < 2", False),
+        ("Tom & Jerry", False),
+        ("<b>незакрытый тег", False),
+        ("<b><i>перепутанные</b></i>", False),
+        ("<script>alert(1)</script>", False),
+        ("стрелка ->", False),
+    ]
+
+    for text, expected in test_cases:
+        result = is_valid_html(text)
+        print(f"   {'✅' if result == expected else '❌'} {text!r} -> {result}")
+        assert result == expected, f"Неверная проверка для {text!r}"
+
+def test_prepare_message_markup():
+    """Тестирует выбор режима разметки"""
+    print("🧪 Тестирование выбора режима разметки")
+    print("=" * 50)
+
+    # Корректная разметка отправляется как HTML без изменений
+    assert prepare_message_markup("<b>Вода</b>", needs_html=False) == ("<b>Вода</b>", 'HTML')
+
+    # Без упоминаний некорректный текст отправляется без разметки
+    assert prepare_message_markup("1 < 2 & 3", needs_html=False) == ("1 < 2 & 3", None)
+
+    # С упоминаниями текст экранируется, чтобы HTML-ссылки продолжали работать
+    text, parse_mode = prepare_message_markup("1 < 2 & 3", needs_html=True)
+    print(f"   Экранированный текст: {text}")
+    assert text == "1 &lt; 2 &amp; 3"
+    assert parse_mode == 'HTML'
+    assert is_valid_html(text)
+
+    print("✅ Режим разметки выбирается корректно")
+
+if __name__ == "__main__":
+    test_html_validation()
+    test_prepare_message_markup()
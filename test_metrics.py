@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Тест метрик: реестр, текстовый формат, HTTP-эндпоинт и счетчики менеджера
+"""
+
+import asyncio
+from metrics import MetricsRegistry, MetricsServer, default_registry
+from notification_manager import NotificationManager
+
+class MockBot:
+    def __init__(self):
+        self.sent_messages = []
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = None, message_thread_id: int = None):
+        self.sent_messages.append(text)
+
+def _sample(text: str, series: str, default: float = None) -> float:
+    """Значение ряда из текстового вывода метрик"""
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    if default is not None:
+        return default
+    raise AssertionError(f"Ряд {series} не найден")
+
+def test_registry():
+    """Тестирует счетчики, датчики, гистограммы и формат вывода"""
+    print("🧪 Тестирование реестра метрик")
+
+    registry = MetricsRegistry()
+    sends = registry.counter('sends_total', 'Sends', ['result'])
+    sends.labels('ok').inc()
+    sends.labels('ok').inc(2)
+    sends.labels('error').inc()
+    assert registry.counter('sends_total', 'Sends', ['result']) is sends, "Повторная регистрация возвращает ту же метрику"
+
+    queue = registry.gauge('queue_size', 'Queue size')
+    queue.set_function(lambda: 7)
+
+    # Сборщик вызывается один раз на чтение и обновляет несколько рядов
+    collected = []
+    states = registry.gauge('states', 'States', ['state'])
+
+    def collect():
+        collected.append(1)
+        states.labels('a').set(2)
+        states.labels('b').set(5)
+
+    registry.add_collector(collect)
+
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    print(text)
+    assert '# TYPE sends_total counter' in text
+    assert _sample(text, 'sends_total{result="ok"}') == 3
+    assert _sample(text, 'sends_total{result="error"}') == 1
+    assert _sample(text, 'queue_size') == 7
+    assert _sample(text, 'states{state="a"}') == 2 and _sample(text, 'states{state="b"}') == 5
+    assert len(collected) == 1
+    registry.remove_collector(collect)
+    registry.render()
+    assert len(collected) == 1, "Удаленный сборщик не вызывается"
+    assert _sample(text, 'latency_seconds_bucket{le="0.1"}') == 2
+    assert _sample(text, 'latency_seconds_bucket{le="1"}') == 3
+    assert _sample(text, 'latency_seconds_bucket{le="+Inf"}') == 4
+    assert _sample(text, 'latency_seconds_count') == 4
+    assert _sample(text, 'latency_seconds_sum') == 3.65
+    print("✅ Метрики выводятся в текстовом формате")
+
+async def _run_endpoint():
+    registry = MetricsRegistry()
+    registry.counter('requests_total', 'Requests').inc(5)
+    server = MetricsServer(registry, port=0)
+    await server.start()
+    try:
+        async def get(path: str) -> str:
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            await writer.drain()
+            response = (await reader.read()).decode()
+            writer.close()
+            return response
+
+        response = await get('/metrics')
+        assert response.startswith("HTTP/1.1 200 OK")
+        assert "requests_total 5" in response
+        assert (await get('/other')).startswith("HTTP/1.1 404")
+    finally:
+        await server.stop()
+
+def test_endpoint():
+    """Тестирует HTTP-эндпоинт метрик"""
+    print("🧪 Тестирование HTTP-эндпоинта")
+    asyncio.run(_run_endpoint())
+    print("✅ Метрики отдаются по GET /metrics")
+
+async def _run_manager_metrics():
+    bot = MockBot()
+    manager = NotificationManager(bot, "test_metrics_notifications.json")
+    # Как бот: сборщик регистрируется на время работы менеджера
+    default_registry.add_collector(manager.collect_metrics)
+    before = default_registry.render()
+    try:
+        await manager.start_notification(1, "Первое", 30, "00:00")
+        await manager.start_notification(2, "Второе", 30, "00:00", tagged_users=[42])
+        manager.member_cache[(2, 42)] = "@user"
+        await asyncio.sleep(0.1)
+        manager.pause_notifications(1)
+
+        after = default_registry.render()
+        print(f"   Отправлено: {len(bot.sent_messages)}")
+        assert _sample(after, 'notifier_notifications{state="active"}') == 1
+        assert _sample(after, 'notifier_notifications{state="paused"}') == 1
+        sends = 'notifier_sends_total{result="ok"}'
+        assert _sample(after, sends) - _sample(before, sends, default=0) == 2
+        assert _sample(after, 'notifier_member_cache_requests_total{result="hit"}') >= 1
+        assert _sample(after, 'notifier_send_duration_seconds_count') >= 2
+        assert _sample(after, 'notifier_storage_flushes_total') >= 3
+        assert _sample(after, 'notifier_storage_flush_bytes_total') > 0
+    finally:
+        default_registry.remove_collector(manager.collect_metrics)
+        await manager.clear_all_notifications()
+
+def test_manager_metrics():
+    """Тестирует метрики менеджера уведомлений и хранилища"""
+    print("🧪 Тестирование метрик менеджера")
+    asyncio.run(_run_manager_metrics())
+    print("✅ Менеджер обновляет метрики")
+
+if __name__ == "__main__":
+    test_registry()
+    test_endpoint()
+    test_manager_metrics()
@@ -8,7 +8,7 @@ import logging
 import time
 from datetime import datetime, timedelta
 from typing import Dict
-import pytz
+from zoneinfo import ZoneInfo
 from notification_manager import NotificationManager
 
 # Настройка логирования
@@ -20,7 +20,7 @@ class MockBot:
         self.sent_messages = []
     
     async def send_message(self, chat_id, text):
-        timestamp = datetime.now(pytz.timezone('Europe/Moscow'))
+        timestamp = datetime.now(ZoneInfo('Europe/Moscow'))
         self.sent_messages.append({
             'chat_id': chat_id,
             'text': text,
@@ -79,7 +79,7 @@ async def test_quick_pause_resume():
     manager = TestNotificationManager(bot, "test_quick.json")
     
     # Запускаем уведомления с текущим временем
-    now = datetime.now(pytz.timezone('Europe/Moscow'))
+    now = datetime.now(ZoneInfo('Europe/Moscow'))
     start_time = now.strftime('%H:%M')
     
     print(f"🕐 Время начала: {start_time}")
@@ -127,7 +127,7 @@ async def test_quick_pause_resume():
             await asyncio.sleep(wait_seconds)
         else:
             # Ждем до следующего времени начала
-            wait_seconds = (next_start - datetime.now(pytz.timezone('Europe/Moscow'))).total_seconds()
+            wait_seconds = (next_start - datetime.now(ZoneInfo('Europe/Moscow'))).total_seconds()
             if wait_seconds > 0:
                 print(f"⏳ Ожидание {wait_seconds:.0f} секунд до возобновления...")
                 await asyncio.sleep(wait_seconds + 5)
@@ -170,7 +170,7 @@ async def test_logic_verification():
     manager = TestNotificationManager(bot, "test_logic.json")
     
     # Запускаем уведомления
-    now = datetime.now(pytz.timezone('Europe/Moscow'))
+    now = datetime.now(ZoneInfo('Europe/Moscow'))
     start_time = now.strftime('%H:%M')
     
     await manager.start_notification(12345, "Тест логики", 1, start_time)
@@ -221,7 +221,7 @@ async def test_detailed_logic():
     
     # Тест 1: Ответ до времени начала
     print("📋 Тест 1: Ответ до времени начала (09:00)")
-    now = datetime.now(pytz.timezone('Europe/Moscow'))
+    now = datetime.now(ZoneInfo('Europe/Moscow'))
     
     # Создаем уведомление с временем начала 09:00
     await manager.start_notification(12345, "Тест 1", 1, "09:00")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Тест таймера возобновления: приостановленные уведомления не тикают
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict
+from notification_manager import NotificationManager
+
+class MockBot:
+    def __init__(self):
+        self.sent_messages = []
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = None, message_thread_id: int = None):
+        self.sent_messages.append(text)
+
+class QuickResumeManager(NotificationManager):
+    """Менеджер, возобновляющий уведомления через долю секунды после ответа"""
+
+    resume_delay = timedelta(seconds=0.3)
+
+    def _get_next_start_time(self, notification_data: Dict) -> datetime:
+        return notification_data['last_response_time'] + self.resume_delay
+
+async def _run_pause_timer():
+    manager = QuickResumeManager(MockBot(), "test_pause_timer_notifications.json")
+    chat_id = 12345
+
+    try:
+        await manager.start_notification(chat_id, "Пора пить воду!", 30, "00:00")
+        notification_data = manager.active_notifications[chat_id]
+        loop_task = notification_data['task']
+
+        # Приостановка заменяет тикающий цикл одним таймером
+        manager.pause_notifications(chat_id)
+        await asyncio.sleep(0.05)
+        print(f"   Старый цикл отменен: {loop_task.cancelled()}")
+        assert loop_task.cancelled(), "Цикл проверок должен быть остановлен"
+        assert notification_data['task'] is not loop_task
+        assert not notification_data['active']
+
+        # Таймер возобновляет уведомления в вычисленный момент
+        await asyncio.sleep(0.4)
+        print(f"   Возобновлено: {notification_data['active']}")
+        assert notification_data['active'], "Уведомления должны возобновиться по таймеру"
+        assert notification_data['last_response_time'] is None
+    finally:
+        await manager.clear_all_notifications()
+
+def test_pause_timer():
+    """Тестирует возобновление приостановленных уведомлений по таймеру"""
+    print("🧪 Тестирование таймера возобновления")
+    asyncio.run(_run_pause_timer())
+    print("✅ Приостановленные уведомления возобновляются по таймеру")
+
+if __name__ == "__main__":
+    test_pause_timer()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Тест профилирования работающего процесса для команды /perf
+"""
+
+import asyncio
+import marshal
+import os
+import pstats
+from profiling import LiveProfiler, ProfilerBusyError
+
+def _busy_work():
+    return sum(index * index for index in range(20000))
+
+async def _background_load(stop: asyncio.Event):
+    while not stop.is_set():
+        _busy_work()
+        await asyncio.sleep(0.01)
+
+async def _run_profile():
+    profiler = LiveProfiler(max_seconds=1.0)
+    stop = asyncio.Event()
+    load = asyncio.create_task(_background_load(stop))
+    try:
+        profile_task = asyncio.create_task(profiler.profile(0.3))
+        await asyncio.sleep(0.05)
+
+        # Второй замер во время первого отклоняется
+        assert profiler.busy
+        try:
+            await profiler.profile(0.1)
+        except ProfilerBusyError:
+            print("   ✅ Параллельный замер отклонен")
+        else:
+            raise AssertionError("Параллельное профилирование должно быть отклонено")
+
+        snapshot = await profile_task
+    finally:
+        stop.set()
+        await load
+    assert not profiler.busy
+    return snapshot
+
+def test_live_profile():
+    """Тестирует замер фоновой нагрузки и формат файла .prof"""
+    print("🧪 Тестирование профилирования")
+    snapshot = asyncio.run(_run_profile())
+
+    summary = snapshot.summary(10)
+    print(summary)
+    assert "_busy_work" in summary, "Фоновая задача должна попасть в профиль"
+
+    # Сырые данные читаются стандартным pstats
+    prof_file = "test_profiling.prof"
+    try:
+        with open(prof_file, 'wb') as f:
+            f.write(snapshot.data)
+        stats = pstats.Stats(prof_file)
+        assert any(name == '_busy_work' for _, _, name in stats.stats)
+        assert marshal.loads(snapshot.data) == stats.stats
+    finally:
+        os.remove(prof_file)
+    print("✅ Профиль снимается и сохраняется в формате .prof")
+
+if __name__ == "__main__":
+    test_live_profile()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Тест правил повторения cron: разбор, следующее срабатывание и работа в менеджере
+"""
+
+import random
+from datetime import datetime, timezone
+from notification_manager import NotificationManager
+from recurrence import CronRule
+from timeutils import Clock, get_zone
+
+class MockBot:
+    pass
+
+class FixedClock(Clock):
+    """Часы, остановленные в заданный момент"""
+
+    def __init__(self, moment: datetime):
+        super().__init__()
+        self.moment = moment.timestamp()
+
+    def time(self) -> float:
+        return self.moment
+
+def _local(*args) -> int:
+    """Местное время в секундах «как если бы в UTC»"""
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+def test_parsing():
+    """Тестирует разбор выражений и ошибки в них"""
+    print("🧪 Тестирование разбора правил")
+
+    rule = CronRule("*/15 9-18 * * пн-пт")
+    assert rule.minutes == 1 << 0 | 1 << 15 | 1 << 30 | 1 << 45
+    assert rule.hours == sum(1 << hour for hour in range(9, 19))
+    assert rule.weekdays == 0b0011111
+
+    # В cron 0 и 7 — воскресенье
+    assert CronRule("0 9 * * 0").weekdays == CronRule("0 9 * * 7").weekdays == 1 << 6
+    assert CronRule("0 9 * * 1-5").weekdays == 0b0011111
+
+    for expression in ("0 9 * *", "60 9 * * *", "0 9 * * foo", "*/0 9 * * *", "0 9 32 * *"):
+        try:
+            CronRule(expression)
+        except ValueError as e:
+            print(f"   ✅ «{expression}»: {e}")
+        else:
+            raise AssertionError(f"Выражение «{expression}» должно быть отклонено")
+    print("✅ Правила разбираются корректно")
+
+def test_next_fire():
+    """Тестирует следующее срабатывание, в том числе против поминутного перебора"""
+    print("🧪 Тестирование следующего срабатывания")
+
+    # 07.06.2024 — пятница
+    rule = CronRule("*/30 9-18 * * пн-пт")
+    assert rule.next_fire(_local(2024, 6, 7, 17, 45)) == _local(2024, 6, 7, 18, 0)
+    assert rule.next_fire(_local(2024, 6, 7, 18, 30)) == _local(2024, 6, 10, 9, 0)
+    assert rule.next_fire(_local(2024, 6, 7, 9, 0)) == _local(2024, 6, 7, 9, 30), "Срабатывание строго позже"
+    assert rule.matches(_local(2024, 6, 7, 9, 30, 20))
+    assert not rule.matches(_local(2024, 6, 8, 9, 30))
+
+    # День месяца или день недели, как в cron
+    assert CronRule("0 12 13 * 5").next_fire(_local(2024, 6, 7, 13, 0)) == _local(2024, 6, 13, 12, 0)
+    assert CronRule("0 0 29 2 *").next_fire(_local(2024, 3, 1)) == _local(2028, 2, 29)
+    assert CronRule("0 0 30 2 *").next_fire(_local(2024, 3, 1)) is None
+
+    randomizer = random.Random(42)
+    for expression in ("*/30 9-18 * * 1-5", "7 3 1,15 * *", "0 0 * 2 вс", "5/20 */3 * * 0", "0 12 13 * 5"):
+        rule = CronRule(expression)
+        for _ in range(50):
+            moment = randomizer.randint(1_600_000_000, 1_800_000_000)
+            assert rule.next_fire(moment) == rule.naive_next_fire(moment), (expression, moment)
+    print("✅ Следующее срабатывание совпадает с поминутным перебором")
+
+def test_manager_rule():
+    """Тестирует правило повторения в менеджере уведомлений"""
+    print("🧪 Тестирование правила в менеджере")
+
+    moscow = get_zone('Europe/Moscow')
+    now = datetime(2024, 6, 7, 9, 10, 30, tzinfo=moscow)
+    manager = NotificationManager(MockBot(), "test_recurrence_notifications.json", clock=FixedClock(now))
+    notification_data = {'start_hour': 0, 'start_minute': 0, 'interval_minutes': 1,
+                         'cron': "*/30 9-18 * * пн-пт", 'last_response_time': None}
+
+    assert manager._is_in_active_window(datetime(2024, 6, 7, 9, 30, 5, tzinfo=moscow), notification_data)
+    assert not manager._is_in_active_window(datetime(2024, 6, 7, 9, 31, tzinfo=moscow), notification_data)
+
+    # Цикл спит до ближайшего срабатывания, а не проверяет каждую минуту
+    delay = manager._next_check_delay(notification_data)
+    print(f"   Пауза до срабатывания: {delay:.1f} с")
+    assert delay == 19 * 60 + 30
+
+    # Не больше одной отправки за совпавшую минуту
+    notification_data['last_sent'] = datetime(2024, 6, 7, 9, 30, 1, tzinfo=moscow)
+    assert not manager._should_send_notification(datetime(2024, 6, 7, 9, 30, 40, tzinfo=moscow), notification_data)
+    assert manager._should_send_notification(datetime(2024, 6, 7, 10, 0, tzinfo=moscow), notification_data)
+
+    # После ответа — первое срабатывание следующих суток (после пятницы — понедельник)
+    notification_data['last_response_time'] = datetime(2024, 6, 7, 9, 45, tzinfo=moscow)
+    assert manager._get_next_start_time(notification_data) == datetime(2024, 6, 10, 9, 0, tzinfo=moscow)
+    print("✅ Правило учитывается при отправке и возобновлении")
+
+if __name__ == "__main__":
+    test_parsing()
+    test_next_fire()
+    test_manager_rule()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Тест кэширования готового текста напоминаний
+"""
+
+import asyncio
+import os
+from telegram.error import NetworkError
+from notification_manager import NotificationManager
+
+class MockBot:
+    """Мок-объект бота, считающий обращения к API"""
+
+    def __init__(self, failures: int = 0):
+        self.sent_texts = []
+        self.member_requests = 0
+        # Сколько первых запросов участника завершатся ошибкой
+        self.failures = failures
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = None, message_thread_id: int = None):
+        """Имитирует отправку сообщения"""
+        self.sent_texts.append(text)
+
+    async def get_chat_member(self, chat_id: int, user_id):
+        """Имитирует получение информации о пользователе"""
+        self.member_requests += 1
+        if self.member_requests <= self.failures:
+            raise NetworkError("timed out")
+
+        class MockUser:
+            def __init__(self, user_id):
+                self.id = user_id
+                self.username = f"user{user_id}"
+                self.first_name = f"User{user_id}"
+
+        class MockChatMember:
+            def __init__(self, user_id):
+                self.user = MockUser(user_id)
+
+        return MockChatMember(user_id)
+
+async def _run_render_cache():
+    mock_bot = MockBot()
+    storage_file = "test_render_cache_notifications.json"
+    manager = NotificationManager(mock_bot, storage_file)
+    chat_id = -1001234567890
+
+    try:
+        await manager.start_notification(chat_id, "Пора пить воду!", 30, "09:00", [123, "dimoha_zadira"])
+        notification_data = manager.active_notifications[chat_id]
+
+        # Повторные отправки используют один и тот же объект текста
+        await manager._send_notification(chat_id, notification_data)
+        await manager._send_notification(chat_id, notification_data)
+        print(f"   Тексты: {mock_bot.sent_texts}")
+        assert mock_bot.sent_texts[0] is mock_bot.sent_texts[1], "Текст должен браться из кэша"
+        assert mock_bot.member_requests == 1, "Участник должен запрашиваться один раз"
+
+        # Ответ пользователя меняет версию и текст
+        manager.handle_user_response(chat_id, 123)
+        await manager._send_notification(chat_id, notification_data)
+        print(f"   После ответа: {mock_bot.sent_texts[-1]!r}")
+        assert "@user123" not in mock_bot.sent_texts[-1], "Ответивший пользователь не должен тегаться"
+        assert "@dimoha_zadira" in mock_bot.sent_texts[-1]
+
+        # Изменение кэша участников тоже сбрасывает текст
+        notification_data['responded_users'].clear()
+        manager._bump_render_version(notification_data)
+        manager.update_member_cache(chat_id, 123, "renamed_user", "Renamed")
+        await manager._send_notification(chat_id, notification_data)
+        print(f"   После смены username: {mock_bot.sent_texts[-1]!r}")
+        assert "@renamed_user" in mock_bot.sent_texts[-1]
+        assert mock_bot.member_requests == 1, "Обновленный кэш не должен требовать запросов"
+    finally:
+        await manager.clear_all_notifications()
+        if os.path.exists(storage_file):
+            os.remove(storage_file)
+
+async def _run_failed_lookup():
+    mock_bot = MockBot(failures=1)
+    storage_file = "test_render_cache_failure_notifications.json"
+    manager = NotificationManager(mock_bot, storage_file)
+    chat_id = -1001234567891
+
+    try:
+        await manager.start_notification(chat_id, "Пора пить воду!", 30, "09:00", [123])
+        notification_data = manager.active_notifications[chat_id]
+
+        # Первый запрос участника не удался: в тексте заглушка, но текст не кэшируется
+        await manager._send_notification(chat_id, notification_data)
+        await manager._send_notification(chat_id, notification_data)
+        await manager._send_notification(chat_id, notification_data)
+        print(f"   Тексты: {mock_bot.sent_texts}")
+        assert "Пользователь" in mock_bot.sent_texts[0]
+        assert "@user123" in mock_bot.sent_texts[1], "После сбоя упоминание должно запрашиваться снова"
+        assert mock_bot.sent_texts[2] is mock_bot.sent_texts[1], "Полный текст берется из кэша"
+        assert mock_bot.member_requests == 2
+    finally:
+        await manager.clear_all_notifications()
+        if os.path.exists(storage_file):
+            os.remove(storage_file)
+
+def test_render_cache():
+    """Тестирует повторное использование готового текста напоминания"""
+    print("🧪 Тестирование кэша текста напоминаний")
+    asyncio.run(_run_render_cache())
+    print("✅ Кэш текста работает корректно")
+
+def test_failed_lookup_not_cached():
+    """Тестирует, что заглушка после сбоя запроса участника не закрепляется в кэше"""
+    print("🧪 Тестирование сбоя запроса участника")
+    asyncio.run(_run_failed_lookup())
+    print("✅ Упоминание восстанавливается после временного сбоя")
+
+if __name__ == "__main__":
+    test_render_cache()
+    test_failed_lookup_not_cached()
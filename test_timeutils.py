@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Тест работы со временем: zoneinfo, таблицы переходов, часовые пояса чатов и хранилище
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timezone
+from telegram import Update
+import config
+from bot import AnnoyingBot
+from fake_telegram_server import FakeTelegramServer
+from replay_updates import RecordingBot
+from timeutils import Clock, ZoneTransitions, get_zone
+from notification_manager import NotificationManager
+from storage import NotificationStorage
+
+def test_transitions():
+    """Тестирует таблицу переходов, в том числе на переходе на летнее время"""
+    print("🧪 Тестирование таблицы переходов")
+
+    moscow = ZoneTransitions(get_zone('Europe/Moscow'))
+    assert moscow.offset_at(datetime(2024, 1, 15, tzinfo=timezone.utc).timestamp()) == 3 * 3600
+
+    # Берлин переходит на летнее время 31.03.2024 в 01:00 UTC
+    berlin = ZoneTransitions(get_zone('Europe/Berlin'))
+    before = datetime(2024, 3, 31, 0, 59, tzinfo=timezone.utc).timestamp()
+    after = datetime(2024, 3, 31, 1, 0, tzinfo=timezone.utc).timestamp()
+    print(f"   Берлин до перехода: {berlin.offset_at(before)}, после: {berlin.offset_at(after)}")
+    assert berlin.offset_at(before) == 3600
+    assert berlin.offset_at(after) == 7200
+
+    # Местное время переводится в UTC с учетом перехода
+    local_nine = int(datetime(2024, 3, 31, 9, 0, tzinfo=timezone.utc).timestamp())
+    assert berlin.local_to_utc(local_nine) == datetime(2024, 3, 31, 7, 0, tzinfo=timezone.utc).timestamp()
+    local_gap = int(datetime(2024, 3, 31, 2, 30, tzinfo=timezone.utc).timestamp())
+    assert berlin.local_to_utc(local_gap) == datetime(2024, 3, 31, 1, 30, tzinfo=timezone.utc).timestamp()
+
+    clock = Clock()
+    assert abs(clock.time() - datetime.now(timezone.utc).timestamp()) < 1.0
+    assert clock.transitions(get_zone('Europe/Berlin')) is clock.transitions(get_zone('Europe/Berlin'))
+    print("✅ Смещения вычисляются корректно")
+
+def test_storage_keeps_instant():
+    """Тестирует, что время после перезагрузки не сдвигается (ошибка LMT в pytz)"""
+    print("🧪 Тестирование восстановления времени из хранилища")
+
+    storage = NotificationStorage("test_timeutils_notifications.json")
+    sent_at = datetime(2024, 6, 1, 12, 30, tzinfo=get_zone('Europe/Moscow'))
+    try:
+        storage.save_notifications({
+            1: {'message': 'Тест', 'interval_minutes': 30, 'start_hour': 9, 'start_minute': 0,
+                'active': True, 'last_sent': sent_at}
+        })
+        restored = storage.load_notifications()[1]['last_sent']
+        print(f"   Сохранено: {sent_at.isoformat()}, восстановлено: {restored.isoformat()}")
+        assert restored == sent_at
+        assert restored.utcoffset() == sent_at.utcoffset()
+    finally:
+        storage.delete_storage()
+        assert not os.path.exists("test_timeutils_notifications.json")
+    print("✅ Время восстанавливается без сдвига")
+
+class MockBot:
+    pass
+
+def test_active_window():
+    """Тестирует окно с времени начала до 02:00 следующего дня"""
+    print("🧪 Тестирование активного окна")
+
+    manager = NotificationManager(MockBot(), "test_timeutils_notifications.json")
+    moscow = get_zone('Europe/Moscow')
+    notification_data = {'start_hour': 9, 'start_minute': 0}
+
+    test_cases = [
+        (datetime(2024, 6, 1, 8, 59, tzinfo=moscow), False),
+        (datetime(2024, 6, 1, 9, 0, tzinfo=moscow), True),
+        (datetime(2024, 6, 1, 23, 30, tzinfo=moscow), True),
+        (datetime(2024, 6, 2, 1, 59, tzinfo=moscow), True),
+        (datetime(2024, 6, 2, 2, 0, tzinfo=moscow), False),
+    ]
+    for now, expected in test_cases:
+        result = manager._is_in_active_window(now, notification_data)
+        print(f"   {'✅' if result == expected else '❌'} {now.strftime('%d.%m %H:%M')}: {result}")
+        assert result == expected
+    print("✅ Окно определяется корректно")
+
+def test_chat_timezone():
+    """Тестирует окно и время возобновления в часовом поясе чата"""
+    print("🧪 Тестирование часового пояса чата")
+
+    manager = NotificationManager(MockBot(), "test_timeutils_notifications.json")
+    new_york = get_zone('America/New_York')
+    notification_data = {'start_hour': 9, 'start_minute': 0, 'timezone': 'America/New_York'}
+
+    # 09:30 в Нью-Йорке — это 16:30 по Москве
+    now = datetime(2024, 6, 1, 9, 30, tzinfo=new_york)
+    assert manager._is_in_active_window(now, notification_data)
+    assert not manager._is_in_active_window(datetime(2024, 6, 1, 8, 30, tzinfo=new_york), notification_data)
+
+    # Ответ накануне перехода на летнее время: возобновление в 09:00 по новому смещению
+    berlin = get_zone('Europe/Berlin')
+    notification_data = {'start_hour': 9, 'start_minute': 0, 'timezone': 'Europe/Berlin',
+                         'last_response_time': datetime(2024, 3, 30, 10, 0, tzinfo=berlin)}
+    next_start = manager._get_next_start_time(notification_data)
+    print(f"   Возобновление: {next_start.isoformat()}")
+    assert next_start == datetime(2024, 3, 31, 9, 0, tzinfo=berlin)
+    assert next_start.utcoffset().total_seconds() == 7200
+
+    # Ответ до времени начала: возобновление в тот же день
+    notification_data['last_response_time'] = datetime(2024, 3, 30, 8, 0, tzinfo=berlin)
+    assert manager._get_next_start_time(notification_data) == datetime(2024, 3, 30, 9, 0, tzinfo=berlin)
+
+    # Часовой пояс сохраняется в хранилище
+    storage = NotificationStorage("test_timeutils_notifications.json")
+    try:
+        storage.save_notifications({1: {'message': 'Тест', 'interval_minutes': 30, 'start_hour': 9,
+                                        'start_minute': 0, 'active': False, 'timezone': 'Europe/Berlin',
+                                        'last_response_time': notification_data['last_response_time']}})
+        restored = storage.load_notifications()[1]
+        assert restored['timezone'] == 'Europe/Berlin'
+        assert restored['last_response_time'].tzinfo is berlin
+    finally:
+        storage.delete_storage()
+    print("✅ Часовой пояс чата учитывается")
+
+async def _run_invalid_timezones(names):
+    replies = []
+
+    def on_request(method, parameters):
+        if method == 'sendmessage':
+            replies.append(parameters['text'])
+
+    server = FakeTelegramServer(on_request=on_request)
+    bot = RecordingBot("123456:TZ", server)
+    annoying_bot = AnnoyingBot(bot=bot)
+    async with annoying_bot.application:
+        for update_id, name in enumerate(names, 1):
+            text = f"/begin_notif Вода 30 09:00 tz={name}"
+            await annoying_bot.application.process_update(Update.de_json({'update_id': update_id, 'message': {
+                'message_id': update_id, 'date': 0, 'text': text,
+                'chat': {'id': 42, 'type': 'private', 'first_name': "Тест"},
+                'from': {'id': 42, 'is_bot': False, 'first_name': "Тест"},
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len("/begin_notif")}],
+            }}, bot))
+        running = annoying_bot.notification_manager.contains(42)
+    return replies, running
+
+def test_invalid_timezone_reply():
+    """Тестирует подсказку для неверных часовых поясов, включая каталоги и длинные имена"""
+    print("🧪 Тестирование неверных часовых поясов")
+    names = ["Mars/Olympus", "Europe", "x" * 300, "../etc/passwd"]
+    with tempfile.TemporaryDirectory() as directory:
+        saved = config.STORAGE_FILE, config.USERNAME_CACHE_FILE
+        config.STORAGE_FILE = os.path.join(directory, 'notifications.json')
+        config.USERNAME_CACHE_FILE = os.path.join(directory, 'usernames.json')
+        try:
+            replies, running = asyncio.run(_run_invalid_timezones(names))
+        finally:
+            config.STORAGE_FILE, config.USERNAME_CACHE_FILE = saved
+
+    assert len(replies) == len(names)
+    for name, reply in zip(names, replies):
+        print(f"   tz={name[:20]}: {reply.splitlines()[0][:60]}")
+        assert reply.startswith("❌ Неизвестный часовой пояс"), reply
+    assert not running
+    print("✅ Неверный часовой пояс получает подсказку")
+
+if __name__ == "__main__":
+    test_transitions()
+    test_storage_keeps_instant()
+    test_active_window()
+    test_chat_timezone()
+    test_invalid_timezone_reply()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Тест записи обновлений с анонимизацией и их воспроизведения через обработчики бота
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import config
+from telegram import Update
+from update_capture import Anonymizer, UpdateCapture, read_capture
+from replay_updates import format_report, replay
+
+def _message_update(update_id: int, chat: dict, user: dict, text: str, entities=None) -> dict:
+    message = {'message_id': update_id, 'date': 1700000000 + update_id, 'chat': chat, 'from': user, 'text': text}
+    if entities:
+        message['entities'] = entities
+    return {'update_id': update_id, 'message': message}
+
+USER = {'id': 5550001, 'is_bot': False, 'first_name': "Иван", 'last_name': "Петров", 'username': "ivan_petrov"}
+PRIVATE = {'id': 5550001, 'type': 'private', 'first_name': "Иван", 'username': "ivan_petrov"}
+GROUP = {'id': -1001234567890, 'type': 'supergroup', 'title': "Рабочий чат"}
+
+def test_anonymizer():
+    """Тестирует замену идентификаторов, имен и текста"""
+    print("🧪 Тестирование анонимизации")
+    anonymizer = Anonymizer("salt")
+    command = "/begin_notif \"Позвонить маме +7 999 1234567\" 30 09:00 tz=Europe/Berlin @ivan_petrov"
+    update = anonymizer.anonymize(_message_update(
+        1, GROUP, USER, command,
+        [{'type': 'bot_command', 'offset': 0, 'length': 12},
+         {'type': 'mention', 'offset': command.index('@'), 'length': len("@ivan_petrov")}]
+    ))
+    message = update['message']
+    print(f"   {message}")
+
+    assert message['from']['id'] != USER['id'] and message['from']['id'] > 0
+    assert message['from']['username'] != USER['username']
+    assert 'last_name' not in message['from']
+    assert message['from']['first_name'] == "User"
+    # Супергруппа остается супергруппой
+    assert str(message['chat']['id']).startswith('-100') and message['chat']['id'] != GROUP['id']
+    assert message['chat']['title'] == "Chat"
+
+    # Упоминание в команде совпадает с псевдонимом автора и не сдвигает entities
+    mention = message['entities'][1]
+    text = message['text']
+    assert text[mention['offset']:mention['offset'] + mention['length']] == '@' + message['from']['username']
+    # Текст напоминания скрыт целиком, аргументы расписания сохранены
+    assert text.startswith("/begin_notif xxxxxxxxxx xxxx xx xxx xxxxxxxx 30 09:00 tz=Europe/Berlin @"), text
+    assert "999" not in text and "маме" not in text
+
+    # Один пользователь — один псевдоним; id личного чата совпадает с id пользователя
+    private = anonymizer.anonymize(_message_update(2, PRIVATE, USER, "Привет 👋"))['message']
+    assert private['from']['id'] == message['from']['id'] == private['chat']['id']
+    # Обычный текст скрыт, длина в UTF-16 сохранена
+    assert private['text'] == "xxxxxx xx"
+    assert Anonymizer("other").user_id(USER['id']) != message['from']['id']
+
+    # Ссылки и id при переходе группы в супергруппу не попадают в запись
+    linked = anonymizer.anonymize({'update_id': 3, 'message': {
+        'message_id': 3, 'date': 0, 'chat': GROUP, 'from': USER, 'text': "тут",
+        'entities': [{'type': 'text_link', 'offset': 0, 'length': 3, 'url': "https://example.com/secret"}],
+        'migrate_from_chat_id': -1234567,
+    }})['message']
+    assert "secret" not in linked['entities'][0]['url']
+    assert linked['migrate_from_chat_id'] == anonymizer.user_id(-1234567) != -1234567
+    print("✅ Обновления анонимизируются согласованно")
+
+def test_unknown_strings_masked():
+    """Тестирует, что строки вне списка разрешенных ключей скрываются"""
+    print("🧪 Тестирование скрытия прочих строк")
+    secrets = ["Мария Иванова", "Редакция Вестника", "Главный редактор", "Семейный чат Ивановых",
+               "паспорт_Иванова.pdf", "Когда у мамы день рождения?", "ул. Ленина, д. 5, кв. 12"]
+    update = {'update_id': 1, 'message': {
+        'message_id': 1, 'date': 0, 'chat': GROUP, 'from': USER,
+        'forward_sender_name': secrets[0], 'forward_date': 0,
+        'forward_signature': secrets[1], 'author_signature': secrets[2],
+        'new_chat_title': secrets[3],
+        'document': {'file_id': "BQACAgIAAxk", 'file_unique_id': "AgADxk", 'file_name': secrets[4]},
+        'poll': {'id': "5432109876", 'question': secrets[5], 'options': [{'text': "В мае", 'voter_count': 0}],
+                 'total_voter_count': 0, 'is_closed': False, 'is_anonymous': True, 'type': 'regular',
+                 'allows_multiple_answers': False},
+        'venue': {'location': {'latitude': 55.75, 'longitude': 37.62}, 'title': "Дом", 'address': secrets[6]},
+    }}
+    anonymized = Anonymizer("salt").anonymize(update)
+    raw = json.dumps(anonymized, ensure_ascii=False)
+    print(f"   {raw[:160]}...")
+    for secret in secrets + ["В мае", "Дом", "55.75"]:
+        assert secret not in raw, secret
+
+    # Структура обновления сохраняется: PTB разбирает его, типы на месте
+    message = Update.de_json(anonymized, None).message
+    assert message.chat.type == 'supergroup'
+    assert message.poll.type == 'regular'
+    assert len(message.document.file_name) == len(secrets[4])
+    print("✅ Подписи, названия, вопросы и адреса скрываются")
+
+def test_group_command_suffix():
+    """Тестирует команду с именем бота: суффикс убирается, entities сдвигаются"""
+    print("🧪 Тестирование команд с именем бота")
+    text = "/status@AnnoyingNotifierBot @ivan_petrov"
+    message = Anonymizer("salt").anonymize(_message_update(
+        1, GROUP, USER, text,
+        [{'type': 'bot_command', 'offset': 0, 'length': len("/status@AnnoyingNotifierBot")},
+         {'type': 'mention', 'offset': text.index(' @') + 1, 'length': len("@ivan_petrov")}]
+    ))['message']
+    print(f"   {message['text']} {message['entities']}")
+    assert message['text'].startswith("/status @")
+    assert message['entities'][0] == {'type': 'bot_command', 'offset': 0, 'length': len("/status")}
+    mention = message['entities'][1]
+    assert message['text'][mention['offset']:mention['offset'] + mention['length']] == '@' + message['from']['username']
+    print("✅ Групповые команды воспроизводятся любым ботом")
+
+def test_capture_file():
+    """Тестирует запись и чтение файла"""
+    print("🧪 Тестирование файла записи")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'capture.jsonl')
+        capture = UpdateCapture(path, "salt")
+        capture.write(_message_update(1, PRIVATE, USER, "/help"), timestamp=10.0)
+        capture.write(_message_update(2, PRIVATE, USER, "/status"), timestamp=10.5)
+        capture.close()
+
+        records = list(read_capture(path))
+        with open(path, encoding='utf-8') as f:
+            raw = f.read()
+    assert [record['ts'] for record in records] == [10.0, 10.5]
+    assert records[1]['update']['message']['text'] == "/status"
+    assert "ivan_petrov" not in raw and "Иван" not in raw
+    print("✅ Записи сохраняются в JSON lines без персональных данных")
+
+def test_replay():
+    """Тестирует воспроизведение записи через обработчики AnnoyingBot"""
+    print("🧪 Тестирование воспроизведения")
+    anonymizer = Anonymizer("salt")
+    commands = [(PRIVATE, "/help"), (PRIVATE, "/status"), (PRIVATE, "привет"), (GROUP, "/status@AnnoyingNotifierBot")]
+    records = []
+    for index, (chat, text) in enumerate(commands):
+        entities = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}] if text.startswith('/') else None
+        records.append({'ts': 100.0 + index * 0.01,
+                        'update': anonymizer.anonymize(_message_update(index + 1, chat, USER, text, entities))})
+
+    with tempfile.TemporaryDirectory() as directory:
+        saved = config.STORAGE_FILE, config.USERNAME_CACHE_FILE
+        config.STORAGE_FILE = os.path.join(directory, 'notifications.json')
+        config.USERNAME_CACHE_FILE = os.path.join(directory, 'usernames.json')
+        try:
+            results, background_calls = asyncio.run(replay(records, speed=1.0, latency=0.01))
+        finally:
+            config.STORAGE_FILE, config.USERNAME_CACHE_FILE = saved
+
+    report = format_report(results, background_calls)
+    print(report)
+    assert [result.category for result in results] == ["/help", "/status", "message", "/status"]
+    for result in results:
+        assert result.calls == {'sendMessage': 1}, f"{result.category}: {result.calls}"
+        assert result.latency >= 0.01, "Задержка Bot API входит в обработку"
+    assert background_calls['getMe'] == 1
+    assert "/status" in report
+    print("✅ Запись воспроизводится, запросы к API считаются по обновлениям")
+
+if __name__ == "__main__":
+    test_anonymizer()
+    test_unknown_strings_masked()
+    test_group_command_suffix()
+    test_capture_file()
+    test_replay()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Тест фильтра входящих сообщений по чатам с напоминаниями
+"""
+
+from datetime import datetime
+from telegram import Chat, Message, User
+from update_filters import NotificationChatFilter
+
+class MockManager:
+    """Мок-менеджер с реестром уведомлений"""
+
+    def __init__(self, notifications):
+        self.notifications = notifications
+
+    def get(self, chat_id):
+        return self.notifications.get(chat_id)
+
+def make_message(chat_id: int, chat_type: str, user_id: int, username: str = None) -> Message:
+    """Создает текстовое сообщение от пользователя"""
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(chat_id, chat_type),
+        from_user=User(user_id, f"User{user_id}", False, username=username),
+        text="привет"
+    )
+
+def test_notification_chat_filter():
+    """Тестирует отбрасывание нерелевантных сообщений"""
+    print("🧪 Тестирование фильтра сообщений")
+    print("=" * 50)
+
+    group_id = -1001234567890
+    private_id = 12345
+    manager = MockManager({
+        group_id: {'tagged_users': [111, "dimoha_zadira"]},
+        private_id: {'tagged_users': []}
+    })
+    message_filter = NotificationChatFilter(manager)
+
+    test_cases = [
+        ("Чат без напоминаний", make_message(-100999, 'supergroup', 111), False),
+        ("Личный чат с напоминанием", make_message(private_id, 'private', private_id), True),
+        ("Тегированный user_id", make_message(group_id, 'supergroup', 111), True),
+        ("Тегированный username", make_message(group_id, 'supergroup', 222, "dimoha_zadira"), True),
+        ("Посторонний участник", make_message(group_id, 'supergroup', 333, "someone"), False),
+    ]
+
+    for name, message, expected in test_cases:
+        result = bool(message_filter.filter(message))
+        print(f"   {'✅' if result == expected else '❌'} {name}: {result}")
+        assert result == expected, f"Неверный результат фильтра: {name}"
+
+    # Без фильтрации авторов пропускаются все сообщения из чата с напоминанием
+    open_filter = NotificationChatFilter(manager, filter_authors=False)
+    assert open_filter.filter(make_message(group_id, 'supergroup', 333, "someone"))
+
+    print("✅ Фильтр работает корректно")
+
+if __name__ == "__main__":
+    test_notification_chat_filter()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Тест кэша username -> user_id и разрешения тегов в /begin_notif
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+import config
+from telegram import Update
+from bot import AnnoyingBot
+from fake_telegram_server import FakeTelegramServer
+from replay_updates import RecordingBot
+from username_cache import UsernameCache
+
+def test_normalization_and_persistence():
+    """Тестирует регистр, префикс @ и сохранение в файл"""
+    print("🧪 Тестирование кэша username")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'usernames.json')
+        cache = UsernameCache(path)
+        assert cache.remember("@Ivan_Petrov", 101)
+        assert not cache.remember("ivan_petrov", 101), "Повторное соответствие не меняет кэш"
+        assert not cache.remember(None, 102)
+        assert cache.get("IVAN_PETROV") == 101
+        assert cache.get("@ivan_petrov") == 101
+
+        # Вне цикла событий изменения сохраняются сразу
+        assert UsernameCache(path).get("ivan_petrov") == 101
+    print("✅ Username нормализуются и сохраняются")
+
+async def _run_debounce(path: str):
+    cache = UsernameCache(path, save_delay=0.1)
+    for user_id in range(100):
+        cache.remember(f"user{user_id}", user_id)
+    # Сохранение отложено и объединено
+    assert not os.path.exists(path)
+    await asyncio.sleep(0.2)
+    assert UsernameCache(path).get("user99") == 99
+
+    cache.remember("late", 1000)
+    cache.flush()
+    assert UsernameCache(path).get("late") == 1000
+
+def test_debounced_save():
+    """Тестирует объединение сохранений внутри цикла событий"""
+    print("🧪 Тестирование отложенного сохранения")
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(_run_debounce(os.path.join(directory, 'usernames.json')))
+    print("✅ Сохранения объединяются, flush() записывает сразу")
+
+class SlowMemberBot(RecordingBot):
+    """Бот, который ищет участников медленно и считает запросы"""
+
+    def __init__(self, token: str, api: FakeTelegramServer):
+        super().__init__(token, api)
+        with self._unfrozen():
+            self.requests = []
+
+    async def get_chat_member(self, chat_id, user_id, *args, **kwargs):
+        self.requests.append(user_id)
+        found_id = 7000 + len(self.requests)
+        await asyncio.sleep(0.2)
+        if user_id == "@ghost":
+            raise ValueError("user not found")
+        return await super().get_chat_member(chat_id, found_id, *args, **kwargs)
+
+class MockContext:
+    def __init__(self, bot):
+        self.bot = bot
+
+async def _run_resolve():
+    bot = SlowMemberBot("123456:CACHE", FakeTelegramServer())
+    annoying_bot = AnnoyingBot(bot=bot)
+
+    async with annoying_bot.application:
+        # Автор сообщения запоминается до фильтров, даже в чате без напоминаний
+        await annoying_bot.application.process_update(Update.de_json({'update_id': 1, 'message': {
+            'message_id': 1, 'date': 0, 'chat': {'id': -100500, 'type': 'supergroup', 'title': "Чат"},
+            'from': {'id': 42, 'is_bot': False, 'first_name': "Аня", 'username': "Anya"}, 'text': "привет",
+        }}, bot))
+        assert annoying_bot.username_cache.get("anya") == 42
+
+        started = time.perf_counter()
+        tagged = await annoying_bot._resolve_usernames(MockContext(bot), -100500, ["anya", "boris", "vera", "ghost"])
+        elapsed = time.perf_counter() - started
+        await annoying_bot.application.post_stop(annoying_bot.application)
+    return tagged, bot.requests, elapsed, annoying_bot.username_cache
+
+def test_resolve_usernames():
+    """Тестирует параллельное разрешение тегов и пассивное пополнение кэша"""
+    print("🧪 Тестирование разрешения тегов")
+    with tempfile.TemporaryDirectory() as directory:
+        saved = config.STORAGE_FILE, config.USERNAME_CACHE_FILE
+        config.STORAGE_FILE = os.path.join(directory, 'notifications.json')
+        config.USERNAME_CACHE_FILE = os.path.join(directory, 'usernames.json')
+        try:
+            tagged, requests, elapsed, cache = asyncio.run(_run_resolve())
+        finally:
+            config.STORAGE_FILE, config.USERNAME_CACHE_FILE = saved
+
+    print(f"   Теги: {tagged}, запросы: {requests}, {elapsed * 1000:.0f} мс")
+    assert tagged[0] == 42, "Известный username берется из кэша"
+    assert sorted(requests) == ["@boris", "@ghost", "@vera"]
+    # Три запроса по 0.2 с выполняются параллельно
+    assert elapsed < 0.4
+    assert {tagged[1], tagged[2]} == {7001, 7002}
+    assert tagged[3] == "ghost", "Ненайденный username сохраняется как строка"
+    assert cache.get("boris") == tagged[1] and cache.get("ghost") is None
+    print("✅ Теги разрешаются параллельно, найденные пополняют кэш")
+
+if __name__ == "__main__":
+    test_normalization_and_persistence()
+    test_debounced_save()
+    test_resolve_usernames()
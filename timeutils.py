@@ -0,0 +1,122 @@
+import asyncio
+import time
+from bisect import bisect_right
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from typing import Dict, List
+from zoneinfo import ZoneInfo
+
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    """Возвращает часовой пояс по имени (объекты зон кэшируются)"""
+    return ZoneInfo(name)
+
+class ZoneTransitions:
+    """Таблица переходов смещения зоны от UTC
+
+    Переходы (например, на летнее время) заранее вычисляются на horizon_days
+    вперед. Дальше смещение для любого момента находится бинарным поиском
+    по целым секундам эпохи, без обращений к базе часовых поясов.
+    """
+
+    SCAN_STEP = 3600
+
+    def __init__(self, zone: ZoneInfo, horizon_days: int = 400):
+        self.zone = zone
+        self.horizon_days = horizon_days
+        self.valid_from = 0
+        self.valid_until = -1
+        self.starts: List[int] = []
+        self.offsets: List[int] = []
+
+    def _offset(self, epoch: int) -> int:
+        return int(datetime.fromtimestamp(epoch, self.zone).utcoffset().total_seconds())
+
+    def _build(self, epoch: int):
+        """Строит таблицу переходов от суток до epoch на horizon_days вперед
+
+        Уже покрытый диапазон сохраняется, чтобы обращения к старым и текущим
+        моментам не перестраивали таблицу по очереди.
+        """
+        start = epoch - epoch % self.SCAN_STEP - 86400
+        end = start + self.horizon_days * 86400
+        if self.valid_from < self.valid_until:
+            start = min(start, self.valid_from)
+            end = max(end, self.valid_until)
+        starts = [start]
+        offsets = [self._offset(start)]
+
+        previous = start
+        for sample in range(start + self.SCAN_STEP, end + 1, self.SCAN_STEP):
+            offset = self._offset(sample)
+            if offset != offsets[-1]:
+                # Уточняем момент перехода до секунды
+                low, high = previous, sample
+                while high - low > 1:
+                    middle = (low + high) // 2
+                    if self._offset(middle) == offsets[-1]:
+                        low = middle
+                    else:
+                        high = middle
+                starts.append(high)
+                offsets.append(offset)
+            previous = sample
+
+        self.starts = starts
+        self.offsets = offsets
+        self.valid_from = start
+        self.valid_until = end
+
+    def offset_at(self, epoch: float) -> int:
+        """Смещение от UTC в секундах для момента epoch"""
+        epoch = int(epoch)
+        if not self.valid_from <= epoch < self.valid_until:
+            self._build(epoch)
+        return self.offsets[bisect_right(self.starts, epoch) - 1]
+
+    def local_to_utc(self, local_seconds: int) -> int:
+        """Переводит местное время (секунды «как если бы в UTC») в секунды эпохи
+
+        Для несуществующего времени в момент перехода результат попадает
+        сразу после перехода.
+        """
+        guess = local_seconds - self.offset_at(local_seconds)
+        return local_seconds - self.offset_at(guess)
+
+class Clock:
+    """Единый источник времени для планировщика
+
+    Эпоха фиксируется один раз при создании, дальше время отсчитывается по
+    монотонным часам: переводы системных часов не сдвигают расписание.
+    """
+
+    def __init__(self):
+        self._epoch_base = time.time()
+        self._monotonic_base = time.monotonic()
+        self._transitions: Dict[str, ZoneTransitions] = {}
+
+    def time(self) -> float:
+        """Текущее время в секундах эпохи"""
+        return self._epoch_base + (time.monotonic() - self._monotonic_base)
+
+    def monotonic(self) -> float:
+        """Монотонное время для измерения интервалов"""
+        return time.monotonic()
+
+    def now(self, zone: tzinfo) -> datetime:
+        """Текущее время в часовом поясе zone"""
+        return datetime.fromtimestamp(self.time(), zone)
+
+    def transitions(self, zone: ZoneInfo) -> ZoneTransitions:
+        """Возвращает общую таблицу переходов для зоны"""
+        table = self._transitions.get(zone.key)
+        if table is None:
+            table = self._transitions[zone.key] = ZoneTransitions(zone)
+        return table
+
+    async def sleep(self, seconds: float):
+        """Ждет указанное число секунд"""
+        await asyncio.sleep(seconds)
+
+# Общие часы процесса
+default_clock = Clock()
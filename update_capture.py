@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Ключи объектов User и Chat, по которым их можно узнать в словаре Update
+_PERSON_KEYS = ('first_name', 'is_bot', 'type')
+_MENTION = re.compile(r'^@(\w+)$')
+# Аргументы команд, которые задают расписание и сохраняются при записи
+_TIME = re.compile(r'^\d{1,2}:\d{2}(-\d{1,2}:\d{2})?$')
+_OPTION = re.compile(r'^(tz|days)=')
+_INTERVAL = re.compile(r'^\d+$')
+# Число полей правила после слова cron
+_CRON_FIELDS = 5
+# Ссылки (text_link, кнопки) заменяются этим адресом
+_PLACEHOLDER_URL = 'https://example.invalid/'
+# Строки, которые нужны обработчикам и разбору Update как есть: тип чата,
+# entity или опроса и статус участника. Остальные строки скрываются
+_KEEP_STRING_KEYS = ('type', 'status')
+# Объекты, которые не попадают в запись целиком
+_DROP_KEYS = ('last_name', 'bio', 'phone_number', 'contact', 'location')
+
+def _digest(salt: str, value: str) -> str:
+    return hashlib.sha256(f"{salt}:{value}".encode('utf-8')).hexdigest()
+
+class Anonymizer:
+    """Заменяет идентификаторы, имена и текст в обновлениях на псевдонимы
+
+    Замены детерминированы для одной соли: один и тот же пользователь
+    получает один и тот же id и username во всех обновлениях записи, а
+    id личного чата совпадает с id пользователя, как в Telegram. Username
+    заменяется строкой той же длины, а текст — символами «x» той же длины в
+    UTF-16, поэтому смещения entities остаются верными. В командах
+    сохраняются только сама команда (без суффикса @имя_бота) и аргументы
+    расписания вне кавычек: первый интервал, время и окна, tz=, days=,
+    правило cron и теги (как псевдонимы), чтобы команду можно было
+    воспроизвести. Прочие строки сохраняются только для ключей из
+    _KEEP_STRING_KEYS, все остальные (подписи, названия файлов, вопросы
+    опросов, адреса) скрываются той же маской.
+    """
+
+    def __init__(self, salt: str):
+        self.salt = salt
+
+    def user_id(self, value: int) -> int:
+        if not isinstance(value, int) or value == 0:
+            return value
+        sign = -1 if value < 0 else 1
+        pseudonym = int(_digest(self.salt, str(abs(value)))[:12], 16) % 1_000_000_000 + 1
+        # Супергруппы сохраняют вид -100XXXXXXXXXX
+        if abs(value) >= 1_000_000_000_000:
+            pseudonym += 1_000_000_000_000
+        return sign * pseudonym
+
+    def username(self, value: str) -> str:
+        name = 'u' + _digest(self.salt, value.lower())
+        return name[:max(len(value), 5)]
+
+    @staticmethod
+    def mask(value: str) -> str:
+        # Символы вне BMP занимают две единицы UTF-16
+        return ''.join(char if char.isspace() else ('x' if ord(char) < 0x10000 else 'xx') for char in value)
+
+    def text(self, value: str) -> str:
+        if not value.startswith('/'):
+            return self.mask(value)
+
+        parts = re.split(r'(\s+)', value)
+        result = [parts[0]]
+        interval_seen = False
+        cron_fields = 0
+        quoted = False
+        for part in parts[1:]:
+            if not part or part.isspace():
+                result.append(part)
+                continue
+            mention = _MENTION.match(part)
+            if quoted or part.startswith('"'):
+                # Текст напоминания в кавычках скрывается целиком, даже числа в нем
+                quoted = not (part.endswith('"') and (quoted or len(part) > 1))
+                part = self.mask(part)
+            elif cron_fields:
+                cron_fields -= 1
+            elif part.lower() == 'cron':
+                cron_fields = _CRON_FIELDS
+            elif _TIME.match(part) or _OPTION.match(part):
+                pass
+            elif mention:
+                part = '@' + self.username(mention.group(1))
+            elif _INTERVAL.match(part) and not interval_seen:
+                # Бот берет интервалом первое число; остальные числа — часть текста
+                interval_seen = True
+            else:
+                part = self.mask(part)
+            result.append(part)
+        return ''.join(result)
+
+    @staticmethod
+    def _strip_bot_suffix(message: Dict) -> Dict:
+        """Убирает @имя_бота из команды: при воспроизведении имя бота другое"""
+        text = message['text']
+        command = text.split(None, 1)[0]
+        at = command.find('@')
+        if at < 0:
+            return message
+        removed = len(command) - at
+        entities = []
+        for entity in message.get('entities', []):
+            entity = dict(entity)
+            if entity.get('offset') == 0 and entity.get('type') == 'bot_command':
+                entity['length'] -= removed
+            elif entity.get('offset', 0) >= len(command):
+                entity['offset'] -= removed
+            entities.append(entity)
+        message = dict(message, text=command[:at] + text[len(command):])
+        if entities:
+            message['entities'] = entities
+        return message
+
+    def anonymize(self, data: Any) -> Any:
+        """Возвращает анонимизированную копию словаря Update"""
+        if isinstance(data, list):
+            return [self.anonymize(item) for item in data]
+        if not isinstance(data, dict):
+            return data
+
+        if isinstance(data.get('text'), str) and data['text'].startswith('/'):
+            data = self._strip_bot_suffix(data)
+
+        person = 'id' in data and any(key in data for key in _PERSON_KEYS)
+        result = {}
+        for key, value in data.items():
+            if person and key == 'id':
+                result[key] = self.user_id(value)
+            elif key in ('chat_id', 'user_id') or key.endswith(('_chat_id', '_user_id')):
+                # Например, migrate_to_chat_id при переходе группы в супергруппу
+                result[key] = self.user_id(value)
+            elif key == 'url' and isinstance(value, str):
+                result[key] = _PLACEHOLDER_URL
+            elif key == 'username' and isinstance(value, str):
+                result[key] = self.username(value)
+            elif key in ('first_name', 'title'):
+                result[key] = "User" if key == 'first_name' else "Chat"
+            elif key in _DROP_KEYS:
+                continue
+            elif key in ('text', 'caption') and isinstance(value, str):
+                result[key] = self.text(value)
+            elif isinstance(value, str):
+                result[key] = value if key in _KEEP_STRING_KEYS else self.mask(value)
+            else:
+                result[key] = self.anonymize(value)
+        return result
+
+class UpdateCapture:
+    """Записывает входящие обновления в файл JSON lines: {"ts": ..., "update": {...}}"""
+
+    def __init__(self, capture_file: str, salt: str):
+        self.capture_file = capture_file
+        self.anonymizer = Anonymizer(salt)
+        self.captured = 0
+        self._file = None
+
+    def write(self, update: Dict, timestamp: Optional[float] = None):
+        """Анонимизирует и дописывает обновление"""
+        try:
+            if self._file is None:
+                self._file = open(self.capture_file, 'a', encoding='utf-8')
+            record = {'ts': timestamp if timestamp is not None else time.time(),
+                      'update': self.anonymizer.anonymize(update)}
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self.captured += 1
+        except Exception as e:
+            logger.error("Error capturing update: %s", e)
+
+    def close(self):
+        """Закрывает файл записи"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info("Captured %s updates to %s", self.captured, self.capture_file)
+
+def read_capture(path: str) -> Iterator[Dict]:
+    """Читает записи из файла; строки без времени получают ts=0"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'update' not in record:
+                record = {'ts': 0.0, 'update': record}
+            yield record
@@ -0,0 +1,34 @@
+from telegram import Message
+from telegram.constants import ChatType
+from telegram.ext import filters
+
+class NotificationChatFilter(filters.MessageFilter):
+    """Пропускает только сообщения, которые могут повлиять на напоминания
+
+    Сообщения из чатов без напоминаний отбрасываются до вызова обработчиков.
+    При filter_authors=True в группах с тегами учитываются только сообщения
+    тегированных пользователей.
+    """
+
+    def __init__(self, notification_manager, filter_authors: bool = True):
+        super().__init__(name="NotificationChatFilter")
+        self.notification_manager = notification_manager
+        self.filter_authors = filter_authors
+
+    def filter(self, message: Message) -> bool:
+        notification = self.notification_manager.get(message.chat_id)
+        if notification is None:
+            return False
+
+        tagged_users = notification.get('tagged_users')
+        if not self.filter_authors or not tagged_users:
+            return True
+        if message.chat.type not in (ChatType.GROUP, ChatType.SUPERGROUP):
+            return True
+
+        user = message.from_user
+        if user is None:
+            return False
+        if user.id in tagged_users:
+            return True
+        return bool(user.username) and user.username in tagged_users
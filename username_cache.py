@@ -0,0 +1,93 @@
+import asyncio
+import json
+import os
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class UsernameCache:
+    """Персистентное соответствие username -> user_id
+
+    Соответствия запоминаются по сообщениям пользователей, поэтому теги
+    в /begin_notif можно сохранять как user_id без запросов к Telegram.
+    Внутри цикла событий изменения сохраняются в файл не чаще раза в
+    save_delay секунд; flush() записывает несохраненные изменения сразу.
+    """
+
+    def __init__(self, cache_file: str = "usernames.json", save_delay: float = 5.0):
+        self.cache_file = cache_file
+        self.save_delay = save_delay
+        self._user_ids: Dict[str, int] = self._load()
+        self._dirty = False
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+
+    @staticmethod
+    def _normalize(username: str) -> str:
+        # Username в Telegram не зависит от регистра
+        return username.lstrip('@').lower()
+
+    def _load(self) -> Dict[str, int]:
+        """Загружает соответствия из файла"""
+        try:
+            if not os.path.exists(self.cache_file):
+                return {}
+
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            return {username: int(user_id) for username, user_id in data.items()}
+        except Exception as e:
+            logger.error("Error loading username cache: %s", e)
+            return {}
+
+    def save(self) -> bool:
+        """Атомарно сохраняет соответствия в файл"""
+        try:
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._user_ids, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+            return True
+        except Exception as e:
+            logger.error("Error saving username cache: %s", e)
+            return False
+
+    def get(self, username: str) -> Optional[int]:
+        """Возвращает user_id по username или None"""
+        return self._user_ids.get(self._normalize(username))
+
+    def remember(self, username: Optional[str], user_id: int) -> bool:
+        """Запоминает соответствие; сохранение откладывается и объединяется с соседними"""
+        if not username:
+            return False
+
+        key = self._normalize(username)
+        if self._user_ids.get(key) == user_id:
+            return False
+
+        self._user_ids[key] = user_id
+        self._dirty = True
+        self._schedule_save()
+        return True
+
+    def _schedule_save(self):
+        if self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне цикла событий (скрипты, тесты) сохраняем сразу
+            self.flush()
+            return
+        self._save_handle = loop.call_later(self.save_delay, self.flush)
+
+    def flush(self) -> bool:
+        """Сохраняет несохраненные изменения; вызывается и при остановке бота"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if not self._dirty:
+            return True
+        self._dirty = False
+        return self.save()